@@ -1,11 +1,24 @@
 from __future__ import annotations
-from typing import Optional
+import copy
+import re
+import sys
+from collections import ChainMap, deque
+from typing import Iterable, Mapping, Optional, TextIO
 from a2_support import UserInterface, TextInterface
 from constants import *
+import zobrist
+from journal import Delta, MoveJournal
+
+try:
+    import termios
+    import tty
+except ImportError:  # Not available on Windows; raw key input is disabled
+    termios = tty = None
 
 
 class Tile:
     """ An abstract class providing base functionality for tiles on a maze. """
+    __slots__ = ()
     _id = ABSTRACT_TILE
 
     def is_blocking(self) -> bool:
@@ -34,12 +47,14 @@ class Empty(Tile):
     """ A tile representing an empty square. Players can pass over an empty tile
         with no damage.
     """
+    __slots__ = ()
     _id = EMPTY
 
 class Lava(Tile):
     """ A tile representing a square filled with lava. A player can step on lava
         but it causes some damage.
     """
+    __slots__ = ()
     _id = LAVA
 
     def damage(self) -> int:
@@ -47,6 +62,7 @@ class Lava(Tile):
 
 class Wall(Tile):
     """ A simple blocking tile. """
+    __slots__ = ()
     _id = WALL
 
     def is_blocking(self) -> bool:
@@ -56,6 +72,7 @@ class Door(Tile):
     """ A door in the maze. A door starts as blocking, but must be unlocked by
         the player before they can walk through it.
     """
+    __slots__ = ('_blocking',)
     _name = 'Door'
     _id = DOOR
 
@@ -73,10 +90,14 @@ class Door(Tile):
         """ Unlocks the door by setting it to be non-blocking. """
         self._blocking = False
 
+    def lock(self) -> None:
+        """ Locks the door by setting it to be blocking. """
+        self._blocking = True
 
 
 class Entity:
     """ Abstract base class for any entity."""
+    __slots__ = ('_position',)
     _id = 'E'
     def __init__(self, position: tuple[int, int]) -> None:
         """Sets up the entity at the provided location.
@@ -109,6 +130,7 @@ class Entity:
 
 class Item(Entity):
     """ Abstract class providing an interface for all items in the game. """
+    __slots__ = ()
     _id = ITEM
 
     def apply(self, player: 'Player') -> None:
@@ -122,6 +144,7 @@ class Item(Entity):
 
 class Potion(Item):
     """ A potion restores the players HP by 20 when applied. """
+    __slots__ = ()
     _id = POTION
 
     def apply(self, player: 'Player') -> None:
@@ -131,6 +154,7 @@ class Potion(Item):
 
 class Coin(Item):
     """ Coins are collected by the player to allow the door to be unlocked. """
+    __slots__ = ()
     _id = COIN
 
     def apply(self, player: 'Player') -> None:
@@ -143,6 +167,7 @@ class Food(Item):
         food item decreases the player's hunger by a set amount depending on the
         type of food.
     """
+    __slots__ = ()
     _id = FOOD
     _amount = 0
 
@@ -153,18 +178,21 @@ class Food(Item):
 
 class Apple(Food):
     """ Apples decrease the players hunger by 1. """
+    __slots__ = ()
     _id = APPLE
     _amount = APPLE_AMOUNT
 
 
 class Honey(Food):
     """ Honey decreases the players hunger by 5. """
+    __slots__ = ()
     _id = HONEY
     _amount = HONEY_AMOUNT
 
 
 class Water(Item):
     """ Water decreases the player's thirst by 5. """
+    __slots__ = ()
     _id = WATER
 
     def apply(self, player: 'Player') -> None:
@@ -173,7 +201,12 @@ class Water(Item):
 
 
 class Inventory:
-    """ A collection of items. """
+    """ A collection of items. For each item name, only the positions of the
+        items held are stored, oldest first, beside one instance of the
+        oldest; other instances are created when a caller asks for them.
+    """
+    __slots__ = ('_counts', '_samples', '_positions')
+
     def __init__(self, initial_items: Optional[list[Item]] = None) -> None:
         """ Sets up this inventory with the initial items (if provided). Else
             sets up a new empty inventory.
@@ -181,7 +214,9 @@ class Inventory:
         Parameters:
             initial_items: An optional list of initial items to put in inventory
         """
-        self._items = {}
+        self._counts = {}  # Maps item names to the number held
+        self._samples = {}  # Maps item names to the oldest instance held
+        self._positions = {}  # Maps item names to every position, oldest first
         if initial_items is not None:
             for item in initial_items:
                 self.add_item(item)
@@ -192,19 +227,57 @@ class Inventory:
         Parameters:
             item: The item to add
         """
-        items = self._items.get(item.get_name(), [])
-        items.append(item)
-        self._items[item.get_name()] = items
+        name = item.get_name()
+        count = self._counts.get(name, 0)
+        if count == 0:
+            self._samples[name] = item
+            self._positions[name] = deque()
+        self._positions[name].append(item.get_position())
+        self._counts[name] = count + 1
+
+    def _materialize(self, item_name: str) -> list[Item]:
+        """ Returns a list of instances of the named item, one per item held,
+            oldest first.
+        """
+        sample = self._samples[item_name]
+        positions = iter(self._positions[item_name])
+        next(positions)
+        return [sample] + [type(sample)(position) for position in positions]
 
     def get_items(self) -> dict[str, list[Item]]:
         """ Returns the a dictionary mapping item names to the instances of the
             item with that name in the inventory.
         """
-        return self._items
+        return {name: self._materialize(name) for name in self._counts}
+
+    def get_item(self, item_name: str) -> Optional[Item]:
+        """ Returns the oldest instance of the named item without removing it,
+            or None if there are none in the inventory.
+
+        Parameters:
+            item_name: The name of the item to look up.
+        """
+        return self._samples.get(item_name)
+
+    def get_counts(self) -> dict[str, int]:
+        """ Returns a dictionary mapping item names to the number held. """
+        return self._counts
+
+    def count(self, item_name: str) -> int:
+        """ Returns the number of items with the given name in the inventory.
+
+        Parameters:
+            item_name: The name of the item to count.
+        """
+        return self._counts.get(item_name, 0)
+
+    def total(self) -> int:
+        """ Returns the total number of items in the inventory. """
+        return sum(self._counts.values())
 
     def remove_item(self, item_name: str) -> Optional['Item']:
-        """ Removes one instance of the item with the given name from inventory,
-            if one exists.
+        """ Removes the oldest instance of the item with the given name from
+            inventory, if one exists.
 
         Parameters:
             item_name: The name of the item to remove one instance of.
@@ -213,33 +286,64 @@ class Inventory:
             The removed item, if one exists, else None.
 
         """
-        items = self._items.get(item_name)
-        if items is None or items == []:
+        count = self._counts.get(item_name, 0)
+        if count == 0:
             return None
+        sample = self._samples[item_name]
+        positions = self._positions[item_name]
+        positions.popleft()
+        if count == 1:
+            del self._counts[item_name]
+            del self._samples[item_name]
+            del self._positions[item_name]
         else:
-            item = items.pop(0)
-            if self._items.get(item_name) == []:
-                del self._items[item_name]
-            return item
+            self._counts[item_name] = count - 1
+            self._samples[item_name] = type(sample)(positions[0])
+        return sample
     
+    def clear(self) -> None:
+        """ Removes every item from the inventory. """
+        self._counts.clear()
+        self._samples.clear()
+        self._positions.clear()
+
+    def copy(self) -> Inventory:
+        """ Returns an independent inventory holding the same items. """
+        inventory = Inventory()
+        inventory._counts = dict(self._counts)
+        inventory._samples = dict(self._samples)
+        inventory._positions = {name: deque(positions)
+                                for name, positions in self._positions.items()}
+        return inventory
+
     def __str__(self):
-        text = [f'{name}: {len(items)}' for name, items in self._items.items()]
+        text = [f'{name}: {count}' for name, count in self._counts.items()]
         return '\n'.join(text)
     
     def __repr__(self):
         items = []
-        for name in self._items:
-            items.extend(self._items.get(name))
+        for name in self._counts:
+            items.extend(self._materialize(name))
         return f'Inventory(initial_items={items})'
 
 
 class DynamicEntity(Entity):
     """ An abstract class that provides base functionality for entities which
-        can move around the maze.
-
-        Note: they'll extend this in A3 to have direction and an Enemy subclass.
+        can move around the maze, facing in a direction.
     """
+    __slots__ = ('_direction',)
     _id = DYNAMIC_ENTITY
+
+    def __init__(self, position: tuple[int, int],
+                 direction: tuple[int, int] = MOVE_DELTAS[RIGHT]) -> None:
+        """ Sets up the entity at the provided location.
+
+        Parameters:
+            position: (row, column) position of the entity.
+            direction: The (row, column) step the entity faces along.
+        """
+        super().__init__(position)
+        self._direction = direction
     
     def set_position(self, new_position: tuple[int, int]) -> None:
         """ Updates the position of this entity.
@@ -249,9 +353,18 @@ class DynamicEntity(Entity):
         """
         self._position = new_position
 
+    def get_direction(self) -> tuple[int, int]:
+        """ Returns the (row, column) step this entity faces along. """
+        return self._direction
+
+    def set_direction(self, direction: tuple[int, int]) -> None:
+        """ Turns this entity to face along a (row, column) step. """
+        self._direction = direction
+
 
 class Player(DynamicEntity):
     """ The player in the game. """
+    __slots__ = ('_health', '_hunger', '_thirst', '_inventory')
     _id = PLAYER
 
     def __init__(self, position: tuple[int, int]) -> None:
@@ -316,6 +429,18 @@ class Player(DynamicEntity):
         """
         self._health = self._change_amount(self._health, amount, MAX_HEALTH)
 
+    def set_stats(self, health: int, hunger: int, thirst: int) -> None:
+        """ Sets the HP, hunger and thirst of this player, capped at bounds.
+
+        Parameters:
+            health: The new HP.
+            hunger: The new hunger.
+            thirst: The new thirst.
+        """
+        self._health = self._change_amount(health, 0, MAX_HEALTH)
+        self._hunger = self._change_amount(hunger, 0, MAX_HUNGER)
+        self._thirst = self._change_amount(thirst, 0, MAX_THIRST)
+
     def add_item(self, item: Item) -> None:
         """ Adds the given item to this players inventory.
         
@@ -328,6 +453,213 @@ class Player(DynamicEntity):
         """ Returns the players inventory. """
         return self._inventory
 
+    def copy(self) -> Player:
+        """ Returns an independent player with the same position, stats and
+            inventory.
+        """
+        player = Player(self._position)
+        player.set_stats(self._health, self._hunger, self._thirst)
+        player._inventory = self._inventory.copy()
+        return player
+
+
+class Enemy(DynamicEntity):
+    """ An abstract enemy. Enemies move once each time the player moves, and
+        hurt the player if the player steps onto an enemy's square or an
+        enemy ends its move on the player's square.
+    """
+    __slots__ = ()
+    _id = ENEMY
+
+    def get_moves(self, player_position: tuple[int, int]
+                  ) -> tuple[tuple[int, int], ...]:
+        """ Returns the steps this enemy wants to take, best first. It takes
+            the first step that is not blocked, or stays put if all are.
+
+        Parameters:
+            player_position: The (row, column) position of the player.
+        """
+        raise NotImplementedError
+
+
+class Patroller(Enemy):
+    """ An enemy that walks back and forth, turning around when blocked. """
+    __slots__ = ()
+    _id = PATROLLER
+
+    def get_moves(self, player_position: tuple[int, int]
+                  ) -> tuple[tuple[int, int], ...]:
+        row, col = self._direction
+        return self._direction, (-row, -col)
+
+
+class Chaser(Enemy):
+    """ An enemy that walks towards the player while they are within
+        CHASE_RANGE steps, closing the larger gap first.
+    """
+    __slots__ = ()
+    _id = CHASER
+
+    def get_moves(self, player_position: tuple[int, int]
+                  ) -> tuple[tuple[int, int], ...]:
+        row_gap = player_position[0] - self._position[0]
+        col_gap = player_position[1] - self._position[1]
+        if abs(row_gap) + abs(col_gap) > CHASE_RANGE:
+            return ()
+        vertical = ((row_gap > 0) - (row_gap < 0), 0)
+        horizontal = (0, (col_gap > 0) - (col_gap < 0))
+        moves = (vertical, horizontal) if abs(row_gap) >= abs(col_gap) \
+            else (horizontal, vertical)
+        return tuple(move for move in moves if move != (0, 0))
+
+
+class EnemyGrid:
+    """ A uniform grid spatial index of the enemies on a level, with one cell
+        per square. A square holds at most one enemy, so finding the enemy at
+        a square or checking whether a step is blocked is O(1), and moving
+        every enemy costs O(#enemies) without comparing enemies pairwise.
+
+        Each tick returns one byte per enemy recording how it moved, which is
+        all that is needed to undo the tick.
+    """
+    __slots__ = ('_enemies', '_cells', '_hash')
+    DIRECTIONS = tuple(MOVE_DELTAS.values())
+    DIRECTION_CODES = {delta: code for code, delta in enumerate(DIRECTIONS)}
+
+    def __init__(self) -> None:
+        """ Sets up an empty grid. """
+        self._enemies = []  # In the order they move
+        self._cells = {}  # Maps positions to the enemy there
+        self._hash = 0  # XOR of the Zobrist key of every enemy
+
+    def _key(self, enemy: Enemy) -> int:
+        """ Returns the Zobrist key for an enemy's type, square and facing. """
+        return zobrist.enemy_key(enemy.get_position(), enemy.get_id(),
+                                 self.DIRECTION_CODES[enemy.get_direction()])
+
+    def add(self, enemy: Enemy) -> None:
+        """ Adds an enemy, which moves after those already added.
+
+        Pre-conditions:
+            No other enemy is at the enemy's position.
+        """
+        self._enemies.append(enemy)
+        self._cells[enemy.get_position()] = enemy
+        self._hash ^= self._key(enemy)
+
+    def get_enemies(self) -> list[Enemy]:
+        """ Returns every enemy, in the order they move. """
+        return self._enemies
+
+    def get_cells(self) -> dict[tuple[int, int], Enemy]:
+        """ Returns a mapping from positions to the enemy at each. """
+        return self._cells
+
+    def get(self, position: tuple[int, int]) -> Optional[Enemy]:
+        """ Returns the enemy at a position, if any. """
+        return self._cells.get(position)
+
+    def get_states(self) -> list[tuple[int, int, int]]:
+        """ Returns the (row, column, direction code) of each enemy, in the
+            order they move.
+        """
+        codes = self.DIRECTION_CODES
+        return [(*enemy.get_position(), codes[enemy.get_direction()])
+                for enemy in self._enemies]
+
+    def set_states(self, states: list[tuple[int, int, int]]) -> None:
+        """ Moves and turns every enemy to the states from get_states.
+
+        Raises:
+            ValueError: If the number of states does not match the enemies.
+        """
+        if len(states) != len(self._enemies):
+            raise ValueError('Wrong number of enemies')
+        self._cells = {}
+        for enemy, (row, col, direction) in zip(self._enemies, states):
+            enemy.set_position((row, col))
+            enemy.set_direction(self.DIRECTIONS[direction])
+            self._cells[row, col] = enemy
+        self._hash = self.compute_hash()
+
+    def get_hash(self) -> int:
+        """ Returns the XOR of every enemy's Zobrist key, which is kept up to
+            date as enemies move.
+        """
+        return self._hash
+
+    def compute_hash(self) -> int:
+        """ Returns get_hash() computed from scratch. """
+        value = 0
+        for enemy in self._enemies:
+            value ^= self._key(enemy)
+        return value
+
+    def copy(self) -> EnemyGrid:
+        """ Returns a grid of new enemies in the same states as these. """
+        grid = EnemyGrid()
+        for enemy in self._enemies:
+            grid.add(type(enemy)(enemy.get_position(), enemy.get_direction()))
+        return grid
+
+    def tick(self, maze: Maze, player_position: tuple[int, int]) -> bytes:
+        """ Moves each enemy in turn by its first unblocked step. Walls,
+            locked doors, the edge of the maze and other enemies block.
+
+        Parameters:
+            maze: The maze the enemies are in.
+            player_position: The (row, column) position of the player.
+
+        Returns:
+            One code per enemy for undo(): 0 if it stayed put, otherwise
+            4 * (its step's direction code + 1) + its old direction code.
+        """
+        codes = bytearray(len(self._enemies))
+        cells = self._cells
+        tiles = maze.get_tiles()
+        max_row, max_col = maze.get_dimensions()
+        direction_codes = self.DIRECTION_CODES
+        for index, enemy in enumerate(self._enemies):
+            row, col = position = enemy.get_position()
+            for move in enemy.get_moves(player_position):
+                new_position = new_row, new_col = row + move[0], col + move[1]
+                if not (0 <= new_row < max_row and 0 <= new_col < max_col) \
+                        or tiles[new_row][new_col].is_blocking() \
+                        or new_position in cells:
+                    continue
+                old_key = self._key(enemy)
+                codes[index] = 4 * (direction_codes[move] + 1) \
+                    + direction_codes[enemy.get_direction()]
+                del cells[position]
+                cells[new_position] = enemy
+                enemy.set_position(new_position)
+                enemy.set_direction(move)
+                self._hash ^= old_key ^ self._key(enemy)
+                break
+        return bytes(codes)
+
+    def undo(self, codes: bytes) -> None:
+        """ Reverses the tick that returned codes. """
+        cells = self._cells
+        for index in range(len(codes) - 1, -1, -1):
+            code = codes[index]
+            if code == 0:
+                continue
+            enemy = self._enemies[index]
+            old_key = self._key(enemy)
+            row, col = position = enemy.get_position()
+            move_row, move_col = self.DIRECTIONS[code // 4 - 1]
+            old_position = (row - move_row, col - move_col)
+            del cells[position]
+            cells[old_position] = enemy
+            enemy.set_position(old_position)
+            enemy.set_direction(self.DIRECTIONS[code % 4])
+            self._hash ^= old_key ^ self._key(enemy)
+
+    def __len__(self) -> int:
+        """ Returns the number of enemies. """
+        return len(self._enemies)
+
 
 def load_game(filename: str) -> list['Level']:
     """ Reads a game file and creates a list of all the levels in order.
@@ -359,6 +691,12 @@ class Maze:
         DOOR: Door,
         LAVA: Lava,
     }
+    # Tiles without state are shared by every square of that type
+    SHARED_TILES = {
+        WALL: Wall(),
+        EMPTY: Empty(),
+        LAVA: Lava(),
+    }
 
     def __init__(self, dimensions: tuple[int, int]) -> None:
         """Sets up an empty maze of given dimensions.
@@ -368,6 +706,7 @@ class Maze:
         """
         self._dimensions = dimensions
         self._tiles = []
+        self._doors = []
     
     def get_dimensions(self) -> tuple[int, int]:
         """ Returns the dimensions of this maze. """
@@ -380,20 +719,57 @@ class Maze:
             row: String of the tile IDs from which to construct Tile instances.
         """
         # If there is an entity in a spot, assume the ground underneath is empty
-        self._tiles.append([self.TILES.get(tile, Empty)() for tile in row])
+        shared = self.SHARED_TILES
+        empty = shared[EMPTY]
+        tiles = [
+            shared.get(tile)
+            or (self.TILES[tile]() if tile in self.TILES else empty)
+            for tile in row
+        ]
+        row_num = len(self._tiles)
+        self._tiles.append(tiles)
+        self._doors.extend((row_num, col) for col, tile in enumerate(tiles)
+                           if isinstance(tile, Door))
 
     def get_tiles(self) -> list[list[Tile]]:
         """ Returns the Tile instances in this maze. Each element is a row of
             Tile instances in order.
         """
         return self._tiles
-    
+
+    def get_doors(self) -> list[tuple[int, int]]:
+        """ Returns the positions of the doors in this maze. """
+        return list(self._doors)
+
     def unlock_door(self) -> None:
         """ Unlocks any doors that exist in the maze. """
-        for row in self._tiles:
-            for tile in row:
-                if isinstance(tile, Door):
-                    tile.unlock()
+        for position in self._doors:
+            self.get_tile(position).unlock()
+
+    def lock_door(self) -> None:
+        """ Locks any doors that exist in the maze. """
+        for position in self._doors:
+            self.get_tile(position).lock()
+
+    def is_door_unlocked(self) -> bool:
+        """ Returns True iff the maze has doors and they have been unlocked. """
+        return any(not self.get_tile(position).is_blocking()
+                   for position in self._doors)
+
+    def copy(self) -> Maze:
+        """ Returns a maze whose doors can be changed independently of this
+            one. Rows without doors are shared, since no other tile has state.
+        """
+        maze = Maze(self._dimensions)
+        maze._tiles = list(self._tiles)
+        maze._doors = self._doors
+        for row, col in self._doors:
+            if maze._tiles[row] is self._tiles[row]:
+                maze._tiles[row] = list(self._tiles[row])
+            door = maze._tiles[row][col] = Door()
+            if not self._tiles[row][col].is_blocking():
+                door.unlock()
+        return maze
     
     def get_tile(self, position: tuple[int, int]) -> Tile:
         """ Returns the Tile instance at the given position.
@@ -424,6 +800,10 @@ class Level:
         HONEY: Honey,
         WATER: Water,
     }
+    ENEMIES = {
+        PATROLLER: Patroller,
+        CHASER: Chaser,
+    }
 
     def __init__(self, dimensions: tuple[int, int]) -> None:
         """ Sets up a new level with empty maze and no items or player.
@@ -433,20 +813,94 @@ class Level:
         """
         self._maze = Maze(dimensions)
         self._items = {} # Maps positions to Item instances
+        self._num_coins = 0  # Coins in self._items, kept up to date
+        self._enemies = EnemyGrid()
         self._player_start = None
+        # True while the maze, items or enemies are shared with a clone of
+        # this level
+        self._maze_shared = False
+        self._items_shared = False
+        self._enemies_shared = False
+
+    def clone(self) -> Level:
+        """ Returns a copy of this level that shares its maze and items until
+            either level changes them (copy-on-write).
+        """
+        level = copy.copy(self)
+        self._maze_shared = self._items_shared = self._enemies_shared = True
+        level._maze_shared = level._items_shared = level._enemies_shared = True
+        return level
+
+    def _own_maze(self) -> None:
+        """ Copies the maze if it is shared, so that it can be changed. """
+        if self._maze_shared:
+            self._maze = self._maze.copy()
+            self._maze_shared = False
+
+    def _own_items(self) -> None:
+        """ Copies the items if they are shared, so they can be changed. """
+        if self._items_shared:
+            self._items = dict(self._items)
+            self._items_shared = False
     
+    def _own_enemies(self) -> None:
+        """ Copies the enemies if they are shared, so they can be moved. """
+        if self._enemies_shared:
+            self._enemies = self._enemies.copy()
+            self._enemies_shared = False
+
     def get_maze(self) -> Maze:
         """ Returns the Maze instance for this level. """
         return self._maze
+
+    def get_enemies(self) -> EnemyGrid:
+        """ Returns the enemies on this level. """
+        return self._enemies
+
+    def set_enemies(self, enemies: EnemyGrid) -> None:
+        """ Replaces all enemies on this level. """
+        self._enemies = enemies
+        self._enemies_shared = False
+
+    def tick_enemies(self, player_position: tuple[int, int]) -> bytes:
+        """ Moves every enemy once. Returns the codes to undo the moves with.
+
+        Parameters:
+            player_position: The (row, column) position of the player.
+        """
+        self._own_enemies()
+        return self._enemies.tick(self._maze, player_position)
+
+    def undo_enemies(self, codes: bytes) -> None:
+        """ Reverses the enemy moves that tick_enemies returned codes for. """
+        self._own_enemies()
+        self._enemies.undo(codes)
     
     def _contains_coins(self) -> bool:
         """ Returns True iff there are any more coins left in this level. """
-        return any([item.get_id() == COIN for item in self._items.values()])
+        return self._num_coins > 0
+
+    def _count_coins(self, items: Iterable[Optional[Item]], change: int
+                     ) -> None:
+        """ Adds change to the coin count for each coin among items. """
+        for item in items:
+            if item is not None and item.get_id() == COIN:
+                self._num_coins += change
 
     def attempt_unlock_door(self) -> None:
         """ Unlocks the doors in the maze if there are no coins remaining. """
-        if not self._contains_coins():
-            self._maze.unlock_door()
+        if not self._contains_coins() and not self._maze.is_door_unlocked():
+            self.unlock_door()
+
+    def unlock_door(self) -> None:
+        """ Unlocks the doors in the maze. """
+        self._own_maze()
+        self._maze.unlock_door()
+
+    def lock_door(self) -> None:
+        """ Locks the doors in the maze. """
+        self._own_maze()
+        self._maze.lock_door()
     
     def add_row(self, row: str) -> None:
         """ Adds the tiles and entities from the row to this level.
@@ -467,7 +921,11 @@ class Level:
             entity_id: The ID of the entity to add.
         """
         if self.ENTITIES.get(entity_id) is not None:
+            self._count_coins([self._items.get(position)], -1)
             self._items[position] = self.ENTITIES.get(entity_id)(position)
+            self._count_coins([self._items[position]], 1)
+        elif entity_id in self.ENEMIES:
+            self._enemies.add(self.ENEMIES[entity_id](position))
         if entity_id == PLAYER:
             self.add_player_start(position)
 
@@ -481,6 +939,29 @@ class Level:
         """
         return self._items
 
+    def set_items(self, items: dict[tuple[int, int], Item]) -> None:
+        """ Replaces all items in this level.
+
+        Parameters:
+            items: Maps positions to the items at those positions.
+        """
+        self._items = items
+        self._items_shared = False
+        self._num_coins = 0
+        self._count_coins(items.values(), 1)
+
+    def add_item(self, item: Item) -> None:
+        """ Places an item in this level at the item's own position.
+
+        Parameters:
+            item: The item to place.
+        """
+        self._own_items()
+        position = item.get_position()
+        self._count_coins([self._items.get(position)], -1)
+        self._items[position] = item
+        self._count_coins([item], 1)
+
     def remove_item(self, position: tuple[int, int]) -> None:
         """ Deletes the item from the given position.
         
@@ -490,7 +971,8 @@ class Level:
         Parameters:
             position: the (row, column) position from which to delete an item.
         """
-        del self._items[position]
+        self._own_items()
+        self._count_coins([self._items.pop(position)], -1)
     
     def add_player_start(self, position: tuple[int, int]) -> None:
         """ Adds the start position for the player in this level.
@@ -516,11 +998,12 @@ class Level:
 
 class Model:
     """ The overall model for a game of MazeRunner """
-    def __init__(self, game_file: str) -> None:
+    def __init__(self, game_file: str, history_size: int = UNDO_HISTORY) -> None:
         """ Constructs a new game.
         
         Parameters:
             game_file: The file containing the levels for this game.
+            history_size: The number of most recent actions that can be undone.
         """
         self._levels = load_game(game_file)
         self._level_num = 0
@@ -529,6 +1012,14 @@ class Model:
         self._did_level_up = False
         self._num_moves = 0
         self._game_file = game_file
+        self._game_hash = None
+        # The items each level starts with, used to describe progress
+        self._initial_items = [dict(level.get_items()) for level in self._levels]
+        self._initial_enemies = [level.get_enemies().copy()
+                                 for level in self._levels]
+        self._journal = MoveJournal(history_size)
+        self._level_source = None
+        self._hash = self._initial_hash = self.compute_state_hash()
 
     def has_won(self) -> bool:
         """ Returns True iff the game has been won (i.e. all levels have been
@@ -547,7 +1038,176 @@ class Model:
     def get_level(self) -> Level:
         """ Returns the current level. """
         return self._levels[self._level_num]
+
+    def get_levels(self) -> list[Level]:
+        """ Returns every level in the game, in order. """
+        return self._levels
+
+    def get_level_num(self) -> int:
+        """ Returns the (zero-based) index of the current level. """
+        return self._level_num
+
+    def get_num_moves(self) -> int:
+        """ Returns the number of moves the player has made. """
+        return self._num_moves
+
+    def get_game_file(self) -> str:
+        """ Returns the path of the file this game was loaded from. """
+        return self._game_file
+
+    def get_game_hash(self) -> bytes:
+        """ Returns the SHA-256 digest of the game file, combined with the
+            seed and largest size of the generated levels in endless mode.
+        """
+        if self._game_hash is None:
+            from snapshot import hash_file
+            self._game_hash = hash_file(self._game_file)
+            if self._level_source is not None:
+                import hashlib
+                self._game_hash = hashlib.sha256(
+                    self._game_hash
+                    + f'endless:{self._level_source.get_seed()}:'
+                      f'{self._level_source.get_max_size()}'.encode()
+                ).digest()
+        return self._game_hash
+
+    def set_level_source(self, source: Optional['EndlessLevels']) -> None:
+        """ Sets where levels come from once the loaded levels run out, or
+            None to end the game after the last level instead. Any previous
+            source is closed.
+
+        Parameters:
+            source: Supplies the levels that follow the loaded ones, in order
+                    (see endless.py).
+        """
+        if self._level_source is not None:
+            self._level_source.close()
+        self._level_source = source
+        self._game_hash = None
+
+    def is_endless(self) -> bool:
+        """ Returns True iff more levels are generated as the game goes on.
+        """
+        return self._level_source is not None
+
+    def add_level(self, level: Level,
+                  initial_items: Optional[dict[tuple[int, int], Item]] = None,
+                  initial_enemies: Optional[EnemyGrid] = None,
+                  items_hash: Optional[int] = None) -> None:
+        """ Adds a level after the last one. The level must not have been
+            played yet.
+
+        Parameters:
+            level: The level to add.
+            initial_items: A copy of the level's items, if already made.
+            initial_enemies: A copy of the level's enemies, if already made.
+            items_hash: The XOR of the Zobrist keys of the level's items, if
+                        already computed.
+        """
+        level_num = len(self._levels)
+        self._levels.append(level)
+        self._initial_items.append(initial_items if initial_items is not None
+                                   else dict(level.get_items()))
+        self._initial_enemies.append(initial_enemies
+                                     if initial_enemies is not None
+                                     else level.get_enemies().copy())
+        if items_hash is None:
+            items_hash = 0
+            for position, item in level.get_items().items():
+                items_hash ^= zobrist.item_key(level_num, position,
+                                               item.get_id())
+        value = items_hash ^ zobrist.enemies_key(
+            level_num, level.get_enemies().get_hash())
+        self._hash ^= value
+        self._initial_hash ^= value
+
+    def prepare_level(self, level_num: int) -> bool:
+        """ Adds a generated level, and any before it, if they can be added
+            without waiting for them to be generated.
+
+        Returns:
+            True iff the level has been added.
+        """
+        source = self._level_source
+        while len(self._levels) <= level_num:
+            if source is None or not source.is_ready(len(self._levels)):
+                return False
+            self.add_level(*source.get_level(len(self._levels)))
+        return True
+
+    def _load_level(self, level_num: int) -> bool:
+        """ Adds generated levels until a level exists, waiting for them to
+            be generated if need be.
+
+        Returns:
+            True iff the level exists.
+        """
+        source = self._level_source
+        while len(self._levels) <= level_num:
+            if source is None:
+                return False
+            self.add_level(*source.get_level(len(self._levels)))
+        return True
     
+    def clone(self) -> Model:
+        """ Returns an independent copy of this game. Level data is shared
+            with this game until either game changes it, so cloning is cheap
+            even for large mazes. The clone starts with an empty undo history.
+        """
+        model = copy.copy(self)
+        model._levels = [level.clone() for level in self._levels]
+        model._player = self._player.copy()
+        model._journal = MoveJournal(self._journal.get_capacity())
+        # Only one game can take levels from a source, so a clone of an
+        # endless game ends after the levels generated so far
+        model._level_source = None
+        model._initial_items = list(self._initial_items)
+        model._initial_enemies = list(self._initial_enemies)
+        return model
+
+    def state_hash(self) -> int:
+        """ Returns a 64-bit hash of the full game state, which is kept up to
+            date as the game is played.
+        """
+        return self._hash
+
+    def compute_state_hash(self) -> int:
+        """ Returns the 64-bit hash of the full game state, computed from
+            scratch. Always equal to state_hash().
+        """
+        value = self._player_hash()
+        for level_num, level in enumerate(self._levels):
+            for position, item in level.get_items().items():
+                value ^= zobrist.item_key(level_num, position, item.get_id())
+            if level.get_maze().is_door_unlocked():
+                value ^= zobrist.door_key(level_num)
+            value ^= zobrist.enemies_key(level_num,
+                                         level.get_enemies().compute_hash())
+        for name, count in self.get_player_inventory().get_counts().items():
+            value ^= zobrist.inventory_key(name, count)
+        return value
+
+    def _player_hash(self) -> int:
+        """ Returns the part of the state hash for the level number and the
+            player's position, stats and move count.
+        """
+        return zobrist.player_key(self._level_num,
+                                  self._player.get_position(),
+                                  self.get_player_stats(), self._num_moves)
+
+    def _enemy_hash(self) -> int:
+        """ Returns the part of the state hash for the current level's enemies.
+        """
+        return zobrist.enemies_key(self._level_num,
+                                   self.get_level().get_enemies().get_hash())
+
+    def _hash_inventory_change(self, item_name: str, old_count: int) -> None:
+        """ Updates the state hash after the number of an item held changed.
+        """
+        new_count = self.get_player_inventory().count(item_name)
+        self._hash ^= zobrist.inventory_key(item_name, old_count) \
+            ^ zobrist.inventory_key(item_name, new_count)
+
     def did_level_up(self) -> True:
         """ Returns True if the player just moved to the next level on the
             previous turn.
@@ -555,15 +1215,18 @@ class Model:
         return self._did_level_up
 
     def level_up(self) -> None:
-        """ Changes the level to the next level from the file. If no more levels
-            remain, the player has won the game.
+        """ Changes the level to the next level from the file, or the next
+            generated level in endless mode. If no more levels remain, the
+            player has won the game.
         """
+        old_hash = self._player_hash()
         self._level_num += 1
-        if self._level_num >= len(self._levels):
+        if not self._load_level(self._level_num):
             self._won = True
         else:
             self._player.set_position(self.get_level().get_player_start())
             self._did_level_up = True
+        self._hash ^= old_hash ^ self._player_hash()
 
     def move_player(self, delta: tuple[int, int]) -> None:
         """ Tries to move the player by the requested amount. Levels up if the
@@ -572,16 +1235,19 @@ class Model:
         old_pos = self._player.get_position()
         position = row, col = old_pos[0] + delta[0], old_pos[1] + delta[1]
         max_row, max_col = self.get_level().get_dimensions()
+        undo = Delta(old_pos, *self.get_player_stats(), self._num_moves)
 
         # Check if player has escaped the maze
         if (row < 0 or row >= max_row or col < 0 or col >= max_col) and \
             isinstance(self.get_current_maze().get_tile(old_pos), Door):
             self.level_up()
+            self._journal.record(undo._replace(levelled_up=True))
 
         # Move player if tile is non-blocking and update stats
         else:
             tile = self.get_current_maze().get_tile(position)
             if not tile.is_blocking():
+                old_hash = self._player_hash()
                 self._num_moves += 1
         
                 if self._num_moves % 5 == 0:
@@ -590,7 +1256,38 @@ class Model:
                 self._player.change_health(-1 - tile.damage())
 
                 self._player.set_position(position)
+                self._hash ^= old_hash ^ self._player_hash()
+                was_unlocked = self.get_current_maze().is_door_unlocked()
+                item = self.get_current_items().get(position)
                 self.attempt_collect_item(position)
+                # Unlocking gives a cloned level its own maze, so read it again
+                unlocked = self.get_current_maze().is_door_unlocked()
+                self._journal.record(undo._replace(
+                    item=item,
+                    unlocked=unlocked and not was_unlocked,
+                    enemies=self._move_enemies(),
+                ))
+
+    def _move_enemies(self) -> Optional[bytes]:
+        """ Moves the current level's enemies, hurting the player once if
+            they stepped onto an enemy's square (even if it then moves away,
+            or they swap squares) or if one ends up on their square.
+
+        Returns:
+            The codes to undo the enemy moves with, or None if the level has
+            no enemies.
+        """
+        level = self.get_level()
+        if not level.get_enemies():
+            return None
+        old_hash = self._player_hash() ^ self._enemy_hash()
+        position = self._player.get_position()
+        hit = level.get_enemies().get(position) is not None
+        codes = level.tick_enemies(position)
+        if hit or level.get_enemies().get(position) is not None:
+            self._player.change_health(-ENEMY_DAMAGE)
+        self._hash ^= old_hash ^ self._player_hash() ^ self._enemy_hash()
+        return codes
     
     def attempt_collect_item(self, position: tuple[int, int]) -> None:
         """ Collect the item at the given position if one exists. Unlock door if
@@ -599,12 +1296,109 @@ class Model:
         Parameters:
             position: The position from which to attempt to collect an item.
         """
-        item = self.get_level().get_items().get(position)
+        level = self.get_level()
+        item = level.get_items().get(position)
         if item is not None:
+            name = item.get_name()
+            count = self.get_player_inventory().count(name)
             self._player.add_item(item)
-            self.get_level().remove_item(position)
-        self.get_level().attempt_unlock_door()
+            level.remove_item(position)
+            self._hash ^= zobrist.item_key(self._level_num, position,
+                                           item.get_id())
+            self._hash_inventory_change(name, count)
+
+        was_unlocked = level.get_maze().is_door_unlocked()
+        level.attempt_unlock_door()
+        if level.get_maze().is_door_unlocked() and not was_unlocked:
+            self._hash ^= zobrist.door_key(self._level_num)
         
+    def use_item(self, item_name: str) -> bool:
+        """ Removes one of the named item from the player's inventory and
+            applies it to the player.
+
+        Parameters:
+            item_name: The name of the item to use.
+
+        Returns:
+            True iff the player had an item with that name.
+        """
+        undo = Delta(self._player.get_position(), *self.get_player_stats(),
+                     self._num_moves)
+        old_hash = self._player_hash()
+        count = self.get_player_inventory().count(item_name)
+        item = self.get_player_inventory().remove_item(item_name)
+        if item is None:
+            return False
+        item.apply(self._player)
+        self._hash_inventory_change(item_name, count)
+        self._hash ^= old_hash ^ self._player_hash()
+        self._journal.record(undo._replace(item=item, used=True))
+        return True
+
+    def clear_undo(self) -> None:
+        """ Forgets every action that could be undone. """
+        self._journal.clear()
+
+    def undo(self) -> bool:
+        """ Reverses the most recent move or item use.
+
+        Returns:
+            True iff there was an action in the history to undo.
+        """
+        delta = self._journal.pop()
+        if delta is None:
+            return False
+
+        old_hash = self._player_hash()
+        if delta.levelled_up:
+            self._level_num -= 1
+            self._won = False
+        level = self.get_level()
+        if delta.enemies is not None:
+            old_enemies = self._enemy_hash()
+            level.undo_enemies(delta.enemies)
+            self._hash ^= old_enemies ^ self._enemy_hash()
+        if delta.unlocked:
+            level.lock_door()
+            self._hash ^= zobrist.door_key(self._level_num)
+        item = delta.item
+        if item is not None:
+            name = item.get_name()
+            count = self.get_player_inventory().count(name)
+            if delta.used:
+                self._player.add_item(item)
+            else:
+                self.get_player_inventory().remove_item(name)
+                level.add_item(item)
+                self._hash ^= zobrist.item_key(
+                    self._level_num, item.get_position(), item.get_id())
+            self._hash_inventory_change(name, count)
+
+        self._num_moves = delta.num_moves
+        self._player.set_position(delta.position)
+        self._player.set_stats(delta.health, delta.hunger, delta.thirst)
+        self._did_level_up = False
+        self._hash ^= old_hash ^ self._player_hash()
+        return True
+
+    def rewind_to(self, num_moves: int) -> int:
+        """ Undoes actions until the game is as it was just after the given
+            move, or as far back as the history allows.
+
+        Parameters:
+            num_moves: The move number to rewind to.
+
+        Returns:
+            The number of actions undone.
+        """
+        undone = 0
+        while True:
+            delta = self._journal.peek()
+            if delta is None or delta.num_moves < num_moves:
+                return undone
+            self.undo()
+            undone += 1
+
     def get_player(self) -> Player:
         """ Returns the player in the game. """
         return self._player
@@ -627,6 +1421,156 @@ class Model:
             positions in the current maze. """
         return self.get_level().get_items()
 
+    def get_current_enemies(self) -> EnemyGrid:
+        """ Returns the enemies on the current level. """
+        return self.get_level().get_enemies()
+
+    def snapshot(self) -> Snapshot:
+        """ Returns a snapshot of the game's progress. """
+        from snapshot import Snapshot
+        collected = {}
+        unlocked = []
+        enemies = {}
+        for level_num, level in enumerate(self._levels):
+            items = level.get_items()
+            removed = [position for position in self._initial_items[level_num]
+                       if position not in items]
+            if removed:
+                collected[level_num] = removed
+            if level.get_maze().is_door_unlocked():
+                unlocked.append(level_num)
+            grid = level.get_enemies()
+            if grid.get_hash() != self._initial_enemies[level_num].get_hash():
+                enemies[level_num] = grid.get_states()
+        return Snapshot(
+            self.get_game_hash(),
+            self._level_num,
+            self._player.get_position(),
+            self.get_player_stats(),
+            self._num_moves,
+            dict(self.get_player_inventory().get_counts()),
+            collected,
+            unlocked,
+            enemies,
+        )
+
+    def reset(self) -> None:
+        """ Restarts the game from its first level, as it was when loaded.
+            Only the items, doors and enemies that changed during play are
+            restored, so resetting costs little however large the game is.
+        """
+        for level, items in zip(self._levels, self._initial_items):
+            current = level.get_items()
+            if len(current) != len(items):
+                for position, item in items.items():
+                    if position not in current:
+                        level.add_item(item)
+            if level.get_maze().is_door_unlocked():
+                level.lock_door()
+        for level, enemies in zip(self._levels, self._initial_enemies):
+            if level.get_enemies().get_hash() != enemies.get_hash():
+                level.set_enemies(enemies.copy())
+
+        self._level_num = 0
+        self._num_moves = 0
+        self._won = False
+        self._did_level_up = False
+        self._journal.clear()
+
+        player = self._player
+        player.set_position(self.get_level().get_player_start())
+        player.set_stats(MAX_HEALTH, 0, 0)
+        player.get_inventory().clear()
+        self._hash = self._initial_hash
+
+    def _check_snapshot(self, snapshot: Snapshot,
+                        item_types: dict[str, type]) -> None:
+        """ Checks that a snapshot describes a state of this game, before
+            restore changes anything.
+
+        Parameters:
+            snapshot: The snapshot to check.
+            item_types: Maps the names of the items that can be held to
+                        their classes.
+
+        Raises:
+            ValueError: If the snapshot cannot be restored.
+        """
+        if snapshot.game_hash != self.get_game_hash():
+            raise ValueError('Save is for a different game file')
+        if snapshot.level_num < 0 or not self._load_level(snapshot.level_num):
+            raise ValueError('Save refers to a level that does not exist')
+        num_levels = len(self._levels)
+
+        row, col = snapshot.position
+        rows, columns = self._levels[snapshot.level_num].get_dimensions()
+        if not (0 <= row < rows and 0 <= col < columns):
+            raise ValueError('Save puts the player outside the level')
+        unknown = snapshot.inventory.keys() - item_types.keys()
+        if unknown:
+            raise ValueError(f'Save holds unknown items: {sorted(unknown)}')
+        if any(not 0 <= level_num < num_levels
+               for level_num in snapshot.unlocked):
+            raise ValueError('Save unlocks a level that does not exist')
+        for level_num, positions in snapshot.collected.items():
+            if not 0 <= level_num < num_levels or any(
+                    position not in self._initial_items[level_num]
+                    for position in positions):
+                raise ValueError('Save collects items that do not exist')
+        for level_num, states in snapshot.enemies.items():
+            if not 0 <= level_num < num_levels or len(states) != len(
+                    self._initial_enemies[level_num].get_enemies()):
+                raise ValueError('Save has the wrong number of enemies')
+            rows, columns = self._levels[level_num].get_dimensions()
+            if any(not (0 <= row < rows and 0 <= col < columns
+                        and 0 <= direction < len(EnemyGrid.DIRECTIONS))
+                   for row, col, direction in states):
+                raise ValueError('Save puts an enemy outside its level')
+
+    def restore(self, snapshot: Snapshot) -> None:
+        """ Restores the game to the state recorded in a snapshot.
+
+        Parameters:
+            snapshot: A snapshot taken from a game of the same game file.
+
+        Raises:
+            ValueError: If the snapshot is for a different game file or does
+                        not describe a state of it. The game is then left
+                        unchanged.
+        """
+        item_types = {cls.__name__: cls for cls in Level.ENTITIES.values()}
+        self._check_snapshot(snapshot, item_types)
+
+        for level_num, level in enumerate(self._levels):
+            items = dict(self._initial_items[level_num])
+            for position in snapshot.collected.get(level_num, []):
+                items.pop(position, None)
+            level.set_items(items)
+            if level_num in snapshot.unlocked:
+                level.unlock_door()
+            else:
+                level.lock_door()
+            enemies = self._initial_enemies[level_num].copy()
+            if level_num in snapshot.enemies:
+                enemies.set_states(snapshot.enemies[level_num])
+            level.set_enemies(enemies)
+
+        self._level_num = snapshot.level_num
+        self._num_moves = snapshot.num_moves
+        self._won = False
+        self._did_level_up = False
+        self._journal.clear()
+
+        player = self._player
+        player.set_position(snapshot.position)
+        player.set_stats(*snapshot.stats)
+
+        player.get_inventory().clear()
+        for name, count in snapshot.inventory.items():
+            for _ in range(count):
+                player.add_item(item_types[name](snapshot.position))
+        self._hash = self.compute_state_hash()
+
     def __str__(self):
         return f"Model('{self._game_file}')"
     
@@ -634,77 +1578,294 @@ class Model:
         return str(self)
 
 
+# One command of a batch: 'mem', 'i <item>', 'r <move>', or a single key
+COMMAND_PATTERN = re.compile(
+    rf'\s*(?:({re.escape(MEMORY_COMMAND)})'
+    rf'|({re.escape(ITEM_COMMAND)}\s+\S+)'
+    rf'|({re.escape(REWIND_COMMAND)}\s+\d+)'
+    rf'|([{re.escape(UP + DOWN + LEFT + RIGHT + UNDO_COMMAND)}]))'
+)
+
+
+def parse_commands(text: str) -> Optional[list[str]]:
+    """ Splits a line of input into the commands it contains, so that e.g.
+        'wwwddi Apple' gives ['w', 'w', 'w', 'd', 'd', 'i Apple'].
+
+    Parameters:
+        text: The line entered by the user.
+
+    Returns:
+        The commands in order, in the form accepted by MazeRunner._handle_move,
+        or None if the line is empty or contains anything unrecognised.
+    """
+    commands = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = COMMAND_PATTERN.match(text, position)
+        if match is None:
+            return None
+        command = match.group(match.lastindex)
+        if command[0] in (ITEM_COMMAND, REWIND_COMMAND) and len(command) > 1:
+            command = ' '.join(command.split())
+        commands.append(command)
+        position = match.end()
+    return commands or None
+
+
 class MazeRunner:
     """ Controller class for a game of MazeRunner """
-    def __init__(self, game_file: str, view: UserInterface) -> None:
+    def __init__(self, game_file: str, view: UserInterface,
+                 model: Optional[Model] = None) -> None:
         """ Sets up initial game state
         
         Parameters:
             game_file: Path to the file from which the game levels are loaded
             view: A subclass of Interface to manage the display of information
+            model: An already loaded game of game_file to play, instead of
+                   loading the file again
         """
-        self._model = Model(game_file)
+        self._model = model if model is not None else Model(game_file)
         self._view = view
+        self._replay = None
+        self._stats_history = None
+        if ENDLESS_MODE:
+            self.start_endless(ENDLESS_SEED)
+
+    def start_endless(self, seed: int, max_size: int = ENDLESS_MAX_SIZE
+                      ) -> None:
+        """ Keeps the game going after the last level of the file, with
+            levels generated from a seed on a worker process.
+
+        Parameters:
+            seed: The seed the generated levels are made from.
+            max_size: The largest number of rows or columns in a level.
+        """
+        from endless import EndlessLevels
+        self._model.set_level_source(EndlessLevels(
+            seed, len(self._model.get_levels()), max_size=max_size))
+
+    def get_model(self) -> Model:
+        """ Returns the game being played. """
+        return self._model
+
+    def start_recording(self) -> 'Replay':
+        """ Starts recording every action from the current state onwards.
+            Moves made before then can no longer be undone, since the
+            recording could not play back undoing them.
+
+        Returns:
+            The replay that actions are recorded into.
+        """
+        from replay import Replay
+        self._model.clear_undo()
+        self._replay = Replay(self._model.get_game_hash())
+        self._replay.start(self._model)
+        return self._replay
+
+    def stop_recording(self) -> Optional['Replay']:
+        """ Stops recording and returns the replay recorded, if any. """
+        replay, self._replay = self._replay, None
+        return replay
+
+    def track_stats(self, capacity: int = STATS_HISTORY_SIZE
+                    ) -> 'StatsHistory':
+        """ Starts recording the player's stats after every action, keeping
+            the most recent capacity samples.
+
+        Returns:
+            The history the stats are recorded into.
+        """
+        from stats_history import StatsHistory
+        self._stats_history = StatsHistory(capacity)
+        self._sample_stats()
+        return self._stats_history
+
+    def get_stats_history(self) -> Optional['StatsHistory']:
+        """ Returns the history of the player's stats, if being tracked. """
+        return self._stats_history
+
+    def _sample_stats(self) -> None:
+        """ Records the player's current stats, if they are being tracked. """
+        if self._stats_history is not None:
+            self._stats_history.update(self._model.get_num_moves(),
+                                       self._model.get_player_stats())
+
+    def _get_drawn_items(self) -> Mapping[tuple[int, int], Entity]:
+        """ Returns the entities for the view to draw over the maze: the items
+            on the current level, with its enemies in front of them.
+        """
+        return ChainMap(self._model.get_current_enemies().get_cells(),
+                        self._model.get_current_items())
 
     def _redraw(self) -> None:
         """ Redraws the entire view based on the current model state. """
         model = self._model
         self._view.draw(
             model.get_current_maze(),
-            model.get_current_items(),
+            self._get_drawn_items(),
             model.get_player().get_position(),
             model.get_player_inventory(),
             model.get_player_stats()
         )
 
     def _user_prompt(self) -> None:
-        """ Prompts the user for a move and updates model state accordingly. """
-        move = input('\nEnter a move: ')
-        self._handle_move(move)
+        """ Prompts the user for one or more moves, reprompting until a valid
+            line is entered, and updates model state accordingly.
+        """
+        commands = None
+        while commands is None:
+            commands = parse_commands(input('\nEnter a move: '))
+        self._handle_batch(commands)
+
+    def _handle_batch(self, commands: list[str]) -> None:
+        """ Applies a batch of commands in order, stopping early if the game
+            ends.
+
+        Parameters:
+            commands: The commands, as returned by parse_commands.
+        """
+        model = self._model
+        for command in commands:
+            self._handle_move(command)
+            if model.has_won() or model.has_lost():
+                return
+
+    def _show_message(self, message: str) -> None:
+        """ Shows a message to the player, e.g. after an invalid action. """
+        print(message)
 
-    def _handle_move(self, move: str) -> None:
-        """ Handles a model update after a single move. Reprompts if move is
-            invalid.
+    def _handle_move(self, move: str) -> bool:
+        """ Handles a model update after a single move.
 
         Parameters:
             move: The users input from a move prompt.
+
+        Returns:
+            True iff move was a recognised command.
         """
         # Player has attempted to move
         if move in (UP, DOWN, LEFT, RIGHT):
+            level_num = self._model.get_level_num()
+            position = self._model.get_player().get_position()
             self._model.move_player(MOVE_DELTAS.get(move))
+            if self._replay is not None and (
+                    level_num != self._model.get_level_num()
+                    or position != self._model.get_player().get_position()):
+                self._replay.record(move, self._model)
         
+        # Player has asked to undo their last action
+        elif move == UNDO_COMMAND:
+            if not self._model.undo():
+                self._show_message('\nNothing to undo!\n')
+            elif self._replay is not None:
+                self._replay.pop()
+
+        # Player has asked to rewind to an earlier move
+        elif move.split()[:1] == [REWIND_COMMAND] and move[2:].isdigit():
+            undone = self._model.rewind_to(int(move[2:]))
+            for _ in range(undone if self._replay is not None else 0):
+                self._replay.pop()
+
+        # Player has asked for a memory breakdown
+        elif move == MEMORY_COMMAND:
+            from memory_report import format_report, model_memory
+            self._show_message(format_report(model_memory(self._model)))
+
         # Player has attempted to use an item
-        elif len(move) > 1 and move.split()[0] == 'i':
+        elif len(move) > 1 and move.split()[0] == ITEM_COMMAND:
             item_name = move.partition(' ')[-1]
-            item = self._model.get_player().get_inventory().remove_item(item_name)
-            if item is not None:
-                item.apply(self._model.get_player())
-            else:
-                print('\nNo item with that name!\n')
+            if not self._model.use_item(item_name):
+                self._show_message('\nNo item with that name!\n')
+            elif self._replay is not None:
+                self._replay.record(f'i {item_name}', self._model)
     
-        # Invalid; reprompt
+        # Invalid
         else:
-            self._user_prompt()
+            return False
+        self._sample_stats()
+        return True
+
+    def _game_over(self) -> bool:
+        """ Prints the result and returns True iff the game has ended. """
+        if self._model.has_won():
+            print(WIN_MESSAGE)
+        elif self._model.has_lost():
+            print(LOSS_MESSAGE)
+        else:
+            return False
+        return True
 
     def play(self):
         """ Executes the entire game until a win or loss occurs. """
         while True:
             self._redraw()
             self._user_prompt()
-
-            if self._model.has_won():
-                print(WIN_MESSAGE)
+            if self._game_over():
                 break
-            elif self._model.has_lost():
-                print(LOSS_MESSAGE)
+
+    def play_keys(self) -> None:
+        """ Executes the game reading single keypresses from the terminal, so
+            moves need no enter key. Item and rewind keys then read the item
+            name or move number as a line. Quits on QUIT_KEY or end of input.
+        """
+        stdin = sys.stdin
+        descriptor = stdin.fileno()
+        cooked = termios.tcgetattr(descriptor)
+        try:
+            tty.setcbreak(descriptor)
+            self._redraw()
+            while True:
+                key = stdin.read(1)
+                if key in ('', QUIT_KEY):
+                    return
+                if key in (ITEM_COMMAND, REWIND_COMMAND):
+                    termios.tcsetattr(descriptor, termios.TCSADRAIN, cooked)
+                    argument = input(f'\n{key} ').strip()
+                    tty.setcbreak(descriptor)
+                    key = f'{key} {argument}'
+                if key.isspace() or not self._handle_move(key):
+                    continue
+                if self._game_over():
+                    return
+                self._redraw()
+        finally:
+            termios.tcsetattr(descriptor, termios.TCSADRAIN, cooked)
+
+    def play_script(self, stream: TextIO) -> None:
+        """ Executes the commands read from a stream (e.g. a piped file) at
+            full speed, with no prompts and a single draw at the end.
+
+        Parameters:
+            stream: Lines of commands, in the form typed at the move prompt.
+        """
+        for line_num, line in enumerate(stream, 1):
+            commands = parse_commands(line)
+            if commands is None:
+                if line.strip():
+                    print(f'Ignoring invalid line {line_num}: {line.strip()}')
+                continue
+            self._handle_batch(commands)
+            if self._model.has_won() or self._model.has_lost():
                 break
+        if not self._game_over():
+            self._redraw()
 
 def main():
     """ Entry-point to gameplay """
-    view = TextInterface()
+    if ANSI_TERMINAL and sys.stdout.isatty():
+        from terminal import AnsiInterface
+        view = AnsiInterface()
+    else:
+        view = TextInterface()
     game_file = input('Enter game file: ')
     maze_runner = MazeRunner(game_file, view)
-    maze_runner.play()
+    if not sys.stdin.isatty():
+        maze_runner.play_script(sys.stdin)
+    elif RAW_KEY_INPUT and termios is not None:
+        maze_runner.play_keys()
+    else:
+        maze_runner.play()
 
 if __name__ == '__main__':
     main()
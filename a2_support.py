@@ -62,20 +62,15 @@ class TextInterface(UserInterface):
         items: dict[tuple[int, int], 'Item'],
         player_position: tuple[int, int]
     ) -> None:
-        num_rows, num_cols = maze.get_dimensions()
-        for row in range(num_rows):
-            row_str = ''
-            for col in range(num_cols):
-                if (row, col) == player_position:
-                    row_str += PLAYER
-                elif (row, col) in items:
-                    row_str += items.get((row, col)).get_id()
-                else:
-                    row_str += maze.get_tile((row, col)).get_id()
-            print(row_str)
+        rows = [[tile.get_id() for tile in row] for row in maze.get_tiles()]
+        for (row, col), item in items.items():
+            rows[row][col] = item.get_id()
+        row, col = player_position
+        rows[row][col] = PLAYER
+        print('\n'.join(''.join(row) for row in rows))
     
     def _draw_inventory(self, inventory: 'Inventory') -> None:
-        text = str(inventory) if inventory.get_items() != {} else 'Empty'
+        text = str(inventory) if inventory.total() > 0 else 'Empty'
         print('---------------\nInventory\n' + text + '\n' + '---------------')
     
     def _draw_player_stats(self, player_stats: tuple[int, int, int]) -> None:
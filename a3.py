@@ -1,10 +1,11 @@
 import tkinter as tk
-from tkinter import Toplevel, messagebox
-from PIL import Image, ImageTk
-from typing import *
-from a2_solution import *
-from a2_support import *
-from a3_support import *
+from collections import deque
+from tkinter import Toplevel, filedialog, messagebox, simpledialog
+from typing import Callable, Union
+from a2_solution import (Apple, EnemyGrid, Honey, Inventory, Item, Maze,
+                         MazeRunner, Player, Potion, Tile, Water, load_game)
+from a2_support import UserInterface
+from a3_support import AbstractGrid
 from constants import *
 
 
@@ -18,6 +19,14 @@ STATS_COIN_POSITION = (1, 3)
 ITEM_PADDING = 7
 CONTROL_FRAME_HEIGHT = 100
 BUTTON_PADDING = 5
+FRAME_TAG = 'frame'  # Canvas items redrawn every frame
+ENEMY_TAG = 'enemy'  # Canvas items moved only when their enemy moves
+SPARKLINE_TAG = 'sparkline'  # Canvas items kept when the stats are redrawn
+MINIMAP_IMAGE_TAG = 'minimap'
+MINIMAP_PLAYER_TAG = 'player'
+MINIMAP_ITEM_ORDER = {item_id: order  # Item shown when a pixel has several
+                      for order, item_id in enumerate(ENTITY_COLOURS)}
+STAT_MAXIMUMS = (MAX_HEALTH, MAX_HUNGER, MAX_THIRST)
 
 
 # Task 1
@@ -59,7 +68,7 @@ class LevelView(AbstractGrid):
                 tile_id = (tile.get_id())
                 position = row_num, tile_num
 
-                bbox = self.get_bbox((row_num, row.index(tile)))
+                bbox = self.get_bbox(position)
 
                 colour = TILE_COLOURS[tile_id]
                 self.create_rectangle(bbox, fill=colour)
@@ -98,6 +107,63 @@ class StatsView(AbstractGrid):
         super().__init__(master, (STATS_DIMENSIONS), (width, STATS_HEIGHT),
                          **kwargs)
         self.pack(side=tk.BOTTOM, fill=tk.X)
+        # One line per stat, created on first use and then only moved
+        self._sparklines = []
+        self._sparkline_values = [deque(maxlen=SPARKLINE_POINTS)
+                                  for _ in STAT_MAXIMUMS]
+        self._drawn_history = (None, 0)  # (version, total) last drawn
+
+    def clear(self) -> None:
+        """ Clears the stats, keeping the sparklines. """
+        self.delete(f'!{SPARKLINE_TAG}')
+
+    def draw_history(self, history: 'StatsHistory') -> None:
+        """ Updates the sparklines under the HP, hunger and thirst values
+            to show their most recent history. Only samples added since the
+            last call are read, and each line is updated by shifting its
+            points along rather than being redrawn.
+
+        Args:
+            history: the player's stats history.
+        """
+        if not self._sparklines:
+            self._sparklines = [
+                self.create_line(0, 0, 0, 0, fill=SPARKLINE_COLOUR, width=2,
+                                 tags=SPARKLINE_TAG) for _ in STAT_MAXIMUMS]
+            self.tag_lower(SPARKLINE_TAG)
+
+        version, total = history.get_version(), history.get_total()
+        drawn_version, drawn_total = self._drawn_history
+        num_new = total - drawn_total
+        if version != drawn_version or not 0 <= num_new <= SPARKLINE_POINTS:
+            # Samples were removed or rewritten, so start again
+            for stat, values in enumerate(self._sparkline_values):
+                values.clear()
+                values.extend(history.get_series(stat, SPARKLINE_POINTS))
+        elif num_new == 0:
+            return
+        else:
+            for index in range(-min(num_new, len(history)), 0):
+                _, stats = history.get(index)
+                for values, stat in zip(self._sparkline_values, stats):
+                    values.append(stat)
+        self._drawn_history = (version, total)
+
+        for stat, (line, values, maximum) in enumerate(zip(
+                self._sparklines, self._sparkline_values, STAT_MAXIMUMS)):
+            left, top, right, bottom = self.get_bbox((1, stat))
+            padding = SPARKLINE_PADDING
+            left, top = left + padding, top + padding
+            right, bottom = right - padding, bottom - padding
+            step = (right - left) / (SPARKLINE_POINTS - 1)
+            x = right - step * (len(values) - 1)
+            points = []
+            for value in values:
+                points += (x, bottom - (bottom - top) * value / maximum)
+                x += step
+            if len(points) < 4:
+                points = (points or [right, bottom]) * 2
+            self.coords(line, *points)
 
     def draw_stats(self, player_stats: tuple[int, int, int]) -> None:
         """ Method to create the graphical statsview instance.
@@ -133,6 +199,7 @@ class InventoryView(tk.Frame):
         self._master = master
         self.title = tk.Label(self, text='Inventory', font=HEADING_FONT)
         self.title.pack(side=tk.TOP)
+        self._items = []  # The item labels, destroyed when cleared
 
     def set_click_callback(self, callback: Callable[[str], None]) -> None:
         """Setter method to assign a callback function to the items in the
@@ -144,10 +211,11 @@ class InventoryView(tk.Frame):
         self.callback = callback
 
     def clear(self) -> None:
-        """ clears current inventory instance by destroying all labels """
-        for widget in self.winfo_children():
-            if widget != self.title:
-                widget.destroy()
+        """ clears current inventory instance by destroying all item labels
+        """
+        for item in self._items:
+            item.destroy()
+        self._items = []
 
     def _draw_item(self, name: str, num: int, colour: str) -> None:
         """ Draws a single item by making a label and setting a bind to it.
@@ -160,6 +228,7 @@ class InventoryView(tk.Frame):
         if name != 'Coin':  # method does not draw coins
             item = tk.Label(self, text=f'{name}: {num}', bg=colour)
             item.pack(side=tk.TOP, ipady=ITEM_PADDING, fill=tk.X)
+            self._items.append(item)
 
             item.bind('<Button-1>', lambda e: self.callback(name))
 
@@ -170,13 +239,146 @@ class InventoryView(tk.Frame):
         Args:
             inventory (Inventory): _description_
         """
-        for item in inventory.get_items().keys():
-            num = len(inventory.get_items()[item])
-            item_id = (inventory.get_items()[item][0]).get_id()
+        for item, num in inventory.get_counts().items():
+            item_id = inventory.get_item(item).get_id()
             colour = ENTITY_COLOURS[item_id]
             self._draw_item(item, num, colour)
 
 
+class MinimapView(tk.Canvas):
+    """ Class for a map of the whole level: its tiles, doors, remaining items
+        and the player. The map is one image, built once per level with a
+        block of pixels per cell, or a pixel per block of cells for levels
+        larger than the map. After that, a move only repaints the pixel of a
+        collected item and moves the player's dot, so its cost does not
+        depend on the size of the level.
+    """
+
+    def __init__(self, master: Union[tk.Tk, tk.Frame],
+                 size: int = MINIMAP_SIZE, **kwargs) -> None:
+        """ Constructor for the MinimapView class. Packs an empty map.
+
+        Args:
+            master: frame to pack the map in.
+            size: the most pixels along each side of the map.
+        """
+        super().__init__(master, width=size, height=size,
+                         highlightthickness=0, **kwargs)
+        self.pack(side=tk.BOTTOM, pady=BUTTON_PADDING)
+        self._size = size
+        self._maze = None  # The maze the image was built for
+        self._image = None
+        self._scale = self._step = 1  # Pixels per cell or cells per pixel
+        self._tile_colours = []  # The colour of each pixel under its items
+        self._doors = set()  # Pixels holding a door
+        self._drawn = {}  # Maps the positions of items drawn to their ids
+        self._counts = {}  # The number of each kind of item on each pixel
+        self.create_image(0, 0, anchor=tk.NW, tags=MINIMAP_IMAGE_TAG)
+        self.create_oval(0, 0, 0, 0, fill=ENTITY_COLOURS[PLAYER], width=0,
+                         tags=MINIMAP_PLAYER_TAG)
+
+    def clear(self) -> None:
+        """ Forgets the current map, so that the next draw builds it again
+            (e.g. after loading a save with other items collected).
+        """
+        self._maze = None
+
+    def _pixel(self, position: tuple[int, int]) -> tuple[int, int]:
+        """ Returns the (row, column) of the pixel block showing a cell. """
+        row, col = position
+        return row // self._step, col // self._step
+
+    def _colour(self, pixel: tuple[int, int]) -> str:
+        """ Returns the colour of a pixel: a door, or else the first kind of
+            item left on it in ENTITY_COLOURS order, or else its tile.
+        """
+        if pixel in self._doors:
+            return TILE_COLOURS[DOOR]
+        counts = self._counts.get(pixel)
+        if counts:
+            return ENTITY_COLOURS[min(counts, key=MINIMAP_ITEM_ORDER.get)]
+        row, col = pixel
+        return self._tile_colours[row][col]
+
+    def _paint(self, pixel: tuple[int, int]) -> None:
+        """ Fills the block of pixels at (row, column) with its colour. """
+        row, col = pixel
+        scale = self._scale
+        self._image.put(self._colour(pixel),
+                        to=(col * scale, row * scale,
+                            (col + 1) * scale, (row + 1) * scale))
+
+    def _build(self, maze: Maze,
+               items: dict[tuple[int, int], Item]) -> None:
+        """ Builds the image of a level. Each pixel shows the first cell of
+            its block of cells, then doors and items are drawn over it.
+        """
+        rows, columns = maze.get_dimensions()
+        longest = max(rows, columns, 1)
+        self._scale = max(1, self._size // longest)
+        self._step = -(-longest // self._size)
+        step = self._step
+        tiles = maze.get_tiles()
+        self._tile_colours = [[TILE_COLOURS[tile.get_id()]
+                               for tile in row[::step]]
+                              for row in tiles[::step]]
+        self._doors = {self._pixel(position)
+                       for position in maze.get_doors()}
+        self._drawn = {position: item.get_id()
+                       for position, item in items.items()}
+        self._counts = {}
+        for position, item_id in self._drawn.items():
+            counts = self._counts.setdefault(self._pixel(position), {})
+            counts[item_id] = counts.get(item_id, 0) + 1
+
+        colours = [list(row) for row in self._tile_colours]
+        for pixel in self._doors | self._counts.keys():
+            colours[pixel[0]][pixel[1]] = self._colour(pixel)
+
+        scale = self._scale
+        height, width = len(colours) * scale, len(colours[0]) * scale
+        self._image = tk.PhotoImage(width=width, height=height)
+        self._image.put(' '.join(
+            '{' + ' '.join(colour for colour in row for _ in range(scale))
+            + '}' for row in colours for _ in range(scale)))
+        self.itemconfigure(MINIMAP_IMAGE_TAG, image=self._image)
+        self.configure(width=width, height=height)
+        self._maze = maze
+
+    def draw(self, maze: Maze, items: dict[tuple[int, int], Item],
+             player_position: tuple[int, int]) -> None:
+        """ Draws the map. The image is built when the level changes, or
+            when items other than the player's were collected or restored
+            (e.g. by an undo or a jump through a replay); otherwise only the
+            player's cell can have changed, by the player collecting its item.
+
+        Args:
+            maze: the current maze.
+            items: dictionary of the items remaining, keys are positions.
+            player_position: current position of the player.
+        """
+        if maze is not self._maze:
+            self._build(maze, items)
+        pixel = self._pixel(player_position)
+        if player_position in self._drawn and player_position not in items:
+            counts = self._counts[pixel]
+            item_id = self._drawn.pop(player_position)
+            counts[item_id] -= 1
+            if not counts[item_id]:
+                del counts[item_id]
+                self._paint(pixel)
+        if len(self._drawn) != len(items):
+            # Within a level the items left only shrink going forwards and
+            # grow going back, so the same number means the same items
+            self._build(maze, items)
+
+        row, col = pixel
+        radius = max(self._scale, MINIMAP_DOT) / 2
+        x, y = (col + 0.5) * self._scale, (row + 0.5) * self._scale
+        self.coords(MINIMAP_PLAYER_TAG, x - radius, y - radius,
+                    x + radius, y + radius)
+
+
 class GraphicalInterface(UserInterface):
     """ Class for crearing the basic GUI. Instantiates a LevelView, StatsView
         and InventoryView """
@@ -198,6 +400,7 @@ class GraphicalInterface(UserInterface):
         self.level = None
         self.stat = None
         self.inventory = None
+        self.minimap = None
 
     def create_interface(self, dimensions: tuple[int, int]) -> None:
         """ Instanticates the different views. Packs InventoryView and 
@@ -215,6 +418,8 @@ class GraphicalInterface(UserInterface):
         self.stat = StatsView(self._master, (MAZE_WIDTH + INVENTORY_WIDTH),
                               bg=THEME_COLOUR)
         self.inventory = InventoryView(self.frame)
+        if MINIMAP_SIZE > 0:
+            self.minimap = MinimapView(self.inventory)
 
     def clear_all(self) -> None:
         """ Method to clear everything in order to redraw. """
@@ -224,17 +429,15 @@ class GraphicalInterface(UserInterface):
             self.inventory.clear()
 
     def set_maze_dimensions(self, dimensions: tuple[int, int]) -> None:
-        """ Method to create a new maze, with new dimensions. Used for
-            processing level_up.
+        """ Method to resize the maze grid to new dimensions. Used for
+            processing level_up. The existing widgets are kept.
 
         Args:
             dimensions: new dimensionf for maze.
         """
-        self.level.destroy()
-        self.stat.destroy()
-        self.inventory.destroy()
-        self.frame.destroy()
-        self.create_interface(dimensions)
+        self._dimensions = dimensions
+        self.level.clear()
+        self.level.set_dimensions(dimensions)
 
     def bind_keypress(self, command: Callable[[tk.Event], None]) -> None:
         """ Sets a function to a keypress
@@ -306,8 +509,7 @@ class GraphicalInterface(UserInterface):
         Returns:
             int: number of coins
         """
-        items = inventory.get_items()
-        return len(items.get("Coin", [],))
+        return inventory.count("Coin")
 
     def _draw_level(self, maze: Maze, items: dict[tuple[int, int], Item],
                     player_position: tuple[int, int]) -> None:
@@ -329,6 +531,31 @@ class GraphicalInterface(UserInterface):
         self.stat.clear()
         self.stat.draw_stats(player_stats)
 
+    def draw_stats_history(self, history: 'StatsHistory') -> None:
+        """ Draws the recent history of the player's stats.
+
+        Args:
+            history: the player's stats history.
+        """
+        self.stat.draw_history(history)
+
+    def draw_minimap(self, maze: Maze, items: dict[tuple[int, int], Item],
+                     player_position: tuple[int, int]) -> None:
+        """ Draws the minimap, if there is one.
+
+        Args:
+            maze: the current maze.
+            items: dictionary of the items remaining, keys are positions.
+            player_position: current position of the player.
+        """
+        if self.minimap is not None:
+            self.minimap.draw(maze, items, player_position)
+
+    def clear_minimap(self) -> None:
+        """ Makes the minimap rebuild its image when next drawn. """
+        if self.minimap is not None:
+            self.minimap.clear()
+
 
 class GraphicalMazeRunner(MazeRunner):
     """ Controller class for the game. In charge of gameplay and event
@@ -342,9 +569,24 @@ class GraphicalMazeRunner(MazeRunner):
         self._master = root
         self._player = self._model.get_player()
         self._view = GraphicalInterface(root)
+        if STATS_HISTORY_SIZE > 0:
+            self.track_stats(STATS_HISTORY_SIZE)
+
+    def start_endless(self, seed: int, max_size: int = ENDLESS_MAX_SIZE
+                      ) -> None:
+        """ Starts endless mode, with levels no larger than can be drawn
+            with cells of at least MIN_CELL_SIZE pixels.
+
+        Args:
+            seed: the seed the generated levels are made from.
+            max_size: the largest number of rows or columns in a level.
+        """
+        super().start_endless(seed, min(
+            max_size, min(MAZE_WIDTH, MAZE_HEIGHT) // MIN_CELL_SIZE))
 
     def _handle_keypress(self, e: tk.Event) -> None:
-        """ Handles the keypress event. Ignores all keys apart from 'WASD'.
+        """ Handles the keypress event. Ignores all keys apart from 'WASD' and
+            the undo key.
 
         Args:
             e: Event that triggers the player movement.
@@ -372,6 +614,56 @@ class GraphicalMazeRunner(MazeRunner):
             self._redraw()
             self._view.set_inventory_callback(self._apply_item)
 
+        elif e.char == UNDO_COMMAND:
+            level_num = self._model.get_level_num()
+            self._handle_move(UNDO_COMMAND)
+            self._refresh(level_num)
+
+    def _refresh(self, previous_level: int) -> None:
+        """ Redraws the game after its state jumped (e.g. an undo), rebuilding
+            the maze if the level changed.
+
+        Args:
+            previous_level: the level number before the jump.
+        """
+        if self._model.get_level_num() != previous_level:
+            self._view.set_maze_dimensions(
+                self._model.get_current_maze().get_dimensions())
+        self._sample_stats()
+        self._redraw()
+        self._view.set_inventory_callback(self._apply_item)
+
+    def _redraw(self) -> None:
+        """ Redraws the game, including the minimap and the stats history if
+            tracked.
+        """
+        super()._redraw()
+        self._draw_minimap()
+        self._draw_stats_history()
+
+    def _draw_minimap(self) -> None:
+        """ Updates the minimap from the level's items, without enemies. """
+        self._view.draw_minimap(self._model.get_current_maze(),
+                                self._model.get_current_items(),
+                                self._model.get_player().get_position())
+
+    def _draw_stats_history(self) -> None:
+        """ Updates the stats sparklines, if the stats are being tracked. """
+        if self._stats_history is not None:
+            self._view.draw_stats_history(self._stats_history)
+
+    def rewind_game(self) -> None:
+        """ Asks for a move number and rewinds the game back to just after
+            that move, as far as the undo history allows.
+        """
+        num_moves = simpledialog.askinteger(
+            "Rewind", "Rewind to move:", parent=self._master, minvalue=0,
+            maxvalue=self._model.get_num_moves())
+        if num_moves is not None:
+            level_num = self._model.get_level_num()
+            self._handle_move(f'{REWIND_COMMAND} {num_moves}')
+            self._refresh(level_num)
+
     def _apply_item(self, item_name: str) -> None:
         """ Method to implement the use of an item and then remove it from
             inventory.
@@ -384,12 +676,20 @@ class GraphicalMazeRunner(MazeRunner):
         # checks if the item name is in the set of applyable items
         for item in [Potion(pos), Water(pos), Honey(pos), Apple(pos)]:
             if (item.get_name()).lower() == item_name.lower():
-                item.apply(self._player)
-                self._player.get_inventory().remove_item(item_name)
+                self._handle_move(f'i {item_name}')
 
         self._redraw()
         self._view.set_inventory_callback(self._apply_item)
 
+    def show_memory_report(self) -> None:
+        """ Shows a breakdown of the memory used by the game and its views. """
+        from memory_report import (format_report, interface_memory,
+                                   model_memory)
+        report = model_memory(self._model)
+        report['interface'] = interface_memory(self._view)
+        messagebox.showinfo(title="Memory report",
+                            message=format_report(report))
+
     def play(self) -> None:
         """ Method to handle the gameplay."""
         self._view.clear_all()
@@ -398,16 +698,92 @@ class GraphicalMazeRunner(MazeRunner):
         self._view.bind_keypress(self._handle_keypress)
 
         self._view.draw(self._model.get_current_maze(),
-                        self._model.get_current_items(),
+                        self._get_drawn_items(),
                         self._model.get_level().get_player_start(),
                         self._model.get_player_inventory(),
                         (self._model.get_player_stats()))
+        self._draw_minimap()
+        self._draw_stats_history()
 
 
 # Task 2
 class ImageLevelView(LevelView):
     """ LevelView class to account for images, inherits from LevelView"""
 
+    def __init__(self, master: Union[tk.Tk, tk.Frame],
+                 dimensions: tuple[int, int],
+                 size: tuple[int, int], **kwargs) -> None:
+        """ Constructor for ImageLevelView. No background is set, so every
+            tile is drawn individually until one is.
+
+        Args:
+            master: the master frame for this Canvas.
+            dimensions: (#rows, #columns)
+            size: (width in pixels, height in pixels)
+        """
+        super().__init__(master, dimensions, size, **kwargs)
+        self._background = None
+        self._doors = []
+        self._enemies = None
+        self._drawn_enemies = None  # The grid that _enemy_images show
+        self._enemy_images = []  # Canvas item of each enemy, in grid order
+        self._enemy_positions = []  # Position each enemy is drawn at
+        self._enemy_size = None  # Cell size the enemy images are drawn at
+
+    def set_background(self, background: 'ImageTk.PhotoImage',
+                       doors: list[tuple[int, int]]) -> None:
+        """ Sets a prepared image of every tile but the doors, which is drawn
+            in place of the individual tiles.
+
+        Args:
+            background: the composited tiles, sized to fill the grid.
+            doors: positions of the doors, which are drawn over it.
+        """
+        self._background = background
+        self._doors = doors
+
+    def set_enemies(self, enemies: EnemyGrid) -> None:
+        """ Sets the enemies drawn over the tiles and items. Over a
+            background, their canvas items are kept between frames and only
+            moved when their enemy moves.
+
+        Args:
+            enemies: the enemies on the level being drawn.
+        """
+        self._enemies = enemies
+
+    def clear(self) -> None:
+        """ Clears everything off the canvas, including the enemies. """
+        super().clear()
+        self._drawn_enemies = None
+        self._enemy_images = []
+        self._enemy_positions = []
+
+    def _draw_enemies(self) -> None:
+        """ Moves the canvas item of each enemy that moved since the last
+            frame, recreating them all if the enemies or cell size changed.
+        """
+        enemies = self._enemies.get_enemies()
+        if self._enemies is not self._drawn_enemies or \
+                self._enemy_size != self.get_cell_size():
+            self.delete(ENEMY_TAG)
+            self._drawn_enemies = self._enemies
+            self._enemy_size = self.get_cell_size()
+            self._enemy_positions = [enemy.get_position() for enemy in enemies]
+            self._enemy_images = [
+                self.create_image(self.get_midpoint(position), tags=ENEMY_TAG,
+                                  image=self.images[enemy.get_id()])
+                for enemy, position in zip(enemies, self._enemy_positions)
+            ]
+            return
+
+        for index, enemy in enumerate(enemies):
+            position = enemy.get_position()
+            if position != self._enemy_positions[index]:
+                self._enemy_positions[index] = position
+                self.coords(self._enemy_images[index],
+                            *self.get_midpoint(position))
+
     def draw(self, tiles: list[list[Tile]], items: dict[tuple[int, int], Item],
              player_pos: tuple[int, int]) -> None:
         """ Draws the level with the correct image representation of each tile.
@@ -417,32 +793,33 @@ class ImageLevelView(LevelView):
             items: dictionary of item postions and mappings in the maze.
             player_pos: player position (row, col).
         """
-        self.clear()
-
-        # loads all images into dictionary and resizes them
-        self.images = {
-            WALL: ImageTk.PhotoImage(Image.open("images/wall.png")\
-                .resize(self.get_cell_size())),
-            EMPTY: ImageTk.PhotoImage(Image.open('images/grass.png')\
-                .resize(self.get_cell_size())),
-            LAVA: ImageTk.PhotoImage(Image.open('images/lava.png')\
-                .resize(self.get_cell_size())),
-            DOOR: ImageTk.PhotoImage(Image.open('images/door.png')\
-                .resize(self.get_cell_size())),
-            COIN: ImageTk.PhotoImage(Image.open('images/coin.png')\
-                .resize(self.get_cell_size())),
-            POTION: ImageTk.PhotoImage(Image.open('images/potion.png')\
-                .resize(self.get_cell_size())),
-            HONEY: ImageTk.PhotoImage(Image.open('images/honey.png')\
-                .resize(self.get_cell_size())),
-            APPLE: ImageTk.PhotoImage(Image.open('images/apple.png')\
-                .resize(self.get_cell_size())),
-            WATER: ImageTk.PhotoImage(Image.open('images/water.png')\
-                .resize(self.get_cell_size())),
-            PLAYER: ImageTk.PhotoImage(Image.open('images/player.png')\
-                .resize(self.get_cell_size())),
-        }
+        # Sprites come pre-resized from the atlas (Pillow is imported there)
+        from assets import get_atlas
+        self.images = get_atlas().get_photo_images(self.get_cell_size())
+
+        if self._background is not None:
+            self.delete(FRAME_TAG)
+            self.create_image(0, 0, anchor=tk.NW, image=self._background,
+                              tags=FRAME_TAG)
+            for row_num, col_num in self._doors:
+                tile_id = tiles[row_num][col_num].get_id()
+                if tile_id == DOOR:
+                    self.create_image(self.get_midpoint((row_num, col_num)),
+                                      image=self.images[tile_id],
+                                      tags=FRAME_TAG)
+            for position, item in items.items():
+                self.create_image(self.get_midpoint(position),
+                                  image=self.images[item.get_id()],
+                                  tags=FRAME_TAG)
+            # Enemies go above the tiles and items but below the player
+            self.tag_lower(FRAME_TAG)
+            if self._enemies is not None:
+                self._draw_enemies()
+            self.create_image(self.get_midpoint(player_pos),
+                              image=self.images[PLAYER], tags=FRAME_TAG)
+            return
 
+        self.clear()
         for row_num, row in enumerate(tiles):
             for tile_num, tile in enumerate(row):
                 tile_id = (tile.get_id())
@@ -457,11 +834,11 @@ class ImageLevelView(LevelView):
                     self.create_image(
                         position_cords, image=self.images[item_id])
 
-                if position == player_pos:
-                    player = Player(position)
-
-                    self.create_image(
-                        position_cords, image=self.images[player.get_id()])
+        # Enemies go above the tiles and items but below the player
+        if self._enemies is not None:
+            self._draw_enemies()
+        self.create_image(self.get_midpoint(player_pos),
+                          image=self.images[PLAYER])
 
 
 class ControlsFrame(tk.Frame):
@@ -500,6 +877,16 @@ class ControlsFrame(tk.Frame):
 
         self._master.after(1000, self.increment_timer)
 
+    def reset_timer(self) -> None:
+        """ Method to set the timer back to zero. """
+        self.mins = 0
+        self.secs = 0
+        self.timer.config(text=f'{self.mins}m {self.secs}s')
+
+    def get_elapsed(self) -> int:
+        """ Returns the time shown on the timer in seconds. """
+        return self.mins * 60 + self.secs
+
     def increment_timer(self) -> None:
         """ Method to create add functionality of a timer. """
         if self.secs <= 59:
@@ -544,47 +931,364 @@ class ImageGraphicalMazeRunner(GraphicalMazeRunner):
         self._view = ImageGraphicalInterface(root)
         self._controls_frame = ControlsFrame(self._master, self)
 
+        # Decode the sprite atlas now. Each level's sprites and background
+        # are prepared on a worker thread while the level before it is played
+        from assets import LevelPrefetcher, get_atlas
+        self._prefetcher = LevelPrefetcher(get_atlas(),
+                                           (MAZE_WIDTH, MAZE_HEIGHT))
+        self._background_level = None
+        self._prefetcher.prefetch(0, self._model.get_levels()[0].get_maze())
+        self._autosaver = None
+        if AUTOSAVE_INTERVAL > 0:
+            from snapshot import Autosaver
+            self._autosaver = Autosaver(AUTOSAVE_FILE)
+        self._playback = None
+        self._replay_delay = REPLAY_DELAY
+        if RECORD_REPLAYS:
+            self.start_recording()
+        self._history = None
+        if RECORD_HISTORY:
+            from history import RunHistory
+            self._history = RunHistory()
+        self._library_fill = 0  # Counts the New Game picker's fills
+
+    def _handle_keypress(self, e: tk.Event) -> None:
+        """ Handles the keypress event. While a replay is playing, only the
+            playback controls respond: '+' and '-' change the speed and 'g'
+            jumps to an action.
+
+        Args:
+            e: Event that triggers the player movement.
+        """
+        if self._playback is None:
+            super()._handle_keypress(e)
+        elif e.char == '+':
+            self._replay_delay = max(MIN_REPLAY_DELAY, self._replay_delay // 2)
+        elif e.char == '-':
+            self._replay_delay = min(MAX_REPLAY_DELAY, self._replay_delay * 2)
+        elif e.char == 'g':
+            self.seek_replay()
+
+    def _handle_move(self, move: str) -> bool:
+        """ Handles a move, autosaving every AUTOSAVE_INTERVAL moves unless a
+            replay is playing.
+
+        Args:
+            move: the move or item command to handle.
+
+        Returns:
+            True iff move was a recognised command.
+        """
+        previous_moves = self._model.get_num_moves()
+        handled = super()._handle_move(move)
+        num_moves = self._model.get_num_moves()
+        if self._autosaver is not None and self._playback is None \
+                and num_moves != previous_moves \
+                and num_moves % AUTOSAVE_INTERVAL == 0:
+            self._autosaver.submit(self._model.snapshot())
+        if self._history is not None and self._playback is None and (
+                self._model.has_won() or self._model.has_lost()):
+            self._record_run()
+        return handled
+
+    def _record_run(self) -> None:
+        """ Queues the game that just ended to be added to the history. """
+        from history import RunRecord
+        replay = None
+        if HISTORY_REPLAYS and self._replay is not None:
+            replay = self._replay.encode()
+        self._history.record(RunRecord.from_model(
+            self._model, self._controls_frame.get_elapsed(), replay))
+
+    def show_leaderboard(self) -> None:
+        """ Shows the best runs of this game once the history has found
+            them.
+        """
+        if self._history is None:
+            messagebox.showinfo(title="Leaderboard",
+                                message="Run history is turned off")
+            return
+        self._show_leaderboard(
+            self._history.leaderboard(self._model.get_game_hash()))
+
+    def _show_leaderboard(self, future: 'Future') -> None:
+        """ Shows a leaderboard query's results when it has finished,
+            checking again every HISTORY_POLL ms until then.
+
+        Args:
+            future: the leaderboard query.
+        """
+        if not future.done():
+            self._master.after(HISTORY_POLL, self._show_leaderboard, future)
+            return
+        from history import format_leaderboard
+        try:
+            message = format_leaderboard(future.result())
+        except Exception as error:
+            message = f"Could not read the history: {error}"
+        messagebox.showinfo(title="Leaderboard", message=message)
+
+    def _redraw(self) -> None:
+        """ Redraws the game over the current level's background. """
+        self._use_background()
+        super()._redraw()
+
+    def _get_drawn_items(self) -> dict[tuple[int, int], Item]:
+        """ Returns the items on the current level. Enemies are drawn
+            separately (see ImageLevelView.set_enemies).
+        """
+        return self._model.get_current_items()
+
+    def _use_background(self) -> None:
+        """ Gives the level view the current level's prepared background and,
+            after a level change, starts preparing the next level.
+        """
+        level_num = self._model.get_level_num()
+        maze = self._model.get_current_maze()
+        self._view.level.set_background(
+            self._prefetcher.get_photo(level_num, maze), maze.get_doors())
+        self._view.level.set_enemies(self._model.get_current_enemies())
+        if level_num == self._background_level:
+            return
+
+        self._background_level = level_num
+        # The first level is kept for restarts
+        self._prefetcher.keep((0, level_num, level_num + 1))
+        self._finish_prefetch(level_num + 1)
+
+    def _finish_prefetch(self, level_num: int) -> None:
+        """ Prepares the next level ahead of time: in endless mode, adds it
+            to the game once it has been generated, then converts its images
+            for Tk once the worker has prepared them, so the level up itself
+            only swaps images.
+
+        Args:
+            level_num: the level being prefetched.
+        """
+        if level_num != self._background_level + 1:
+            return  # The game moved on before the level was ready
+        if not self._model.prepare_level(level_num):
+            if self._model.is_endless():
+                self._master.after(PREFETCH_POLL, self._finish_prefetch,
+                                   level_num)
+            return  # Otherwise this is the last level
+        self._prefetcher.prefetch(
+            level_num, self._model.get_levels()[level_num].get_maze())
+        if not self._prefetcher.is_ready(level_num):
+            self._master.after(PREFETCH_POLL, self._finish_prefetch,
+                               level_num)
+            return
+
+        from assets import get_atlas
+        maze = self._model.get_levels()[level_num].get_maze()
+        self._prefetcher.get_photo(level_num, maze)
+        get_atlas().get_photo_images(self._prefetcher.get_cell_size(maze))
+
     def restart_game(self) -> None:
         """ Functionality for the restart option on file menu and the restart
-            button in controls frame. Destroys all widges and creates an new
-            game.
+            button in controls frame. Resets the game in place, keeping the
+            existing widgets and images, and stops any replay playing.
         """
+        level_num = self._model.get_level_num()
+        self._playback = None
+        self._model.reset()
+        if RECORD_REPLAYS:
+            self.start_recording()
+        self._controls_frame.reset_timer()
+        self._refresh(level_num)
+
+    def _reload_game(self) -> None:
+        """ Destroys all widgets and creates a new game from GAME_FILE. """
+        if self._autosaver is not None:
+            self._autosaver.close()
+        if self._history is not None:
+            self._history.close()
+        self._prefetcher.close()
+        self._model.set_level_source(None)
+
         for widget in self._master.winfo_children():
             widget.destroy()
 
         play_game(self._master)
 
     def new_game(self) -> None:
-        """ Functionality for New Game button in controller frame. Asks for a
-            game file and then attempts to open the game. If the file is not
-            valid reurns none.
+        """ Functionality for New Game button in controller frame. Shows the
+            games in GAME_LIBRARY_DIR with their levels, sizes, coins and a
+            thumbnail, above an entry for the game file. Selecting a game
+            fills in the entry, and double-clicking it opens the game.
+
+            The library comes from its catalog (see catalog.py), which is
+            loaded and refreshed on a worker thread. The saved catalog is
+            listed first, then the refreshed one if anything has changed.
         """
-        self.window = Toplevel()
-        self.window.title("Enter New Game File")
-        self.window.geometry("300x40")
+        from concurrent.futures import Future
+        from threading import Thread
+        from tkinter import ttk
 
-        self.new_game_prompt = tk.Entry(self.window)
+        self.window = Toplevel()
+        self.window.title("New Game")
+
+        library = tk.Frame(self.window)
+        library.pack(side=tk.TOP, expand=tk.TRUE, fill=tk.BOTH)
+        tree = ttk.Treeview(library, columns=('levels', 'sizes', 'coins'),
+                            selectmode=tk.BROWSE)
+        for column, heading, width in (('#0', 'Game', 160),
+                                       ('levels', 'Levels', 50),
+                                       ('sizes', 'Sizes', 140),
+                                       ('coins', 'Coins', 50)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width, stretch=column == 'sizes')
+        scrollbar = tk.Scrollbar(library, command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side=tk.LEFT, expand=tk.TRUE, fill=tk.BOTH)
+        scrollbar.pack(side=tk.LEFT, fill=tk.Y)
+        self._thumbnail = tk.Label(library)
+        self._thumbnail.pack(side=tk.LEFT, padx=BUTTON_PADDING)
+        tree.bind('<<TreeviewSelect>>', self._select_game)
+        tree.bind('<Double-1>', lambda e: self.new_game_file())
+
+        prompt = tk.Frame(self.window)
+        prompt.pack(side=tk.TOP, fill=tk.X)
+        self._library_status = tk.Label(
+            prompt, text=f"Scanning {GAME_LIBRARY_DIR}...")
+        self._library_status.pack(side=tk.LEFT)
+        self.new_game_prompt = tk.Entry(prompt)
         self.new_game_prompt.pack(side=tk.LEFT, expand=tk.TRUE, fill=tk.X)
+        self.new_game_prompt.bind('<Return>', lambda e: self.new_game_file())
 
-        Enter = tk.Button(self.window, text='Enter',
+        Enter = tk.Button(prompt, text='Enter',
                           command=self.new_game_file)
         Enter.pack(side=tk.RIGHT, padx=15)
 
-    def new_game_file(self) -> None:
-        """ Command function for the enter button. Attempts to run game. """
-        game_file = self.new_game_prompt.get()
-        global GAME_FILE
-        GAME_FILE = f'{game_file}'
+        self._library_games = {}
+        self._library_size = 0
+        loaded, refreshed = Future(), Future()
+
+        def scan() -> None:
+            from catalog import Catalog
+            try:
+                catalog = Catalog()
+                loaded.set_result(catalog.get_games())
+                changed = any(catalog.refresh())
+                refreshed.set_result(catalog.get_games() if changed else None)
+            except Exception as error:
+                for future in (loaded, refreshed):
+                    if not future.done():
+                        future.set_exception(error)
+
+        Thread(target=scan, daemon=True).start()
+        self._poll_library(tree, loaded, refreshed)
+
+    def _poll_library(self, tree: 'ttk.Treeview', future: 'Future',
+                      next_future: 'Future' = None) -> None:
+        """ Lists the games a catalog future finds once it has finished,
+            checking again every LIBRARY_POLL ms until then, and then waits
+            on the next future if there is one.
 
+        Args:
+            tree: the library's list of games.
+            future: a future of the games to list, or of None to keep those
+                    listed.
+            next_future: a future to wait on after this one.
+        """
+        if not tree.winfo_exists():
+            return
+        if not future.done():
+            self._master.after(LIBRARY_POLL, self._poll_library, tree,
+                               future, next_future)
+            return
         try:
-            ImageGraphicalMazeRunner(GAME_FILE, self._master)
-            self.restart_game()
+            games = future.result()
+        except OSError as error:
+            self._library_status.configure(
+                text=f"Could not read {GAME_LIBRARY_DIR}: {error.strerror}")
+            return
+        if games is not None:
+            self._library_fill += 1
+            self._fill_library(tree, games, self._library_fill)
+            self._library_size = len(games)
+        status = f"{self._library_size} games"
+        if next_future is not None:
+            status += ", checking for changes..."
+        self._library_status.configure(text=status)
+        if next_future is not None:
+            self._poll_library(tree, next_future)
+
+    def _fill_library(self, tree: 'ttk.Treeview', games: list['GameInfo'],
+                      fill: int, start: int = 0) -> None:
+        """ Replaces the games listed, adding LIBRARY_CHUNK games per Tk
+            callback so that a large library never stalls the window.
 
-        except:
+        Args:
+            tree: the library's list of games.
+            games: the games to list.
+            fill: the number of this fill. A fill stops once another starts.
+            start: the index of the next game to add.
+        """
+        if fill != self._library_fill or not tree.winfo_exists():
+            return
+        if start == 0:
+            tree.delete(*tree.get_children())
+            self._library_games = {}
+        for info in games[start:start + LIBRARY_CHUNK]:
+            self._library_games[info.name] = info
+            sizes = ', '.join(f'{rows}x{columns}'
+                              for rows, columns in info.dimensions)
+            tree.insert('', tk.END, iid=info.name, text=info.name,
+                        values=(info.get_num_levels(), sizes,
+                                info.get_total_coins()))
+        if start + LIBRARY_CHUNK < len(games):
+            self._master.after(1, self._fill_library, tree, games, fill,
+                               start + LIBRARY_CHUNK)
+
+    def _select_game(self, e: tk.Event) -> None:
+        """ Fills in the game file and shows the thumbnail of the game
+            selected in the library.
+
+        Args:
+            e: the library's selection event.
+        """
+        selection = e.widget.selection()
+        if not selection:
+            return
+        info = self._library_games[selection[0]]
+        self.new_game_prompt.delete(0, tk.END)
+        self.new_game_prompt.insert(0, f'{GAME_LIBRARY_DIR}/{info.name}')
+
+        rows = info.thumbnail
+        width = max(map(len, rows), default=0)
+        if not width:
+            self._thumbnail.configure(image='')
+            return
+        colours = {**TILE_COLOURS, **ENTITY_COLOURS}
+        image = tk.PhotoImage(width=width, height=len(rows))
+        image.put(' '.join(
+            '{' + ' '.join(colours.get(cell, TILE_COLOURS[EMPTY])
+                           for cell in row.ljust(width)) + '}'
+            for row in rows))
+        self._thumbnail_image = image.zoom(
+            max(1, THUMBNAIL_SIZE // max(width, len(rows))))
+        self._thumbnail.configure(image=self._thumbnail_image)
+
+    def new_game_file(self) -> None:
+        """ Command function for the enter button. Checks that the file holds
+            a game, then restarts with it.
+        """
+        game_file = self.new_game_prompt.get()
+        try:
+            valid = bool(load_game(game_file))
+        except Exception:
+            valid = False
+        if not valid:
             mbox = messagebox.showinfo(
                 title="Game file not valid",
                 message="Game file not valid")
             self.window.destroy()
+            return
+
+        global GAME_FILE
+        GAME_FILE = f'{game_file}'
+        self._reload_game()
 
     def quit_game(self) -> None:
         """ Method to terminate the window after confirmation. """
@@ -595,12 +1299,115 @@ class ImageGraphicalMazeRunner(GraphicalMazeRunner):
             self._master.destroy()
 
     def save_game(self) -> None:
-        """ Method to save the progress of the game. """
-        pass
-    
+        """ Method to save the progress of the game to a file chosen by the
+            user.
+        """
+        filename = filedialog.asksaveasfilename(
+            defaultextension=SAVE_EXTENSION,
+            filetypes=[("MazeRunner saves", f"*{SAVE_EXTENSION}")])
+        if not filename:
+            return
+
+        from snapshot import write_atomic
+        try:
+            write_atomic(filename, self._model.snapshot().encode())
+        except OSError as error:
+            messagebox.showerror(title="Save failed", message=str(error))
+
     def load_game(self) -> None:
-        """ Method to load a saved game. """
-        pass
+        """ Method to load a saved game of the current game file. Stops any
+            replay playing and starts a new recording from the loaded state.
+        """
+        filename = filedialog.askopenfilename(
+            filetypes=[("MazeRunner saves", f"*{SAVE_EXTENSION}")])
+        if not filename:
+            return
+
+        from snapshot import read_snapshot
+        level_num = self._model.get_level_num()
+        try:
+            self._model.restore(read_snapshot(filename))
+        except (OSError, ValueError) as error:
+            messagebox.showerror(title="Load failed", message=str(error))
+            return
+        self._playback = None
+        self._view.clear_minimap()
+        if RECORD_REPLAYS:
+            self.start_recording()
+        self._refresh(level_num)
+
+    def save_replay(self) -> None:
+        """ Method to save the recording of this session to a file chosen by
+            the user.
+        """
+        if self._replay is None:
+            messagebox.showinfo(title="Save replay",
+                                message="This session is not being recorded")
+            return
+        filename = filedialog.asksaveasfilename(
+            defaultextension=REPLAY_EXTENSION,
+            filetypes=[("MazeRunner replays", f"*{REPLAY_EXTENSION}")])
+        if not filename:
+            return
+
+        from replay import save_replay
+        try:
+            save_replay(filename, self._replay)
+        except OSError as error:
+            messagebox.showerror(title="Save failed", message=str(error))
+
+    def play_replay(self) -> None:
+        """ Method to play back a replay of the current game file, one action
+            every few milliseconds. Recording pauses during playback.
+        """
+        filename = filedialog.askopenfilename(
+            filetypes=[("MazeRunner replays", f"*{REPLAY_EXTENSION}")])
+        if not filename:
+            return
+
+        from replay import ReplayPlayer, load_replay
+        level_num = self._model.get_level_num()
+        recording = self.stop_recording()
+        try:
+            self._playback = ReplayPlayer(load_replay(filename), self)
+        except (OSError, ValueError) as error:
+            self._replay = recording
+            messagebox.showerror(title="Replay failed", message=str(error))
+            return
+        self._refresh(level_num)
+        self._master.after(self._replay_delay, self._play_next_action)
+
+    def seek_replay(self) -> None:
+        """ Asks for an action number and jumps the playing replay to it. """
+        action = simpledialog.askinteger(
+            "Seek", "Go to action:", parent=self._master, minvalue=0)
+        if action is not None and self._playback is not None:
+            level_num = self._model.get_level_num()
+            self._playback.seek(action)
+            self._refresh(level_num)
+
+    def _play_next_action(self) -> None:
+        """ Plays one action of the replay and schedules the next. """
+        if self._playback is None:
+            return
+        level_num = self._model.get_level_num()
+        if not self._playback.step():
+            self._playback = None
+            if RECORD_REPLAYS:
+                self.start_recording()
+            messagebox.showinfo(title="Replay", message="Replay finished")
+            return
+
+        if self._model.has_won() or self._model.has_lost():
+            messagebox.showinfo(
+                title="You Win" if self._model.has_won() else "You Lost",
+                message=WIN_MESSAGE if self._model.has_won()
+                else LOSS_MESSAGE)
+            self._master.destroy()
+            return
+
+        self._refresh(level_num)
+        self._master.after(self._replay_delay, self._play_next_action)
 
     def play(self) -> None:
         """ Play method. Handles gameplay. """
@@ -608,12 +1415,15 @@ class ImageGraphicalMazeRunner(GraphicalMazeRunner):
         self._view.create_interface(self._model.get_level().get_dimensions())
         self._view.set_inventory_callback(self._apply_item)
         self._view.bind_keypress(self._handle_keypress)
+        self._use_background()
 
         self._view.draw(self._model.get_current_maze(),
-                        self._model.get_current_items(),
+                        self._get_drawn_items(),
                         self._model.get_level().get_player_start(),
                         self._model.get_player_inventory(),
                         (self._model.get_player_stats()))
+        self._draw_minimap()
+        self._draw_stats_history()
 
 
 # Main execution functions
@@ -638,13 +1448,32 @@ def play_game(root: tk.Tk):
         file_menu.add_command(label="Save game", command=game.save_game)
         file_menu.add_command(label="Load game", command=game.load_game)
         file_menu.add_command(label="Restart game", command=game.restart_game)
+        file_menu.add_command(label="Rewind...", command=game.rewind_game)
+        file_menu.add_command(label="Save replay", command=game.save_replay)
+        file_menu.add_command(label="Play replay...",
+                              command=game.play_replay)
+        file_menu.add_command(label="Memory report",
+                              command=game.show_memory_report)
+        file_menu.add_command(label="Leaderboard",
+                              command=game.show_leaderboard)
         file_menu.add_command(label="Quit", command=game.quit_game)
 
         root.config(menu=menu)
 
+    profiler = None
+    if PROFILE_FRAMES:
+        from instrumentation import FrameProfiler
+        profiler = FrameProfiler()
+        profiler.attach(game)
+        if PROFILE_OVERLAY:
+            profiler.show_overlay(root)
+
     game.play()
     root.mainloop()
 
+    if profiler is not None:
+        profiler.dump(PROFILE_DUMP_FILE)
+
 
 # Creation of window
 def main():
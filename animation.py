@@ -0,0 +1,345 @@
+""" Exports replays as animated GIF or APNG files without a Tk window.
+
+Each level is composited once from the sprite atlas (see assets.py). After
+that only the cells an action changed (the player's old and new squares, the
+squares enemies left or entered, plus the doors when they unlock) are
+redrawn, and each frame is written as a patch covering just those cells.
+Frames are streamed to the file as they are produced, so memory stays flat
+however long the replay is.
+
+Every sprite combination is quantized once to a shared 256 colour palette,
+so compositing is plain index copying and no frame needs its own palette.
+
+Usage:
+    python animation.py GAME_FILE REPLAY_FILE OUTPUT.gif|OUTPUT.png
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import struct
+import zlib
+from typing import BinaryIO, Optional
+
+from PIL import GifImagePlugin, Image
+
+from a2_solution import MazeRunner, Model
+from assets import get_atlas
+from constants import *
+from replay import HeadlessInterface, Replay, ReplayPlayer, load_replay
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+MAX_DELAY = 0xFFFF  # ms, the largest APNG delay numerator
+GIF_EXTENSION = '.gif'
+
+
+def cell_size_for(dimensions: tuple[int, int]) -> int:
+    """ Returns the default cell size in pixels for a maze, shrinking cells so
+        that the animation is at most MAX_ANIMATION_SIZE pixels across.
+    """
+    return max(1, min(ANIMATION_CELL_SIZE,
+                      MAX_ANIMATION_SIZE // max(dimensions)))
+
+
+class FrameRenderer:
+    """ Maintains a paletted image of the current level, redrawing only the
+        cells it is told have changed.
+    """
+    def __init__(self, size: tuple[int, int], cell_size: int) -> None:
+        """ Loads and quantizes every sprite combination.
+
+        Parameters:
+            size: The (#rows, #columns) of the largest level to be drawn.
+            cell_size: The width and height of a cell in pixels.
+        """
+        self._cell_size = cell_size
+        sprites = {
+            sprite_id: self._load(sprite_id)
+            for sprite_id in {**TILE_IMAGES, **ENTITY_IMAGES}
+        }
+        cells = {}
+        for tile_id in TILE_IMAGES:
+            for item_id in (None, *ENTITY_IMAGES):
+                if item_id == PLAYER:
+                    continue
+                for has_player in (False, True):
+                    cell = sprites[tile_id].copy()
+                    for layer in (item_id, PLAYER if has_player else None):
+                        if layer is not None:
+                            cell.alpha_composite(sprites[layer])
+                    cells[tile_id, item_id, has_player] = cell.convert('RGB')
+
+        # Quantize a montage of every cell, so all cells share one palette
+        montage = Image.new('RGB', (cell_size * len(cells), cell_size))
+        for index, cell in enumerate(cells.values()):
+            montage.paste(cell, (index * cell_size, 0))
+        self._palette = montage.quantize(colors=256,
+                                         dither=Image.Dither.NONE)
+        self._cells = {
+            key: cell.quantize(palette=self._palette, dither=Image.Dither.NONE)
+            for key, cell in cells.items()
+        }
+        rows, columns = size
+        self.canvas = Image.new('P', (columns * cell_size, rows * cell_size))
+        self.canvas.putpalette(self._palette.getpalette())
+
+    def _load(self, sprite_id: str) -> Image.Image:
+        """ Returns a sprite scaled to the cell size. Tiles are put on a black
+            background, so that they are opaque.
+        """
+        size = (self._cell_size, self._cell_size)
+        sprite = get_atlas().get_sprite(sprite_id).resize(
+            size, Image.Resampling.BOX)
+        if sprite_id not in TILE_IMAGES:
+            return sprite
+        background = Image.new('RGBA', size, (0, 0, 0, 255))
+        background.alpha_composite(sprite)
+        return background
+
+    def draw_cell(self, model: Model, position: tuple[int, int]) -> None:
+        """ Redraws the cell at a position on the current level. """
+        tile_id = model.get_current_maze().get_tile(position).get_id()
+        if tile_id not in TILE_IMAGES:
+            tile_id = EMPTY
+        item = model.get_current_enemies().get(position)
+        if item is None:
+            item = model.get_current_items().get(position)
+        item_id = item.get_id() if item is not None else None
+        if item_id not in ENTITY_IMAGES:
+            item_id = None
+        has_player = position == model.get_player().get_position()
+        row, col = position
+        self.canvas.paste(self._cells[tile_id, item_id, has_player],
+                          (col * self._cell_size, row * self._cell_size))
+
+    def draw_level(self, model: Model) -> None:
+        """ Composites the whole of the current level. """
+        self.canvas.paste(0, (0, 0, *self.canvas.size))
+        rows, columns = model.get_current_maze().get_dimensions()
+        for row in range(rows):
+            for col in range(columns):
+                self.draw_cell(model, (row, col))
+
+    def get_bbox(self, positions: set[tuple[int, int]]
+                 ) -> tuple[int, int, int, int]:
+        """ Returns the pixel (left, top, right, bottom) box around some cells.
+        """
+        rows = [row for row, _ in positions]
+        columns = [col for _, col in positions]
+        size = self._cell_size
+        return (min(columns) * size, min(rows) * size,
+                (max(columns) + 1) * size, (max(rows) + 1) * size)
+
+
+class GifWriter:
+    """ Streams frames into an animated GIF. Each frame after the first only
+        covers the region that changed and is left in place for the next.
+    """
+    def __init__(self, file: BinaryIO, canvas: Image.Image) -> None:
+        """ Writes the GIF header.
+
+        Parameters:
+            file: The binary file to write to.
+            canvas: A paletted image with the animation's size and palette.
+        """
+        self._file = file
+        header, _ = GifImagePlugin.getheader(
+            canvas, info={'loop': 0, 'optimize': False})
+        for block in header:
+            file.write(block)
+
+    def write_frame(self, image: Image.Image, offset: tuple[int, int],
+                    duration: int) -> None:
+        """ Writes one frame.
+
+        Parameters:
+            image: The paletted region to draw.
+            offset: The (x, y) position of the region.
+            duration: How long to show the frame for in ms.
+        """
+        for block in GifImagePlugin.getdata(image, offset, duration=duration,
+                                            disposal=1):
+            self._file.write(block)
+
+    def close(self) -> None:
+        """ Ends the animation. """
+        self._file.write(b';')
+
+
+class ApngWriter:
+    """ Streams frames into an animated PNG. Each frame after the first only
+        covers the region that changed and is drawn over the previous one.
+    """
+    def __init__(self, file: BinaryIO, canvas: Image.Image) -> None:
+        """ Writes the PNG header, leaving the frame count to be filled in when
+            the animation is closed.
+
+        Parameters:
+            file: The seekable binary file to write to.
+            canvas: A paletted image with the animation's size and palette.
+        """
+        self._file = file
+        self._size = canvas.size
+        self._sequence = 0
+        self._num_frames = 0
+        file.write(PNG_SIGNATURE)
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', *canvas.size, 8, 3, 0,
+                                         0, 0))
+        self._actl_offset = file.tell()
+        self._chunk(b'acTL', struct.pack('>II', 0, 0))
+        self._chunk(b'PLTE', bytes(canvas.getpalette()[:768]))
+
+    def _chunk(self, kind: bytes, data: bytes) -> None:
+        """ Writes a PNG chunk. """
+        self._file.write(struct.pack('>I', len(data)) + kind + data)
+        self._file.write(struct.pack('>I', zlib.crc32(kind + data)))
+
+    def write_frame(self, image: Image.Image, offset: tuple[int, int],
+                    duration: int) -> None:
+        """ Writes one frame. The first frame must cover the whole animation.
+
+        Parameters:
+            image: The paletted region to draw.
+            offset: The (x, y) position of the region.
+            duration: How long to show the frame for in ms.
+        """
+        self._chunk(b'fcTL', struct.pack(
+            '>IIIIIHHBB', self._sequence, *image.size, *offset,
+            min(duration, MAX_DELAY), 1000, 0, 0))
+        self._sequence += 1
+
+        compressor = zlib.compressobj()
+        width = image.size[0]
+        data = image.tobytes()
+        compressed = bytearray()
+        for start in range(0, len(data), width):
+            compressed += compressor.compress(
+                b'\x00' + data[start:start + width])
+        compressed += compressor.flush()
+
+        if self._num_frames == 0:
+            self._chunk(b'IDAT', bytes(compressed))
+        else:
+            self._chunk(b'fdAT', struct.pack('>I', self._sequence)
+                        + compressed)
+            self._sequence += 1
+        self._num_frames += 1
+
+    def close(self) -> None:
+        """ Ends the animation and fills in the frame count. """
+        self._chunk(b'IEND', b'')
+        self._file.seek(self._actl_offset)
+        self._chunk(b'acTL', struct.pack('>II', self._num_frames, 0))
+        self._file.seek(0, os.SEEK_END)
+
+
+def export_replay(
+    replay: Replay,
+    game_file: str,
+    filename: str,
+    cell_size: Optional[int] = None,
+    frame_duration: int = ANIMATION_FRAME_DURATION,
+    actions_per_frame: int = 1,
+) -> int:
+    """ Plays a replay headlessly and writes it out as an animation. The
+        format is GIF for a .gif filename and APNG otherwise.
+
+    Parameters:
+        replay: The replay to export.
+        game_file: The game file the replay was recorded on.
+        filename: The file to write the animation to.
+        cell_size: The cell size in pixels. Defaults to one that fits the
+                   largest level within MAX_ANIMATION_SIZE.
+        frame_duration: The time given to each action in ms.
+        actions_per_frame: The number of actions combined into each frame.
+
+    Returns:
+        The number of frames written.
+    """
+    runner = MazeRunner(game_file, HeadlessInterface())
+    model = runner.get_model()
+    playback = ReplayPlayer(replay, runner)
+    levels = [level.get_dimensions() for level in model.get_levels()]
+    size = (max(rows for rows, _ in levels),
+            max(columns for _, columns in levels))
+    renderer = FrameRenderer(size, cell_size or cell_size_for(size))
+    renderer.draw_level(model)
+
+    writer_class = GifWriter if filename.lower().endswith(GIF_EXTENSION) \
+        else ApngWriter
+    num_frames = 0
+    with open(filename, 'wb') as file:
+        writer = writer_class(file, renderer.canvas)
+        # Frames are held back one step so that actions which change nothing
+        # visible extend the previous frame rather than repeating it
+        pending = (renderer.canvas.copy(), (0, 0))
+        duration = 0
+        dirty = set()
+        full_redraw = False
+
+        while not (model.has_won() or model.has_lost()):
+            level_num = model.get_level_num()
+            position = model.get_player().get_position()
+            unlocked = model.get_current_maze().is_door_unlocked()
+            enemies = [enemy.get_position()
+                       for enemy in model.get_current_enemies().get_enemies()]
+            if not playback.step():
+                break
+            duration += frame_duration
+            if model.has_won():
+                break
+            if model.get_level_num() != level_num:
+                full_redraw = True
+            else:
+                dirty.update((position, model.get_player().get_position()))
+                if model.get_current_maze().is_door_unlocked() != unlocked:
+                    dirty.update(model.get_current_maze().get_doors())
+                for enemy, old_position in zip(
+                        model.get_current_enemies().get_enemies(), enemies):
+                    if enemy.get_position() != old_position:
+                        dirty.update((old_position, enemy.get_position()))
+
+            if playback.get_position() % actions_per_frame:
+                continue
+            if full_redraw:
+                renderer.draw_level(model)
+                box = (0, 0, *renderer.canvas.size)
+            elif dirty:
+                for cell in dirty:
+                    renderer.draw_cell(model, cell)
+                box = renderer.get_bbox(dirty)
+            else:
+                continue
+            writer.write_frame(*pending, duration)
+            num_frames += 1
+            pending = (renderer.canvas.crop(box), box[:2])
+            duration = 0
+            dirty.clear()
+            full_redraw = False
+
+        writer.write_frame(*pending, max(duration, frame_duration))
+        writer.close()
+    return num_frames + 1
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """ Command line entry point: exports a replay as an animation. """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('game_file')
+    parser.add_argument('replay_file')
+    parser.add_argument('output', help='.gif for GIF, otherwise APNG')
+    parser.add_argument('--cell-size', type=int, default=None)
+    parser.add_argument('--duration', type=int,
+                        default=ANIMATION_FRAME_DURATION,
+                        help='ms per action')
+    parser.add_argument('--every', type=int, default=1,
+                        help='actions combined into each frame')
+    args = parser.parse_args(argv)
+    frames = export_replay(load_replay(args.replay_file), args.game_file,
+                           args.output, args.cell_size, args.duration,
+                           args.every)
+    print(f'Wrote {frames} frames to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+""" Sprite atlas for the image views.
+
+Every sprite in images/ is packed into one atlas image with a JSON index,
+so startup decodes a single PNG instead of one file per sprite. Sprites are
+stored pre-scaled to ATLAS_SPRITE_SIZE, which is larger than any cell the
+game draws. Resized copies for each cell size are made on a thread pool and
+cached, so nothing is decoded or resized from disk during play.
+
+The background of a level (every tile except its doors) is composited into a
+single image by LevelPrefetcher, on a worker thread while the previous level
+is still being played.
+
+Usage (rebuilds images/atlas.png and images/atlas.json from the sprites):
+    python assets.py
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Iterable
+
+from PIL import Image
+
+from constants import *
+
+IMAGE_DIR = 'images'
+ATLAS_FILE = os.path.join(IMAGE_DIR, 'atlas.png')
+INDEX_FILE = os.path.join(IMAGE_DIR, 'atlas.json')
+ATLAS_VERSION = 1
+SPRITE_FILES = {**TILE_IMAGES, **ENTITY_IMAGES}
+
+
+def build_atlas(image_dir: str = IMAGE_DIR
+                ) -> tuple[Image.Image, dict[str, list[int]]]:
+    """ Packs every sprite into a square grid of ATLAS_SPRITE_SIZE slots.
+
+    Parameters:
+        image_dir: The directory containing the sprite files.
+
+    Returns:
+        The atlas image and an index mapping each sprite id to its
+        [x, y, width, height] in the atlas.
+    """
+    size = ATLAS_SPRITE_SIZE
+    columns = math.ceil(math.sqrt(len(SPRITE_FILES)))
+    rows = math.ceil(len(SPRITE_FILES) / columns)
+    atlas = Image.new('RGBA', (columns * size, rows * size))
+    index = {}
+    for slot, (sprite_id, filename) in enumerate(SPRITE_FILES.items()):
+        x, y = slot % columns * size, slot // columns * size
+        with Image.open(os.path.join(image_dir, filename)) as sprite:
+            atlas.paste(sprite.convert('RGBA').resize((size, size)), (x, y))
+        index[sprite_id] = [x, y, size, size]
+    return atlas, index
+
+
+def save_atlas(atlas: Image.Image, index: dict[str, list[int]],
+               atlas_file: str = ATLAS_FILE,
+               index_file: str = INDEX_FILE) -> None:
+    """ Writes an atlas image and its index. """
+    atlas.save(atlas_file, optimize=True)
+    with open(index_file, 'w') as file:
+        json.dump({'version': ATLAS_VERSION, 'sprites': index}, file,
+                  indent=2, sort_keys=True)
+
+
+class SpriteAtlas:
+    """ Sprites decoded from an atlas, with a cache of resized copies. The
+        PhotoImage cache must only be used from the Tk thread; everything else
+        is thread-safe.
+    """
+    def __init__(self, atlas: Image.Image, index: dict[str, list[int]],
+                 workers: int = ASSET_WORKERS) -> None:
+        """ Slices the decoded atlas into its sprites.
+
+        Parameters:
+            atlas: The atlas image.
+            index: Maps sprite ids to their [x, y, width, height].
+            workers: The number of threads used for resizing.
+        """
+        atlas.load()
+        self._sprites = {
+            sprite_id: atlas.crop((x, y, x + width, y + height))
+            for sprite_id, (x, y, width, height) in index.items()
+        }
+        self._pool = ThreadPoolExecutor(max_workers=workers,
+                                        thread_name_prefix='assets')
+        self._lock = threading.Lock()
+        # Maps a (width, height) to futures of each sprite at that size
+        self._resized = {}
+        self._photos = {}
+
+    @classmethod
+    def load(cls, atlas_file: str = ATLAS_FILE,
+             index_file: str = INDEX_FILE) -> SpriteAtlas:
+        """ Decodes the atlas, building it from the sprite files instead if
+            it is missing.
+        """
+        try:
+            with open(index_file) as file:
+                index = json.load(file)['sprites']
+            with Image.open(atlas_file) as image:
+                atlas = image.convert('RGBA')
+        except FileNotFoundError:
+            atlas, index = build_atlas()
+        return cls(atlas, index)
+
+    def get_ids(self) -> list[str]:
+        """ Returns the id of every sprite in the atlas. """
+        return list(self._sprites)
+
+    def get_sprite(self, sprite_id: str) -> Image.Image:
+        """ Returns a sprite at its atlas size. """
+        return self._sprites[sprite_id]
+
+    def prepare(self, sizes: Iterable[tuple[int, int]]) -> None:
+        """ Starts resizing every sprite to each size in the background.
+
+        Parameters:
+            sizes: The (width, height) cell sizes that will be needed.
+        """
+        with self._lock:
+            for size in sizes:
+                if size not in self._resized:
+                    self._resized[size] = {
+                        sprite_id: self._pool.submit(sprite.resize, size)
+                        for sprite_id, sprite in self._sprites.items()
+                    }
+
+    def get_sprites(self, size: tuple[int, int]) -> dict[str, Image.Image]:
+        """ Returns every sprite resized to a cell size, waiting for any
+            resizing still in progress.
+        """
+        self.prepare([size])
+        futures: dict[str, Future] = self._resized[size]
+        return {sprite_id: future.result()
+                for sprite_id, future in futures.items()}
+
+    def get_photo_images(self, size: tuple[int, int]
+                         ) -> dict[str, 'ImageTk.PhotoImage']:
+        """ Returns every sprite at a cell size as Tk images. Must only be
+            called from the Tk thread.
+        """
+        photos = self._photos.get(size)
+        if photos is None:
+            from PIL import ImageTk
+            photos = self._photos[size] = {
+                sprite_id: ImageTk.PhotoImage(sprite)
+                for sprite_id, sprite in self.get_sprites(size).items()
+            }
+        return photos
+
+    def forget(self, size: tuple[int, int]) -> None:
+        """ Drops the cached images for a size that is no longer needed. """
+        with self._lock:
+            self._resized.pop(size, None)
+        self._photos.pop(size, None)
+
+
+def compose_background(maze: 'Maze', sprites: dict[str, Image.Image]
+                       ) -> Image.Image:
+    """ Composites the tiles of a maze into one image. Doors are drawn as
+        empty ground, since they change during play and are drawn over the
+        background instead.
+
+    Parameters:
+        maze: The maze to draw.
+        sprites: Every sprite, resized to the maze's cell size.
+    """
+    width, height = sprites[EMPTY].size
+    rows, columns = maze.get_dimensions()
+    background = Image.new('RGBA', (columns * width, rows * height))
+    for row_num, row in enumerate(maze.get_tiles()):
+        for col_num, tile in enumerate(row):
+            tile_id = tile.get_id()
+            if tile_id == DOOR:
+                tile_id = EMPTY
+            background.paste(sprites[tile_id], (col_num * width,
+                                                row_num * height))
+    return background
+
+
+class LevelPrefetcher:
+    """ Prepares the sprites and background of levels ahead of time on a
+        worker thread. Like SpriteAtlas, its PhotoImages must only be used
+        from the Tk thread.
+    """
+    def __init__(self, atlas: SpriteAtlas, size: tuple[int, int]) -> None:
+        """ Sets up an empty prefetcher.
+
+        Parameters:
+            atlas: The atlas to take sprites from.
+            size: The (width, height) in pixels that every level is drawn at.
+        """
+        self._atlas = atlas
+        self._size = size
+        self._pool = ThreadPoolExecutor(max_workers=1,
+                                        thread_name_prefix='prefetch')
+        # Maps a level number to a future of its background
+        self._backgrounds = {}
+        self._photos = {}
+
+    def get_cell_size(self, maze: 'Maze') -> tuple[int, int]:
+        """ Returns the (width, height) of a cell of a maze in pixels. """
+        rows, columns = maze.get_dimensions()
+        width, height = self._size
+        return width // columns, height // rows
+
+    def _compose(self, maze: 'Maze') -> Image.Image:
+        """ Resizes the sprites for a maze and composites its background. """
+        return compose_background(
+            maze, self._atlas.get_sprites(self.get_cell_size(maze)))
+
+    def prefetch(self, level_num: int, maze: 'Maze') -> None:
+        """ Starts preparing a level in the background, if it is not already.
+
+        Parameters:
+            level_num: The number of the level, used as its key.
+            maze: The maze of the level.
+        """
+        if level_num not in self._backgrounds:
+            self._atlas.prepare([self.get_cell_size(maze)])
+            self._backgrounds[level_num] = self._pool.submit(self._compose,
+                                                             maze)
+
+    def is_ready(self, level_num: int) -> bool:
+        """ Returns True iff a prefetched level has finished preparing. """
+        future = self._backgrounds.get(level_num)
+        return future is not None and future.done()
+
+    def get_photo(self, level_num: int, maze: 'Maze') -> 'ImageTk.PhotoImage':
+        """ Returns the background of a level as a Tk image, preparing it
+            now if it was not prefetched. Must only be called from the Tk
+            thread.
+        """
+        photo = self._photos.get(level_num)
+        if photo is None:
+            from PIL import ImageTk
+            self.prefetch(level_num, maze)
+            background = self._backgrounds[level_num].result()
+            photo = self._photos[level_num] = ImageTk.PhotoImage(background)
+        return photo
+
+    def keep(self, level_nums: Iterable[int]) -> None:
+        """ Drops every prepared level except the given ones. """
+        level_nums = set(level_nums)
+        for cache in (self._backgrounds, self._photos):
+            for level_num in list(cache):
+                if level_num not in level_nums:
+                    del cache[level_num]
+
+    def close(self) -> None:
+        """ Stops the worker thread once any work in progress is done. """
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+@lru_cache(maxsize=None)
+def get_atlas() -> SpriteAtlas:
+    """ Returns the shared atlas, decoding it on first use. """
+    return SpriteAtlas.load()
+
+
+def main() -> None:
+    """ Command line entry point: rebuilds the atlas from the sprite files. """
+    atlas, index = build_atlas()
+    save_atlas(atlas, index)
+    print(f'Wrote {len(index)} sprites to {ATLAS_FILE} and {INDEX_FILE}')
+
+
+if __name__ == '__main__':
+    main()
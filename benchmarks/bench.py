@@ -0,0 +1,645 @@
+""" Benchmark suite for the MazeRunner parsing, simulation and rendering paths.
+
+Usage:
+    python benchmarks/bench.py -o results.json
+    python benchmarks/bench.py --compare baseline.json
+
+Each benchmark reports the min and median wall time over several repeats and
+the peak traced allocation of one extra run. Rendering benchmarks need a
+display; under a headless machine run them with `xvfb-run`.
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import functools
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from a2_solution import (Coin, Inventory, MazeRunner, Model, TextInterface,
+                         load_game)
+from catalog import Catalog
+from constants import CATALOG_FILE, ENDLESS_MAX_SIZE, MOVE_DELTAS
+from endless import build_level
+from generator import generate_game
+from history import RunHistory, RunRecord, connect
+from replay import HeadlessInterface, Replay, ReplayPlayer
+
+DATA_DIR = os.path.join(ROOT, 'benchmarks', 'data')
+SHIPPED_GAMES = ('game1.txt', 'game2.txt', 'game3.txt')
+DEFAULT_SIZES = (100, 500, 1000, 2000)
+DEFAULT_THRESHOLD = 0.10
+NUM_MOVES = 10000
+NUM_ITEMS = 10000
+UNDO_MOVES = 100000
+NUM_CLONES = 1000
+MAX_DEEPCOPY_BYTES = 300000
+HASH_CHECK_ACTIONS = 2000
+ENEMY_DENSITY = 0.05
+ENEMY_MOVES = 20
+MAX_ENEMY_SIZE = 1000  # ~25k enemies; larger levels take minutes
+ENDLESS_STEP = 20  # far enough into endless mode to reach the size cap
+HISTORY_ROWS = 1000000
+HISTORY_GAMES = 100
+HISTORY_RECORDS = 10000
+CATALOG_GAMES = 10000
+CATALOG_CHANGED = 100
+
+
+@dataclass
+class Case:
+    """ A single benchmark: setup is untimed, run(setup()) is timed. """
+    name: str
+    setup: Callable[[], Any]
+    run: Callable[[Any], None]
+    ops: int = 1
+
+
+BENCHMARKS = []
+
+
+def benchmark(function: Callable[[dict[str, str]], Iterator[Case]]):
+    """ Registers a function yielding benchmark cases for the given inputs. """
+    BENCHMARKS.append(function)
+    return function
+
+
+def game_inputs(sizes: tuple[int, ...]) -> dict[str, str]:
+    """ Returns a mapping from input label to game file, generating (and
+        caching) the square levels of the given sizes.
+    """
+    inputs = {name: os.path.join(ROOT, 'games', name) for name in SHIPPED_GAMES}
+    os.makedirs(DATA_DIR, exist_ok=True)
+    for size in sizes:
+        path = os.path.join(DATA_DIR, f'generated_{size}.txt')
+        if not os.path.exists(path):
+            generate_game(path, (size, size), seed=size)
+        inputs[f'{size}x{size}'] = path
+    return inputs
+
+
+def random_moves(count: int, seed: int = 0) -> list[tuple[int, int]]:
+    """ Returns a reproducible list of move deltas. """
+    rng = random.Random(seed)
+    deltas = list(MOVE_DELTAS.values())
+    return [rng.choice(deltas) for _ in range(count)]
+
+
+@benchmark
+def bench_load_game(inputs: dict[str, str]) -> Iterator[Case]:
+    """ Parsing each game file into levels. """
+    for label, path in inputs.items():
+        yield Case(f'load_game[{label}]', lambda p=path: p, load_game)
+
+
+@benchmark
+def bench_move_player(inputs: dict[str, str]) -> Iterator[Case]:
+    """ A fixed random walk through the first level of each game. """
+    moves = random_moves(NUM_MOVES)
+
+    def run(model: Model) -> None:
+        for delta in moves:
+            model.move_player(delta)
+            if model.has_won():
+                break
+
+    for label, path in inputs.items():
+        yield Case(f'move_player[{label}]', lambda p=path: Model(p), run,
+                   ops=NUM_MOVES)
+
+
+@benchmark
+def bench_undo(inputs: dict[str, str]) -> Iterator[Case]:
+    """ Rewinding a long session back to its start via the undo journal. """
+    moves = random_moves(UNDO_MOVES)
+
+    def setup(path: str) -> tuple[Model, int]:
+        model = Model(path, history_size=UNDO_MOVES)
+        initial_hash = model.state_hash()
+        for delta in moves:
+            model.move_player(delta)
+            if model.has_won():
+                break
+        return model, initial_hash
+
+    def run(game: tuple[Model, int]) -> None:
+        model, initial_hash = game
+        model.rewind_to(0)
+        if model.state_hash() != initial_hash:
+            raise AssertionError('Rewinding did not restore the initial state')
+
+    for label, path in inputs.items():
+        yield Case(f'undo_rewind[{label}]', lambda p=path: setup(p), run,
+                   ops=UNDO_MOVES)
+
+
+@benchmark
+def bench_enemies(inputs: dict[str, str]) -> Iterator[Case]:
+    """ Player moves on generated levels where ENEMY_DENSITY of the open
+        squares hold enemies, every one of which moves each turn.
+    """
+    moves = random_moves(ENEMY_MOVES)
+
+    def run(model: Model) -> None:
+        for delta in moves:
+            model.move_player(delta)
+
+    for label, path in inputs.items():
+        if not label[0].isdigit():
+            continue
+        size = int(label.split('x')[0])
+        if size > MAX_ENEMY_SIZE:
+            continue
+        path = os.path.join(DATA_DIR, f'enemies_{size}.txt')
+        if not os.path.exists(path):
+            generate_game(path, (size, size), seed=size,
+                          enemy_density=ENEMY_DENSITY)
+        yield Case(f'enemy_tick[{label}]', lambda p=path: Model(p), run,
+                   ops=ENEMY_MOVES)
+
+
+@benchmark
+def bench_reset(inputs: dict[str, str]) -> Iterator[Case]:
+    """ Restarting after a random walk: resetting in place compared with
+        loading the game file again.
+    """
+    moves = random_moves(NUM_MOVES)
+
+    def setup(path: str) -> Model:
+        model = Model(path)
+        for delta in moves:
+            model.move_player(delta)
+            if model.has_won():
+                break
+        return model
+
+    for label, path in inputs.items():
+        yield Case(f'model_reset[{label}]', lambda p=path: setup(p),
+                   lambda model: model.reset())
+        yield Case(f'model_reload[{label}]', lambda p=path: p, Model)
+
+
+@benchmark
+def bench_endless(inputs: dict[str, str]) -> Iterator[Case]:
+    """ Endless mode levels of each generated size: building one, which
+        happens on the worker process, compared with adding a built level to
+        a game, which is all a level up waits for.
+    """
+    path = os.path.join(ROOT, 'games', SHIPPED_GAMES[0])
+
+    def setup(size: int) -> tuple[Model, tuple]:
+        model = Model(path)
+        return model, build_level(0, len(model.get_levels()), ENDLESS_STEP,
+                                  size)
+
+    for label in inputs:
+        if not label[0].isdigit():
+            continue
+        size = int(label.split('x')[0])
+        if size > ENDLESS_MAX_SIZE:
+            continue
+        yield Case(f'endless_build[{label}]', lambda s=size: s,
+                   lambda s: build_level(0, 1, ENDLESS_STEP, s))
+        yield Case(f'endless_add_level[{label}]', lambda s=size: setup(s),
+                   lambda args: args[0].add_level(*args[1]))
+
+
+def history_database(num_rows: int) -> str:
+    """ Returns a run history database holding num_rows random runs spread
+        over HISTORY_GAMES games, creating (and caching) it if need be. Only
+        called from case setups, so it is never built for filtered-out cases.
+    """
+    path = os.path.join(DATA_DIR, f'history_{num_rows}.db')
+    if os.path.exists(path):
+        return path
+    os.makedirs(DATA_DIR, exist_ok=True)
+    rng = random.Random(num_rows)
+    connection = connect(path)
+    with connection:
+        connection.executemany(
+            'INSERT INTO games (id, hash, name) VALUES (?, ?, ?)',
+            [(game, game.to_bytes(32, 'big'), f'game{game}.txt')
+             for game in range(1, HISTORY_GAMES + 1)])
+        connection.executemany(
+            'INSERT INTO runs (game_id, level, won, moves, seconds, health, '
+            'hunger, thirst, finished) VALUES (?, ?, 0, ?, ?, 50, 5, 5, 0)',
+            ((rng.randint(1, HISTORY_GAMES), rng.randrange(10),
+              rng.randrange(10000), rng.random() * 3600)
+             for _ in range(num_rows)))
+    connection.close()
+    return path
+
+
+@benchmark
+def bench_history(inputs: dict[str, str]) -> Iterator[Case]:
+    """ Leaderboard queries on a history of HISTORY_ROWS runs, and recording
+        HISTORY_RECORDS runs through the background writer into a new
+        database, so that the cached one is left unchanged.
+    """
+    scratch = os.path.join(DATA_DIR, 'history_scratch.db')
+
+    def new_history() -> RunHistory:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(scratch + suffix):
+                os.remove(scratch + suffix)
+        return RunHistory(scratch)
+
+    game_hash = (1).to_bytes(32, 'big')
+    records = [RunRecord(game_hash, 'game1.txt', 0, False, moves, 1.0,
+                         (50, 5, 5)) for moves in range(HISTORY_RECORDS)]
+
+    def record(history: RunHistory) -> None:
+        for run in records:
+            history.record(run)
+        history.flush().result()
+        history.close()
+
+    label = f'{HISTORY_ROWS}runs'
+    def open_history() -> RunHistory:
+        return RunHistory(history_database(HISTORY_ROWS))
+
+    yield Case(f'history_leaderboard[{label}]', open_history,
+               lambda history: history.leaderboard(game_hash).result())
+    yield Case(f'history_leaderboard_level[{label}]', open_history,
+               lambda history: history.leaderboard(game_hash, 5).result())
+    yield Case('history_record', new_history, record, ops=HISTORY_RECORDS)
+
+
+def game_library(num_games: int) -> str:
+    """ Returns a directory of num_games game files, copies of the shipped
+        games and of the smallest generated one, creating (and caching) it if
+        need be.
+    """
+    path = os.path.join(DATA_DIR, f'library_{num_games}')
+    if os.path.isdir(path):
+        return path
+    contents = []
+    for source in game_inputs(DEFAULT_SIZES[:1]).values():
+        with open(source) as file:
+            contents.append(file.read())
+    os.makedirs(path)
+    for number in range(num_games):
+        with open(os.path.join(path, f'game{number:05}.txt'), 'w') as file:
+            file.write(contents[number % len(contents)])
+    return path
+
+
+@benchmark
+def bench_catalog(inputs: dict[str, str]) -> Iterator[Case]:
+    """ Cataloguing a library of CATALOG_GAMES game files: a cold scan with no
+        saved catalog, loading the saved catalog, a refresh with nothing
+        changed and a refresh after CATALOG_CHANGED files were modified.
+    """
+    @functools.cache
+    def library() -> str:
+        # Built on the first setup, so never for filtered-out cases
+        directory = game_library(CATALOG_GAMES)
+        Catalog(directory).refresh()
+        return directory
+
+    def cold() -> Catalog:
+        index = os.path.join(library(), CATALOG_FILE)
+        if os.path.exists(index):
+            os.remove(index)
+        return Catalog(library())
+
+    def changed() -> Catalog:
+        catalog = Catalog(library())
+        now = time.time_ns()
+        for name in sorted(os.listdir(library()))[:CATALOG_CHANGED]:
+            os.utime(os.path.join(library(), name), ns=(now, now))
+        return catalog
+
+    label = f'{CATALOG_GAMES}games'
+    yield Case(f'catalog_scan[{label}]', cold, Catalog.refresh,
+               ops=CATALOG_GAMES)
+    yield Case(f'catalog_load[{label}]', library, Catalog)
+    yield Case(f'catalog_refresh[{label}]', lambda: Catalog(library()),
+               Catalog.refresh)
+    yield Case(f'catalog_refresh_changed[{label}]', changed, Catalog.refresh)
+
+
+@benchmark
+def bench_replay(inputs: dict[str, str]) -> Iterator[Case]:
+    """ Playing back a recorded session headlessly, checking that it ends in
+        the recorded state.
+    """
+    rng = random.Random(0)
+    commands = [rng.choice('wasd') for _ in range(NUM_MOVES)]
+
+    def setup(path: str) -> tuple[bytes, str, int]:
+        runner = MazeRunner(path, HeadlessInterface())
+        replay = runner.start_recording()
+        for command in commands:
+            runner._handle_move(command)
+            if runner.get_model().has_won():
+                break
+        return replay.encode(), path, runner.get_model().state_hash()
+
+    def run(recording: tuple[bytes, str, int]) -> None:
+        data, path, final_hash = recording
+        runner = MazeRunner(path, HeadlessInterface())
+        ReplayPlayer(Replay.decode(data), runner).play_to_end()
+        if runner.get_model().state_hash() != final_hash:
+            raise AssertionError('Replay did not reproduce the recorded game')
+
+    for label, path in inputs.items():
+        yield Case(f'replay_playback[{label}]', lambda p=path: setup(p), run,
+                   ops=NUM_MOVES)
+
+
+@benchmark
+def bench_clone(inputs: dict[str, str]) -> Iterator[Case]:
+    """ Forking a game, then making one move in the fork (which copies the
+        level's items on write), compared against a full deepcopy.
+    """
+    def clone(model: Model) -> None:
+        for _ in range(NUM_CLONES):
+            model.clone()
+
+    def clone_and_move(model: Model) -> None:
+        for delta in random_moves(NUM_CLONES):
+            model.clone().move_player(delta)
+
+    for label, path in inputs.items():
+        yield Case(f'clone[{label}]', lambda p=path: Model(p), clone,
+                   ops=NUM_CLONES)
+        yield Case(f'clone_and_move[{label}]', lambda p=path: Model(p),
+                   clone_and_move, ops=NUM_CLONES)
+        if os.path.getsize(path) <= MAX_DEEPCOPY_BYTES:
+            yield Case(f'deepcopy[{label}]', lambda p=path: Model(p),
+                       copy.deepcopy)
+
+
+@benchmark
+def bench_state_hash(inputs: dict[str, str]) -> Iterator[Case]:
+    """ Random moves, item uses and undos, checking after each one that the
+        incremental state hash matches a recompute from scratch.
+    """
+    rng = random.Random(0)
+    actions = [rng.random() for _ in range(HASH_CHECK_ACTIONS)]
+    moves = random_moves(HASH_CHECK_ACTIONS)
+    item_names = ('Apple', 'Water', 'Potion', 'Honey', 'Coin')
+
+    def run(model: Model) -> None:
+        for action, delta in zip(actions, moves):
+            if model.has_won():
+                break
+            if action < 0.05:
+                model.use_item(item_names[int(action * 100)])
+            elif action < 0.1:
+                model.undo()
+            else:
+                model.move_player(delta)
+            if model.state_hash() != model.compute_state_hash():
+                raise AssertionError('Incremental state hash diverged')
+
+    for label, path in inputs.items():
+        if os.path.getsize(path) <= MAX_DEEPCOPY_BYTES:
+            yield Case(f'state_hash_check[{label}]', lambda p=path: Model(p),
+                       run, ops=HASH_CHECK_ACTIONS)
+
+
+@benchmark
+def bench_attempt_unlock_door(inputs: dict[str, str]) -> Iterator[Case]:
+    """ Checking for remaining coins on a freshly loaded level. """
+    for label, path in inputs.items():
+        yield Case(f'attempt_unlock_door[{label}]',
+                   lambda p=path: load_game(p)[0],
+                   lambda level: level.attempt_unlock_door())
+
+
+@benchmark
+def bench_inventory(inputs: dict[str, str]) -> Iterator[Case]:
+    """ Hoarding and then spending a large number of coins. """
+    def run(inventory: Inventory) -> None:
+        for position in range(NUM_ITEMS):
+            inventory.add_item(Coin((position, 0)))
+        for _ in range(NUM_ITEMS):
+            inventory.remove_item('Coin')
+
+    yield Case('inventory_add_remove', Inventory, run, ops=2 * NUM_ITEMS)
+
+
+@benchmark
+def bench_text_draw(inputs: dict[str, str]) -> Iterator[Case]:
+    """ Printing the full text view (to a buffer) for each game. """
+    def run(model: Model) -> None:
+        with redirect_stdout(io.StringIO()):
+            TextInterface().draw(
+                model.get_current_maze(),
+                model.get_current_items(),
+                model.get_player().get_position(),
+                model.get_player_inventory(),
+                model.get_player_stats()
+            )
+
+    for label, path in inputs.items():
+        yield Case(f'text_draw[{label}]', lambda p=path: Model(p), run)
+
+
+@benchmark
+def bench_assets(inputs: dict[str, str]) -> Iterator[Case]:
+    """ Sprite costs without Tk: a cold start (decoding and resizing for the
+        first level), compared with opening each sprite file, a level change
+        (resizing for a new cell size from an already decoded atlas) and
+        compositing a level's background. The last two are the work the GUI
+        prefetches on a worker thread before a level up.
+    """
+    from PIL import Image
+    from assets import (INDEX_FILE, SPRITE_FILES, SpriteAtlas,
+                        compose_background)
+    from constants import MAZE_HEIGHT, MAZE_WIDTH
+
+    def cell_size(path: str) -> tuple[int, int]:
+        rows, columns = load_game(path)[0].get_dimensions()
+        return MAZE_WIDTH // columns, MAZE_HEIGHT // rows
+
+    def sprite_files(size: tuple[int, int]) -> None:
+        for filename in SPRITE_FILES.values():
+            with Image.open(os.path.join('images', filename)) as image:
+                image.resize(size)
+
+    def atlas_cold_start(size: tuple[int, int]) -> None:
+        SpriteAtlas.load().get_sprites(size)
+
+    with open(INDEX_FILE) as file:
+        index = json.load(file)['sprites']
+    with Image.open(os.path.join('images', 'atlas.png')) as image:
+        decoded = image.convert('RGBA')
+
+    for label, path in inputs.items():
+        size = cell_size(path)
+        if 0 in size:
+            continue  # Too many cells to draw at MAZE_WIDTH x MAZE_HEIGHT
+        yield Case(f'sprite_files_resize[{label}]', lambda s=size: s,
+                   sprite_files)
+        yield Case(f'atlas_cold_start[{label}]', lambda s=size: s,
+                   atlas_cold_start)
+        yield Case(f'atlas_level_change[{label}]',
+                   lambda s=size: (SpriteAtlas(decoded.copy(), index), s),
+                   lambda state: state[0].get_sprites(state[1]))
+        yield Case(f'level_background[{label}]',
+                   lambda p=path, s=size: (
+                       load_game(p)[0].get_maze(),
+                       SpriteAtlas(decoded.copy(), index).get_sprites(s)),
+                   lambda state: compose_background(*state))
+
+
+def _tk_root():
+    """ Returns a hidden Tk root window, or None if there is no display. """
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return None
+    root.withdraw()
+    return root
+
+
+@benchmark
+def bench_level_view_draw(inputs: dict[str, str]) -> Iterator[Case]:
+    """ Drawing the first level on the colour and image canvases. """
+    root = _tk_root()
+    if root is None:
+        print('Skipping rendering benchmarks: no display', file=sys.stderr)
+        return
+    import a3
+    from constants import MAZE_HEIGHT, MAZE_WIDTH
+
+    drawable = {}
+    for label, path in inputs.items():
+        rows, columns = load_game(path)[0].get_dimensions()
+        if MAZE_WIDTH // columns and MAZE_HEIGHT // rows:
+            drawable[label] = path  # Others have cells under a pixel wide
+
+    for view_class in (a3.LevelView, a3.ImageLevelView):
+        for label, path in drawable.items():
+            def setup(p=path, cls=view_class):
+                model = Model(p)
+                view = cls(root, model.get_level().get_dimensions(),
+                           (MAZE_WIDTH, MAZE_HEIGHT))
+                return view, model
+
+            def run(state) -> None:
+                view, model = state
+                view.draw(model.get_current_maze().get_tiles(),
+                          model.get_current_items(),
+                          model.get_player().get_position())
+                view.update_idletasks()
+
+            yield Case(f'{view_class.__name__}.draw[{label}]', setup, run)
+
+
+def measure(case: Case, repeat: int) -> dict[str, float]:
+    """ Times a benchmark case and measures its peak traced memory. """
+    timings = []
+    for _ in range(repeat):
+        state = case.setup()
+        start = time.perf_counter()
+        case.run(state)
+        timings.append(time.perf_counter() - start)
+        del state
+
+    state = case.setup()
+    tracemalloc.start()
+    case.run(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median = statistics.median(timings)
+    return {
+        'min_s': min(timings),
+        'median_s': median,
+        'ops_per_s': case.ops / median if median > 0 else float('inf'),
+        'peak_bytes': peak,
+    }
+
+
+def run_benchmarks(sizes: tuple[int, ...], repeat: int,
+                   pattern: Optional[str] = None) -> dict[str, dict]:
+    """ Runs every registered benchmark whose name contains pattern. """
+    inputs = game_inputs(sizes)
+    results = {}
+    for function in BENCHMARKS:
+        for case in function(inputs):
+            if pattern is not None and pattern not in case.name:
+                continue
+            results[case.name] = measure(case, repeat)
+            result = results[case.name]
+            print(f"{case.name:<45} {result['median_s'] * 1000:>10.3f} ms "
+                  f"{result['peak_bytes'] / 1024:>12.1f} KiB")
+    return results
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict],
+            threshold: float) -> list[str]:
+    """ Returns a description of every benchmark that regressed by more than
+        threshold (a fraction) in median time or peak memory.
+    """
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        for key in ('median_s', 'peak_bytes'):
+            if old[key] > 0 and result[key] > old[key] * (1 + threshold):
+                change = result[key] / old[key] - 1
+                regressions.append(f'{name} {key}: {old[key]:.6g} -> '
+                                   f'{result[key]:.6g} (+{change:.0%})')
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """ Command line entry point. Returns a non-zero exit code if any
+        benchmark regressed against the baseline.
+    """
+    parser = argparse.ArgumentParser(description='MazeRunner benchmarks')
+    parser.add_argument('-o', '--output', help='write results to this JSON file')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='flag regressions against a stored results file')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--sizes', type=int, nargs='*', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('-k', dest='pattern', help='only run matching names')
+    args = parser.parse_args(argv)
+
+    os.chdir(ROOT)  # the image views load sprites by relative path
+    results = run_benchmarks(tuple(args.sizes), args.repeat, args.pattern)
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print('REGRESSION', regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
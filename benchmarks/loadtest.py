@@ -0,0 +1,154 @@
+""" Load test for the game server.
+
+Usage:
+    python benchmarks/loadtest.py --sessions 200 --moves 500
+    python benchmarks/loadtest.py --port 8765 --sessions 50 -o load.json
+
+Each bot opens a session, then sends one random move at a time and waits for
+the server's reply, restarting whenever its game ends. Latency is the time
+from sending a move to receiving its reply. With no --port or --unix, a
+server is started in this process (without a rate limit unless --rate is
+given), so the figures include both ends.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from constants import DOWN, LEFT, RIGHT, SERVER_DEFAULT_GAME, SERVER_HOST, UP
+from server import PLAY, RESTART, WATCH, GameServer
+
+MOVES = (UP, DOWN, LEFT, RIGHT)
+DEFAULT_SESSIONS = 100
+DEFAULT_MOVES = 200
+
+
+async def connect(host: str, port: Optional[int], path: Optional[str]
+                  ) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    """ Opens a connection to the server. """
+    if path is not None:
+        return await asyncio.open_unix_connection(path)
+    return await asyncio.open_connection(host, port)
+
+
+async def read_event(reader: asyncio.StreamReader) -> dict:
+    """ Reads one event from the server. """
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError('Server closed the connection')
+    return json.loads(line)
+
+
+async def run_bot(address: tuple, game: str, num_moves: int, seed: int,
+                  latencies: list[float], num_spectators: int) -> int:
+    """ Plays random moves, recording the latency of each.
+
+    Returns:
+        The number of events the bot's spectators received.
+    """
+    rng = random.Random(seed)
+    reader, writer = await connect(*address)
+    writer.write(f'{PLAY} {game}\n'.encode())
+    state = await read_event(reader)
+    if state['type'] != 'state':
+        raise RuntimeError(f'Could not start a session: {state}')
+
+    async def spectate(reader: asyncio.StreamReader) -> int:
+        count = 0
+        while await reader.readline():
+            count += 1
+        return count
+
+    spectators = []
+    for _ in range(num_spectators):
+        spectator_reader, spectator_writer = await connect(*address)
+        spectator_writer.write(f'{WATCH} {state["session"]}\n'.encode())
+        await read_event(spectator_reader)
+        spectators.append(asyncio.create_task(spectate(spectator_reader)))
+
+    for _ in range(num_moves):
+        start = time.perf_counter()
+        writer.write(f'{rng.choice(MOVES)}\n'.encode())
+        event = await read_event(reader)
+        latencies.append(time.perf_counter() - start)
+        if event.get('result') is not None:
+            writer.write(f'{RESTART}\n'.encode())
+            await read_event(reader)
+    writer.close()
+    await writer.wait_closed()
+    return sum(await asyncio.gather(*spectators))
+
+
+async def load_test(sessions: int, num_moves: int, game: str, host: str,
+                    port: Optional[int], path: Optional[str],
+                    rate: float, spectators: int) -> dict[str, float]:
+    """ Runs every bot at once and summarises their latencies. """
+    listener = None
+    if port is None and path is None:
+        listener = await GameServer(max_sessions=sessions, rate=rate).start(
+            host, 0)
+        port = listener.sockets[0].getsockname()[1]
+    latencies = []
+    start = time.perf_counter()
+    watched = await asyncio.gather(*(
+        run_bot((host, port, path), game, num_moves, seed, latencies,
+                spectators)
+        for seed in range(sessions)))
+    elapsed = time.perf_counter() - start
+    if listener is not None:
+        listener.close()
+
+    latencies.sort()
+    return {
+        'sessions': sessions,
+        'moves': len(latencies),
+        'seconds': elapsed,
+        'moves_per_second': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000,
+        'max_ms': latencies[-1] * 1000,
+        'spectator_events': sum(watched),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """ Command line entry point. """
+    parser = argparse.ArgumentParser(description='Game server load test')
+    parser.add_argument('--sessions', type=int, default=DEFAULT_SESSIONS)
+    parser.add_argument('--moves', type=int, default=DEFAULT_MOVES,
+                        help='moves per session')
+    parser.add_argument('--game', default=SERVER_DEFAULT_GAME)
+    parser.add_argument('--spectators', type=int, default=0,
+                        help='spectators per session')
+    parser.add_argument('--host', default=SERVER_HOST)
+    parser.add_argument('--port', type=int,
+                        help='use a running server instead of starting one')
+    parser.add_argument('--unix', help='use a running server on this socket')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='rate limit of the server started here')
+    parser.add_argument('-o', '--output', help='write results to this JSON file')
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(load_test(
+        args.sessions, args.moves, args.game, args.host, args.port, args.unix,
+        args.rate, args.spectators))
+    for name, value in results.items():
+        print(f'{name:<20} {value:>12.2f}' if isinstance(value, float)
+              else f'{name:<20} {value:>12}')
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
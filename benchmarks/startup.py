@@ -0,0 +1,161 @@
+""" Startup-time benchmark for the MazeRunner entry points.
+
+Usage:
+    python benchmarks/startup.py
+    python benchmarks/startup.py --scale 2 -o startup.json
+
+Each check runs in a fresh interpreter. Import times come from
+`python -X importtime`, which also lists every module loaded, so each entry
+point is checked against the modules it must not pull in. Time to first
+frame covers the whole process: interpreter start, imports, loading the game
+and the first draw. The exit code is non-zero if any measurement is over its
+budget (multiplied by --scale for slower machines) or a forbidden module was
+imported. The GUI check needs a display; under a headless machine run it
+with `xvfb-run`.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GAME_FILE = os.path.join('games', 'game1.txt')
+DEFAULT_REPEAT = 5
+
+# Budgets in ms, generous enough for a typical laptop
+BUDGETS = {
+    'import a2_solution': 40,
+    'import a3': 80,
+    'first frame (text)': 150,
+    'first frame (gui)': 1000,
+}
+
+# Modules each entry point must not import at load time
+FORBIDDEN = {
+    'a2_solution': ('tkinter', 'PIL', 'snapshot', 'replay'),
+    'a3': ('PIL', 'snapshot', 'replay'),
+}
+
+GUI_FIRST_FRAME = f"""
+import tkinter as tk
+try:
+    root = tk.Tk()
+except tk.TclError:
+    raise SystemExit(3)
+import a3
+game = a3.ImageGraphicalMazeRunner({GAME_FILE!r}, root)
+game.play()
+root.update()
+"""
+NO_DISPLAY = 3
+
+
+def run_python(args: list[str], stdin: str = '') -> tuple[float, str, int]:
+    """ Runs a fresh interpreter in the repository root.
+
+    Returns:
+        The wall time in seconds, the captured stderr and the exit code.
+    """
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, *args], cwd=ROOT, input=stdin,
+                             capture_output=True, text=True)
+    return time.perf_counter() - start, process.stderr, process.returncode
+
+
+def import_profile(module: str) -> tuple[float, set[str]]:
+    """ Imports a module in a fresh interpreter with -X importtime.
+
+    Returns:
+        The cumulative import time of the module in seconds and the names of
+        every top-level package imported along with it.
+    """
+    _, stderr, code = run_python(['-X', 'importtime', '-c', f'import {module}'])
+    if code != 0:
+        raise RuntimeError(f'import {module} failed:\n{stderr}')
+    total = None
+    loaded = set()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        loaded.add(name.split('.')[0])
+        if name == module:
+            total = int(cumulative) / 1e6
+    return total, loaded
+
+
+def measure_startup(repeat: int) -> tuple[dict[str, float], list[str]]:
+    """ Runs every startup check, keeping the fastest of several runs.
+
+    Returns:
+        The time of each check in ms, and any forbidden imports found.
+    """
+    results = {}
+    problems = []
+    for module, forbidden in FORBIDDEN.items():
+        timings = []
+        for _ in range(repeat):
+            seconds, loaded = import_profile(module)
+            timings.append(seconds)
+        results[f'import {module}'] = min(timings) * 1000
+        for name in forbidden:
+            if name in loaded:
+                problems.append(f'import {module} also imports {name}')
+
+    script = GAME_FILE + '\n'
+    results['first frame (text)'] = min(
+        run_python(['a2_solution.py'], script)[0] for _ in range(repeat)
+    ) * 1000
+
+    timings = []
+    for _ in range(repeat):
+        seconds, stderr, code = run_python(['-c', GUI_FIRST_FRAME])
+        if code == NO_DISPLAY:
+            print('Skipping GUI first frame: no display', file=sys.stderr)
+            break
+        if code != 0:
+            raise RuntimeError(f'GUI first frame failed:\n{stderr}')
+        timings.append(seconds)
+    if timings:
+        results['first frame (gui)'] = min(timings) * 1000
+    return results, problems
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """ Command line entry point. Returns a non-zero exit code if startup is
+        over budget.
+    """
+    parser = argparse.ArgumentParser(description='MazeRunner startup budget')
+    parser.add_argument('-o', '--output', help='write results to this JSON file')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiply every budget by this factor')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    args = parser.parse_args(argv)
+
+    results, problems = measure_startup(args.repeat)
+    for name, milliseconds in results.items():
+        budget = BUDGETS[name] * args.scale
+        status = 'ok' if milliseconds <= budget else 'OVER BUDGET'
+        print(f'{name:<25} {milliseconds:>8.1f} ms  (budget {budget:.0f} ms)'
+              f'  {status}')
+        if milliseconds > budget:
+            problems.append(f'{name} took {milliseconds:.1f} ms, budget '
+                            f'{budget:.0f} ms')
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'results_ms': results, 'problems': problems}, file,
+                      indent=2)
+    for problem in problems:
+        print('FAIL', problem)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
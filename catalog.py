@@ -0,0 +1,198 @@
+""" A catalog of the game files in a directory, for the New Game picker.
+
+For each game file the catalog keeps its number of levels, the dimensions
+and coin count of each level, and a thumbnail of the first level. It is
+stored as a JSON index in the directory and refreshed incrementally: only
+files whose size or modification time changed are scanned again, so
+refreshing a library of thousands of unchanged files costs one directory
+listing.
+
+Scanning is a light pass over the text. Maze headers give each level's
+dimensions, coins are counted per line, and the thumbnail samples every
+n-th character of every n-th row. No Level or Maze is ever built.
+
+Usage (refreshes and lists a directory's catalog):
+    python catalog.py [DIRECTORY]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from constants import *
+
+CATALOG_VERSION = 2
+GAME_EXTENSION = '.txt'
+MAZE_HEADER = 'Maze'
+
+
+@dataclass
+class GameInfo:
+    """ What the catalog knows about one game file. """
+    name: str
+    size: int  # bytes
+    mtime: int  # ns
+    # The (#rows, #columns) and number of coins of each level, in order
+    dimensions: list[tuple[int, int]] = field(default_factory=list)
+    coins: list[int] = field(default_factory=list)
+    # Rows of tile and entity ids sampled from the first level
+    thumbnail: list[str] = field(default_factory=list)
+
+    def get_num_levels(self) -> int:
+        """ Returns the number of levels in the game. """
+        return len(self.dimensions)
+
+    def get_total_coins(self) -> int:
+        """ Returns the number of coins across every level. """
+        return sum(self.coins)
+
+    def to_json(self) -> dict:
+        """ Returns the game's entry in the JSON index. """
+        return vars(self)
+
+    @classmethod
+    def from_json(cls, data: dict) -> GameInfo:
+        """ Returns the game described by an entry of the JSON index. """
+        data = dict(data)
+        data['dimensions'] = [tuple(size) for size in data['dimensions']]
+        return cls(**data)
+
+
+def scan_game(path: str, thumbnail_size: int = THUMBNAIL_CELLS) -> GameInfo:
+    """ Reads the catalog entry of a game file in one light pass.
+
+    Parameters:
+        path: The game file.
+        thumbnail_size: The most cells along each side of the thumbnail.
+    """
+    stat = os.stat(path)
+    info = GameInfo(os.path.basename(path), stat.st_size, stat.st_mtime_ns)
+    step = row_num = 0
+    with open(path, 'r') as file:
+        for line in file:
+            line = line.rstrip('\r\n')  # Edge cells may be EMPTY (' ')
+            if line.startswith(MAZE_HEADER):
+                _, _, dimensions = line[len(MAZE_HEADER) + 1:] \
+                    .partition(' - ')
+                rows, columns = (int(size) for size in dimensions.split())
+                info.dimensions.append((rows, columns))
+                info.coins.append(0)
+                step = -(-max(rows, columns) // thumbnail_size)
+                row_num = 0
+            elif line and info.dimensions:
+                info.coins[-1] += line.count(COIN)
+                if len(info.dimensions) == 1 and row_num % step == 0:
+                    info.thumbnail.append(line[::step])
+                row_num += 1
+    return info
+
+
+class Catalog:
+    """ The catalog of one directory of game files. Refreshing builds a new
+        set of entries and swaps it in at the end, so it can run on a worker
+        thread while other threads read the catalog.
+    """
+    def __init__(self, directory: str = GAME_LIBRARY_DIR) -> None:
+        """ Loads the directory's saved catalog, if it has one.
+
+        Parameters:
+            directory: The directory of game files.
+        """
+        self._directory = directory
+        self._path = os.path.join(directory, CATALOG_FILE)
+        self._games = {}
+        self.load()
+
+    def get_directory(self) -> str:
+        """ Returns the directory of game files. """
+        return self._directory
+
+    def get_path(self, info: GameInfo) -> str:
+        """ Returns the path of a game file in the catalog. """
+        return os.path.join(self._directory, info.name)
+
+    def get_games(self) -> list[GameInfo]:
+        """ Returns every game file with at least one level, by name. """
+        return sorted((info for info in self._games.values()
+                       if info.dimensions), key=lambda info: info.name)
+
+    def load(self) -> None:
+        """ Reads the saved catalog, ignoring one that is missing, unreadable
+            or from another version.
+        """
+        try:
+            with open(self._path) as file:
+                data = json.load(file)
+            if data.get('version') == CATALOG_VERSION:
+                self._games = {entry['name']: GameInfo.from_json(entry)
+                               for entry in data['games']}
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def save(self) -> None:
+        """ Writes the catalog to the directory. """
+        from snapshot import write_atomic
+        data = {'version': CATALOG_VERSION,
+                'games': [info.to_json() for info in self._games.values()]}
+        write_atomic(self._path, json.dumps(
+            data, separators=(',', ':')).encode())
+
+    def refresh(self) -> tuple[int, int]:
+        """ Brings the catalog up to date with the directory, scanning only
+            new and changed files, and saves it if anything changed.
+
+        Returns:
+            The number of files scanned and the number of entries removed.
+        """
+        games = {}
+        scanned = 0
+        with os.scandir(self._directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith(GAME_EXTENSION) \
+                        or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                info = self._games.get(entry.name)
+                if info is None or info.size != stat.st_size \
+                        or info.mtime != stat.st_mtime_ns:
+                    try:
+                        info = scan_game(entry.path)
+                    except (OSError, ValueError, UnicodeDecodeError):
+                        continue  # Not a readable game file
+                    scanned += 1
+                games[entry.name] = info
+        removed = len(self._games.keys() - games.keys())
+        self._games = games
+        if scanned or removed:
+            try:
+                self.save()
+            except OSError:
+                pass  # The catalog is rebuilt next time instead
+        return scanned, removed
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """ Command line entry point: refreshes and lists a catalog. """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('directory', nargs='?', default=GAME_LIBRARY_DIR)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    catalog = Catalog(args.directory)
+    scanned, removed = catalog.refresh()
+    elapsed = time.perf_counter() - start
+    for info in catalog.get_games():
+        sizes = ', '.join(f'{rows}x{columns}'
+                          for rows, columns in info.dimensions)
+        print(f'{info.name:<24} {info.get_num_levels():>3} levels  '
+              f'{info.get_total_coins():>6} coins  {sizes}')
+    print(f'{len(catalog.get_games())} games; scanned {scanned}, removed '
+          f'{removed} in {elapsed * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -20,6 +20,11 @@ WATER = 'W'
 CANDY = 'S'
 LAVA_SHOES = 'J'
 
+# Enemies move once each time the player moves
+ENEMY = 'EN'
+PATROLLER = 'X'  # Walks back and forth, turning around when blocked
+CHASER = 'Z'  # Walks towards the player when they are within CHASE_RANGE
+
 APPLE_AMOUNT = -1
 HONEY_AMOUNT = -5
 WATER_AMOUNT = -5
@@ -40,11 +45,24 @@ MAX_HEALTH = 100
 MAX_HUNGER = 10
 MAX_THIRST = 10
 LAVA_DAMAGE = 5
+ENEMY_DAMAGE = 10
+CHASE_RANGE = 8  # Steps, ignoring walls
 
 WIN_MESSAGE = 'Congratulations! You have finished all levels and won the game!'
 LOSS_MESSAGE = 'You lose :('
 ITEM_UNAVAILABLE_MESSAGE = '\nYou don\'t have any of that item!\n'
 
+UNDO_COMMAND = 'u'
+REWIND_COMMAND = 'r'
+MEMORY_COMMAND = 'mem'
+ITEM_COMMAND = 'i'
+QUIT_KEY = 'q'
+RAW_KEY_INPUT = False  # Read single keypresses when playing in a terminal
+ANSI_TERMINAL = False  # Use the full-screen renderer in terminal.py
+CONSOLE_LINES = 5  # Lines below the frame kept for the prompt and messages
+VIEWPORT_MARGIN = 5  # Cells kept between the player and the viewport edge
+UNDO_HISTORY = 10000
+
 # Assignment 3 constants
 GAME_FILE = 'games/game2.txt'
 TASK = 2
@@ -65,6 +83,8 @@ ENTITY_COLOURS = {
     PLAYER: 'pink',
     CANDY: 'pink',
     LAVA_SHOES: 'orange',
+    PATROLLER: '#8E7CC3',
+    CHASER: '#CC0000',
 }
 
 THEME_COLOUR = '#C1E1C1'
@@ -93,5 +113,83 @@ ENTITY_IMAGES = {
     WATER: 'water.png',
     PLAYER: 'player.png',
     CANDY: 'candy.png',
-    LAVA_SHOES: 'shoes.png'
+    LAVA_SHOES: 'shoes.png',
+    PATROLLER: 'patroller.png',
+    CHASER: 'chaser.png',
 }
+
+# Saving (see snapshot.py); autosave every AUTOSAVE_INTERVAL moves, 0 = off
+SAVE_EXTENSION = '.sav'
+AUTOSAVE_FILE = 'autosave.sav'
+AUTOSAVE_INTERVAL = 20
+
+# Frame profiling (see instrumentation.py)
+PROFILE_FRAMES = False
+PROFILE_OVERLAY = False
+PROFILE_DUMP_FILE = 'frame_profile.json'
+
+# Replays (see replay.py); a keyframe is stored every KEYFRAME_INTERVAL actions
+REPLAY_EXTENSION = '.rpl'
+RECORD_REPLAYS = True
+KEYFRAME_INTERVAL = 1000
+REPLAY_DELAY = 100  # ms between actions during GUI playback
+MIN_REPLAY_DELAY = 5
+MAX_REPLAY_DELAY = 2000
+
+# Animation export (see animation.py)
+ANIMATION_CELL_SIZE = 24
+MAX_ANIMATION_SIZE = 4096  # pixels along the longest side
+ANIMATION_FRAME_DURATION = 100  # ms per action
+
+# Sprite atlas (see assets.py)
+ATLAS_SPRITE_SIZE = 256  # pixels; larger than any cell drawn
+ASSET_WORKERS = 4
+PREFETCH_POLL = 50  # ms between checks on a level being prefetched
+
+# Endless mode (see endless.py): generated levels follow the game file's
+ENDLESS_MODE = False
+ENDLESS_SEED = 0
+ENDLESS_AHEAD = 3  # levels generated before they are needed
+ENDLESS_START_SIZE = 15
+ENDLESS_GROWTH = 1.5  # size of each generated level relative to the last
+ENDLESS_MAX_SIZE = 1001
+ENDLESS_COINS = 12  # coins per generated level, on average
+MIN_CELL_SIZE = 4  # pixels; caps the size of endless levels in the GUI
+
+# Game server (see server.py)
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8765
+SERVER_GAMES_DIR = 'games'
+SERVER_DEFAULT_GAME = 'game1.txt'
+SERVER_MAX_SESSIONS = 1000
+SERVER_RATE_LIMIT = 50  # commands per second per session, 0 = unlimited
+SERVER_BURST = 20  # commands a session can send at once before being limited
+SERVER_QUEUE_SIZE = 256  # events queued for a client before backpressure
+SERVER_MAX_LINE = 4096  # bytes
+
+# Run history (see history.py)
+RECORD_HISTORY = True
+HISTORY_FILE = 'history.db'
+HISTORY_REPLAYS = True  # keep each run's replay in the database
+HISTORY_BATCH_SIZE = 100  # runs written per transaction
+HISTORY_FLUSH_INTERVAL = 1.0  # seconds a run may wait to be written
+HISTORY_POLL = 50  # ms between checks on a leaderboard query
+LEADERBOARD_SIZE = 10
+
+# Stats history (see stats_history.py) and its sparklines in the stats view
+STATS_HISTORY_SIZE = 4096  # samples kept; 0 = off
+SPARKLINE_POINTS = 60  # most recent moves shown
+SPARKLINE_COLOUR = '#6B8E6B'
+SPARKLINE_PADDING = 6  # pixels between a sparkline and its cell's edge
+
+# Game library (see catalog.py), shown by the New Game picker
+GAME_LIBRARY_DIR = 'games'
+CATALOG_FILE = '.catalog.json'
+THUMBNAIL_CELLS = 24  # most cells along each side of a thumbnail
+THUMBNAIL_SIZE = 96  # pixels
+LIBRARY_CHUNK = 500  # games added to the picker per Tk callback
+LIBRARY_POLL = 50  # ms between checks on a catalog refresh
+
+# Minimap of the whole level, below the inventory
+MINIMAP_SIZE = 180  # most pixels along each side; 0 turns the minimap off
+MINIMAP_DOT = 4  # smallest diameter of the player's dot, in pixels
@@ -0,0 +1,142 @@
+""" Endless mode: once the levels of a game file run out, play continues on
+procedurally generated levels that grow in size and difficulty.
+
+Levels are generated by generator.py on a worker process a few levels ahead
+of the player, and arrive already parsed, so a level up never waits for
+generation. Each level depends only on the seed and its level number, so an
+endless run is reproducible from its seed.
+"""
+from __future__ import annotations
+
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import NamedTuple
+
+import zobrist
+from a2_solution import EnemyGrid, Item, Level
+from constants import *
+from generator import MIN_DIMENSION, generate_rows
+
+
+class GeneratedLevel(NamedTuple):
+    """ A generated level and the state Model.add_level would otherwise work
+        out from it, all computed on the worker process.
+    """
+    level: Level
+    initial_items: dict[tuple[int, int], Item]
+    initial_enemies: EnemyGrid
+    items_hash: int  # XOR of the Zobrist keys of the level's items
+
+
+def level_settings(step: int, max_size: int
+                   ) -> tuple[tuple[int, int], dict[str, float]]:
+    """ Returns the dimensions and generator densities of a generated level.
+        Each level is larger than the last, with more lava and enemies and
+        fewer useful items. The number of coins stays about the same.
+
+    Parameters:
+        step: The number of generated levels before this one.
+        max_size: The largest number of rows or columns allowed.
+    """
+    size = min(max_size, round(ENDLESS_START_SIZE * ENDLESS_GROWTH ** step))
+    size = max(MIN_DIMENSION, size - (size + 1) % 2)  # Odd sizes fill evenly
+    open_squares = size * size / 2
+    return (size, size), {
+        'coin_density': min(0.05, ENDLESS_COINS / open_squares),
+        'item_density': max(0.002, 0.01 - 0.001 * step),
+        'lava_density': min(0.1, 0.02 + 0.01 * step),
+        'enemy_density': min(0.03, 0.003 * step),
+    }
+
+
+def build_level(seed: int, level_num: int, step: int,
+                max_size: int) -> GeneratedLevel:
+    """ Generates and parses one level. Runs on the worker process.
+
+    Parameters:
+        seed: The seed of the endless run.
+        level_num: The index of the level in the whole game.
+        step: The number of generated levels before this one.
+        max_size: The largest number of rows or columns allowed.
+    """
+    dimensions, densities = level_settings(step, max_size)
+    level = Level(dimensions)
+    for row in generate_rows(dimensions, seed, level_num, **densities):
+        level.add_row(row)
+    items_hash = 0
+    for position, item in level.get_items().items():
+        items_hash ^= zobrist.item_key(level_num, position, item.get_id())
+    return GeneratedLevel(level, dict(level.get_items()),
+                          level.get_enemies().copy(), items_hash)
+
+
+class EndlessLevels:
+    """ Supplies the levels after the last level of a game file. Up to
+        `ahead` levels are generating or waiting at any time, so memory stays
+        bounded however far ahead generation gets.
+    """
+    def __init__(self, seed: int, first_level: int,
+                 ahead: int = ENDLESS_AHEAD,
+                 max_size: int = ENDLESS_MAX_SIZE) -> None:
+        """ Starts generating the first few levels.
+
+        Parameters:
+            seed: The seed that every level is generated from.
+            first_level: The level number of the first generated level.
+            ahead: The most levels to generate before they are needed.
+            max_size: The largest number of rows or columns in a level.
+        """
+        self._seed = seed
+        self._first_level = first_level
+        self._ahead = ahead
+        self._max_size = max_size
+        # Spawned rather than forked, since the game may be running Tk and
+        # other threads that a forked child would inherit in a broken state
+        self._pool = ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+        self._pending: dict[int, Future] = {}
+        self._next = first_level  # The next level to be handed out
+        self._fill()
+
+    def _fill(self) -> None:
+        """ Submits levels until `ahead` are generating or ready. """
+        level_num = self._next + len(self._pending)
+        while len(self._pending) < self._ahead:
+            self._pending[level_num] = self._pool.submit(
+                build_level, self._seed, level_num,
+                level_num - self._first_level, self._max_size)
+            level_num += 1
+
+    def get_seed(self) -> int:
+        """ Returns the seed that every level is generated from. """
+        return self._seed
+
+    def get_max_size(self) -> int:
+        """ Returns the largest number of rows or columns in a level. """
+        return self._max_size
+
+    def is_ready(self, level_num: int) -> bool:
+        """ Returns True iff a level can be taken without waiting. """
+        future = self._pending.get(level_num)
+        return future is not None and future.done()
+
+    def get_level(self, level_num: int) -> GeneratedLevel:
+        """ Takes the next level, waiting for it if it is still generating.
+
+        Parameters:
+            level_num: The level wanted, which must be the next one due.
+
+        Raises:
+            ValueError: If level_num is not the next level due.
+        """
+        if level_num != self._next:
+            raise ValueError(f'Expected level {self._next}, not {level_num}')
+        generated = self._pending.pop(level_num).result()
+        self._next += 1
+        self._fill()
+        return generated
+
+    def close(self) -> None:
+        """ Stops the worker process, abandoning levels not yet taken. """
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pending.clear()
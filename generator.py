@@ -0,0 +1,230 @@
+""" Seeded procedural generation of MazeRunner game files.
+
+Levels are carved with a downward sidewinder algorithm, which only ever needs
+the current row of cells in memory. Each row is written to disk as soon as it
+is complete, so generating a 5000x5000 level costs O(#columns) memory.
+
+Every generated level is solvable: the carved passages form a spanning tree
+over all open cells, so the player start, every item and the door are all
+reachable from one another without crossing a wall (lava is walkable).
+"""
+from __future__ import annotations
+
+import argparse
+import random
+from typing import Iterator, Optional, TextIO
+
+from constants import *
+
+MIN_DIMENSION = 3
+MAX_DIMENSION = 5000
+DOOR_SIDES = ('top', 'bottom', 'left', 'right')
+RANDOM_SIDE = 'random'
+OTHER_ITEMS = (POTION, HONEY, APPLE, WATER)
+ENEMY_TYPES = (PATROLLER, CHASER)
+
+
+def _level_rng(seed: int, level_num: int) -> random.Random:
+    """ Returns the random number generator for one level of a game. Seeding
+        per level means any level can be regenerated without the others.
+
+    Parameters:
+        seed: The seed for the whole game.
+        level_num: The (zero-based) index of the level.
+    """
+    return random.Random(f'{seed}:{level_num}')
+
+
+def generate_rows(
+    dimensions: tuple[int, int],
+    seed: int = 0,
+    level_num: int = 0,
+    coin_density: float = 0.02,
+    item_density: float = 0.01,
+    lava_density: float = 0.02,
+    door_side: str = RANDOM_SIDE,
+    enemy_density: float = 0.0,
+) -> Iterator[str]:
+    """ Yields the rows of one generated level, top to bottom.
+
+    Parameters:
+        dimensions: The (#rows, #columns) of the level.
+        seed: The seed for the whole game.
+        level_num: The index of this level within the game.
+        coin_density: Chance that an open square holds a coin.
+        item_density: Chance that an open square holds a non-coin item.
+        lava_density: Chance that an open square is lava.
+        door_side: One of 'top', 'bottom', 'left', 'right' or 'random'.
+        enemy_density: Chance that an open square holds an enemy.
+    """
+    num_rows, num_cols = dimensions
+    for size in dimensions:
+        if not MIN_DIMENSION <= size <= MAX_DIMENSION:
+            raise ValueError(
+                f'Dimensions must be between {MIN_DIMENSION} and '
+                f'{MAX_DIMENSION}, got {dimensions}'
+            )
+    if door_side != RANDOM_SIDE and door_side not in DOOR_SIDES:
+        raise ValueError(f'Unknown door side: {door_side!r}')
+
+    rng = _level_rng(seed, level_num)
+    cell_rows, cell_cols = (num_rows - 1) // 2, (num_cols - 1) // 2
+    last_row, last_col = 2 * cell_rows - 1, 2 * cell_cols - 1
+
+    if door_side == RANDOM_SIDE:
+        door_side = rng.choice(DOOR_SIDES)
+    door_cell = rng.randrange(cell_cols if door_side in ('top', 'bottom')
+                              else cell_rows) * 2 + 1
+    player = (rng.randrange(cell_rows) * 2 + 1, rng.randrange(cell_cols) * 2 + 1)
+
+    def fill(row: list[str], row_num: int) -> str:
+        """ Places the player, items and lava over the open squares of a row.
+        """
+        for col, char in enumerate(row):
+            if char != EMPTY:
+                continue
+            if (row_num, col) == player:
+                row[col] = PLAYER
+                continue
+            roll = rng.random()
+            if roll < coin_density:
+                row[col] = COIN
+            elif roll < coin_density + item_density:
+                row[col] = rng.choice(OTHER_ITEMS)
+            elif roll < coin_density + item_density + lava_density:
+                row[col] = LAVA
+            elif roll < (coin_density + item_density + lava_density
+                         + enemy_density):
+                row[col] = rng.choice(ENEMY_TYPES)
+        return ''.join(row)
+
+    def wall_row(row_num: int, openings: list[int]) -> str:
+        """ Returns a row of wall with the given columns opened. """
+        row = [WALL] * num_cols
+        for col in openings:
+            row[col] = EMPTY
+        # Corridor from the last cell row out through a bottom door
+        if door_side == 'bottom' and row_num > last_row:
+            row[door_cell] = DOOR if row_num == num_rows - 1 else EMPTY
+        return fill(row, row_num)
+
+    yield wall_row(0, []) if door_side != 'top' else \
+        ''.join(DOOR if col == door_cell else WALL for col in range(num_cols))
+
+    for cell_row in range(cell_rows):
+        row_num = 2 * cell_row + 1
+        row = [WALL] * num_cols
+        downs = []
+        run_start = 1
+        for cell_col in range(cell_cols):
+            col = 2 * cell_col + 1
+            row[col] = EMPTY
+            is_last = cell_col == cell_cols - 1
+            # The final row is a single run, joining everything above it
+            if cell_row == cell_rows - 1 or (not is_last and rng.random() < 0.5):
+                if not is_last:
+                    row[col + 1] = EMPTY
+            else:
+                downs.append(rng.randrange(run_start, col + 1, 2))
+                run_start = col + 2
+
+        if row_num == door_cell and door_side in ('left', 'right'):
+            if door_side == 'left':
+                row[0] = DOOR
+            else:
+                for col in range(last_col + 1, num_cols - 1):
+                    row[col] = EMPTY
+                row[num_cols - 1] = DOOR
+
+        yield fill(row, row_num)
+        if row_num + 1 < num_rows:
+            yield wall_row(row_num + 1, downs)
+
+    for row_num in range(last_row + 2, num_rows):
+        yield wall_row(row_num, [])
+
+
+def write_level(
+    file: TextIO,
+    level_num: int,
+    dimensions: tuple[int, int],
+    seed: int = 0,
+    **options,
+) -> None:
+    """ Streams one generated level, including its Maze header, to a file.
+
+    Parameters:
+        file: The open text file to write to.
+        level_num: The (zero-based) index of the level within the game.
+        dimensions: The (#rows, #columns) of the level.
+        seed: The seed for the whole game.
+        options: Densities and door side, as for generate_rows.
+    """
+    num_rows, num_cols = dimensions
+    file.write(f'Maze {level_num + 1} - {num_rows} {num_cols}\n')
+    for row in generate_rows(dimensions, seed, level_num, **options):
+        file.write(row)
+        file.write('\n')
+    file.write('\n')
+
+
+def generate_game(
+    filename: str,
+    dimensions: tuple[int, int],
+    num_levels: int = 1,
+    seed: int = 0,
+    coin_density: float = 0.02,
+    item_density: float = 0.01,
+    lava_density: float = 0.02,
+    door_side: str = RANDOM_SIDE,
+    enemy_density: float = 0.0,
+) -> None:
+    """ Writes a complete generated game file. The same arguments always
+        produce the same file.
+
+    Parameters:
+        filename: The path of the game file to create.
+        dimensions: The (#rows, #columns) of every level.
+        num_levels: The number of levels in the game.
+        seed: The seed from which all levels are generated.
+        coin_density: Chance that an open square holds a coin.
+        item_density: Chance that an open square holds a non-coin item.
+        lava_density: Chance that an open square is lava.
+        door_side: One of 'top', 'bottom', 'left', 'right' or 'random'.
+        enemy_density: Chance that an open square holds an enemy.
+    """
+    with open(filename, 'w') as file:
+        for level_num in range(num_levels):
+            write_level(
+                file, level_num, dimensions, seed,
+                coin_density=coin_density,
+                item_density=item_density,
+                lava_density=lava_density,
+                door_side=door_side,
+                enemy_density=enemy_density,
+            )
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """ Command line entry point for generating game files. """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('filename')
+    parser.add_argument('--rows', type=int, default=21)
+    parser.add_argument('--cols', type=int, default=21)
+    parser.add_argument('--levels', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--coins', type=float, default=0.02)
+    parser.add_argument('--items', type=float, default=0.01)
+    parser.add_argument('--lava', type=float, default=0.02)
+    parser.add_argument('--enemies', type=float, default=0.0)
+    parser.add_argument('--door', choices=DOOR_SIDES + (RANDOM_SIDE,),
+                        default=RANDOM_SIDE)
+    args = parser.parse_args(argv)
+    generate_game(
+        args.filename, (args.rows, args.cols), args.levels, args.seed,
+        args.coins, args.items, args.lava, args.door, args.enemies
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,321 @@
+""" A SQLite history of finished runs, with per-game and per-level
+leaderboards.
+
+Runs are recorded without blocking: they are queued for a background thread
+that owns the database connection and writes them in batches, one
+transaction per batch. Queries go through the same thread and return
+futures, so the game can poll for results instead of waiting on the
+database. A query first writes any runs still queued, so it always sees
+them.
+
+Each game is stored once in `games`, keyed by the hash of its file. Runs
+refer to it by id, and replays are kept in a table of their own so that
+leaderboard queries never read them. The index on (game, level DESC,
+seconds, moves) matches both leaderboard orders, so each query reads only
+the rows it returns, however many runs are stored.
+
+Usage (prints the leaderboard for a game file):
+    python history.py GAME_FILE [--level N]
+"""
+from __future__ import annotations
+
+import argparse
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from constants import *
+
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    hash BLOB NOT NULL UNIQUE,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    game_id INTEGER NOT NULL REFERENCES games (id),
+    level INTEGER NOT NULL,
+    won INTEGER NOT NULL,
+    moves INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    health INTEGER NOT NULL,
+    hunger INTEGER NOT NULL,
+    thirst INTEGER NOT NULL,
+    finished REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS replays (
+    run_id INTEGER PRIMARY KEY REFERENCES runs (id),
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_game_level
+    ON runs (game_id, level DESC, seconds, moves);
+"""
+RUN_COLUMNS = ('runs.id, games.hash, games.name, level, won, moves, seconds, '
+               'health, hunger, thirst, finished')
+FLUSH = object()  # Queued to write any pending runs straight away
+
+
+@dataclass
+class RunRecord:
+    """ One finished game. """
+    game_hash: bytes
+    game_name: str
+    level: int  # The (zero-based) level reached; the #levels for a win
+    won: bool
+    moves: int
+    seconds: float
+    stats: tuple[int, int, int]
+    finished: float = field(default_factory=time.time)  # Unix time
+    replay: Optional[bytes] = None  # An encoded Replay
+    run_id: Optional[int] = None  # Set on runs read from the database
+
+    @classmethod
+    def from_model(cls, model: 'Model', seconds: float,
+                   replay: Optional[bytes] = None) -> RunRecord:
+        """ Returns the record of a game that has just ended.
+
+        Parameters:
+            model: The finished game.
+            seconds: How long the game took.
+            replay: The game's encoded replay, if it is to be kept.
+        """
+        return cls(model.get_game_hash(),
+                   os.path.basename(model.get_game_file()),
+                   model.get_level_num(), model.has_won(),
+                   model.get_num_moves(), seconds, model.get_player_stats(),
+                   replay=replay)
+
+    @classmethod
+    def from_row(cls, row: tuple) -> RunRecord:
+        """ Returns a run read with RUN_COLUMNS, without its replay. """
+        (run_id, game_hash, name, level, won, moves, seconds, health, hunger,
+         thirst, finished) = row
+        return cls(game_hash, name, level, bool(won), moves, seconds,
+                   (health, hunger, thirst), finished, run_id=run_id)
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """ Opens a history database, creating its tables if need be. """
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode = WAL')
+    connection.execute('PRAGMA synchronous = NORMAL')
+    version, = connection.execute('PRAGMA user_version').fetchone()
+    if version > SCHEMA_VERSION:
+        raise ValueError(f'History database is from a newer version '
+                         f'({version})')
+    with connection:
+        connection.executescript(SCHEMA)
+        connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    return connection
+
+
+class RunHistory:
+    """ Records runs on a background thread, and answers leaderboard queries
+        with futures. Recording never blocks.
+    """
+    def __init__(self, path: str = HISTORY_FILE,
+                 batch_size: int = HISTORY_BATCH_SIZE,
+                 flush_interval: float = HISTORY_FLUSH_INTERVAL) -> None:
+        """ Opens the database and starts the history thread.
+
+        Parameters:
+            path: The database file.
+            batch_size: The most runs written in one transaction.
+            flush_interval: The longest a run waits to be written, in seconds.
+        """
+        self._connection = connect(path)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._game_ids = {}  # Maps game hashes to their ids
+        self._tasks = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, run: RunRecord) -> None:
+        """ Queues a run to be written. """
+        self._tasks.put(run)
+
+    def _submit(self, function: Callable[[sqlite3.Connection], Any]
+                ) -> Future:
+        """ Queues a function to call with the connection on the history
+            thread, after any runs queued before it have been written.
+        """
+        future = Future()
+        self._tasks.put((function, future))
+        return future
+
+    def flush(self) -> Future:
+        """ Writes every run queued so far. The future is done once they are
+            written.
+        """
+        return self._submit(lambda connection: None)
+
+    def leaderboard(self, game_hash: bytes, level: Optional[int] = None,
+                    limit: int = LEADERBOARD_SIZE) -> Future:
+        """ Finds the best runs of a game: those that got furthest, then the
+            fastest and then those with the fewest moves.
+
+        Parameters:
+            game_hash: The hash of the game file.
+            level: If given, only runs that ended on this level are ranked.
+            limit: The most runs to return.
+
+        Returns:
+            A future of the runs in order, as RunRecords without replays.
+        """
+        query = (f'SELECT {RUN_COLUMNS} FROM runs '
+                 'JOIN games ON games.id = runs.game_id '
+                 'WHERE games.hash = ?')
+        parameters = [game_hash]
+        if level is not None:
+            query += ' AND level = ?'
+            parameters.append(level)
+        query += ' ORDER BY level DESC, seconds, moves LIMIT ?'
+        parameters.append(limit)
+
+        def run(connection: sqlite3.Connection) -> list[RunRecord]:
+            return [RunRecord.from_row(row)
+                    for row in connection.execute(query, parameters)]
+        return self._submit(run)
+
+    def count_runs(self, game_hash: bytes) -> Future:
+        """ Returns a future of the number of runs recorded for a game. """
+        def run(connection: sqlite3.Connection) -> int:
+            return connection.execute(
+                'SELECT COUNT(*) FROM runs JOIN games '
+                'ON games.id = runs.game_id WHERE games.hash = ?',
+                (game_hash,)).fetchone()[0]
+        return self._submit(run)
+
+    def get_replay(self, run_id: int) -> Future:
+        """ Returns a future of the encoded replay of a run, or None if its
+            replay was not kept.
+        """
+        def run(connection: sqlite3.Connection) -> Optional[bytes]:
+            row = connection.execute(
+                'SELECT data FROM replays WHERE run_id = ?',
+                (run_id,)).fetchone()
+            return row[0] if row is not None else None
+        return self._submit(run)
+
+    def close(self) -> None:
+        """ Writes any queued runs, then stops the thread and closes the
+            database. Does nothing if already closed.
+        """
+        if self._thread.is_alive():
+            self._tasks.put(None)
+            self._thread.join()
+        atexit.unregister(self.close)
+
+    def _game_id(self, run: RunRecord) -> int:
+        """ Returns the id of a run's game, adding the game if it is new. """
+        game_id = self._game_ids.get(run.game_hash)
+        if game_id is None:
+            connection = self._connection
+            connection.execute(
+                'INSERT OR IGNORE INTO games (hash, name) VALUES (?, ?)',
+                (run.game_hash, run.game_name))
+            game_id = self._game_ids[run.game_hash] = connection.execute(
+                'SELECT id FROM games WHERE hash = ?',
+                (run.game_hash,)).fetchone()[0]
+        return game_id
+
+    def _write(self, runs: list[RunRecord]) -> None:
+        """ Writes a batch of runs in one transaction. A batch that fails is
+            dropped rather than retried, so a broken database never backs up
+            the queue.
+        """
+        try:
+            with self._connection as connection:
+                for run in runs:
+                    run.run_id = connection.execute(
+                        'INSERT INTO runs (game_id, level, won, moves, '
+                        'seconds, health, hunger, thirst, finished) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        (self._game_id(run), run.level, run.won, run.moves,
+                         run.seconds, *run.stats, run.finished)).lastrowid
+                connection.executemany(
+                    'INSERT INTO replays (run_id, data) VALUES (?, ?)',
+                    [(run.run_id, run.replay) for run in runs
+                     if run.replay is not None])
+        except sqlite3.Error:
+            self._game_ids.clear()  # Games added in the batch were rolled back
+
+    def _run(self) -> None:
+        """ Writes runs in batches and answers queries until closed. A batch
+            is written once it is full, once its oldest run has waited
+            flush_interval seconds, or before a query or close.
+        """
+        batch = []
+        deadline = None
+        while True:
+            try:
+                task = self._tasks.get(timeout=None if deadline is None else
+                                       max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                task = FLUSH
+            if isinstance(task, RunRecord):
+                if not batch:
+                    deadline = time.monotonic() + self._flush_interval
+                batch.append(task)
+                if len(batch) < self._batch_size:
+                    continue
+            if batch:
+                self._write(batch)
+                batch = []
+                deadline = None
+            if task is None:
+                self._connection.close()
+                return
+            if isinstance(task, tuple):
+                function, future = task
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(function(self._connection))
+                    except Exception as error:
+                        future.set_exception(error)
+
+
+def format_leaderboard(runs: list[RunRecord]) -> str:
+    """ Returns a leaderboard as one line per run. """
+    if not runs:
+        return 'No runs recorded yet.'
+    lines = []
+    for place, run in enumerate(runs, 1):
+        minutes, seconds = divmod(int(run.seconds), 60)
+        result = 'won' if run.won else f'level {run.level + 1}'
+        lines.append(f'{place:>2}. {result:<9} {minutes}m {seconds:02}s  '
+                     f'{run.moves} moves')
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """ Command line entry point: prints the leaderboard for a game file. """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('game_file')
+    parser.add_argument('--level', type=int, default=None,
+                        help='only runs that ended on this (1-based) level')
+    parser.add_argument('--limit', type=int, default=LEADERBOARD_SIZE)
+    parser.add_argument('--database', default=HISTORY_FILE)
+    args = parser.parse_args(argv)
+
+    from snapshot import hash_file
+    history = RunHistory(args.database)
+    level = args.level - 1 if args.level is not None else None
+    runs = history.leaderboard(hash_file(args.game_file), level,
+                               args.limit).result()
+    history.close()
+    print(format_leaderboard(runs))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+""" Opt-in frame timing for the graphical MazeRunner.
+
+A FrameProfiler wraps the runner's handlers on the instance it is attached to,
+so an unprofiled game runs the original methods with no added cost at all.
+"""
+from __future__ import annotations
+
+import json
+import math
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, Callable
+
+if TYPE_CHECKING:
+    import tkinter as tk
+
+    from a3 import GraphicalMazeRunner
+
+KEYPRESS = 'keypress'
+LATENCY = 'keypress_to_idle'
+CREATED = 'canvas_items_created'
+DELETED = 'canvas_items_deleted'
+RUNNER_PHASES = ('_handle_move', '_redraw')
+VIEW_PHASES = ('_draw_level', '_draw_player_stats', '_draw_inventory')
+PERCENTILES = (50, 95, 99)
+MAX_SAMPLES = 10000
+
+
+def percentile(samples: list[float], percent: int) -> float:
+    """ Returns the nearest-rank percentile of some sorted samples.
+
+    Parameters:
+        samples: The samples, sorted in increasing order.
+        percent: The percentile to find, between 0 and 100.
+    """
+    if not samples:
+        return 0.0
+    rank = max(math.ceil(percent / 100 * len(samples)), 1)
+    return samples[rank - 1]
+
+
+class FrameProfiler:
+    """ Records per-keypress phase timings and canvas churn for a
+        GraphicalMazeRunner.
+    """
+    def __init__(self, max_samples: int = MAX_SAMPLES) -> None:
+        """ Sets up an empty profiler.
+
+        Parameters:
+            max_samples: The number of recent samples kept for each phase.
+        """
+        self._max_samples = max_samples
+        self._samples = {}
+        self._patched = []
+        self._runner = None
+        self._overlay = None
+
+    def record(self, phase: str, value: float) -> None:
+        """ Adds one sample for a phase.
+
+        Parameters:
+            phase: The name of the phase.
+            value: Seconds spent in the phase, or an item count.
+        """
+        samples = self._samples.get(phase)
+        if samples is None:
+            samples = self._samples[phase] = deque(maxlen=self._max_samples)
+        samples.append(value)
+
+    def _timed(self, phase: str, function: Callable) -> Callable:
+        """ Returns a wrapper around function that records its duration. """
+        def wrapper(*args, **kwargs) -> Any:
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(phase, time.perf_counter() - start)
+        return wrapper
+
+    def _patch(self, target: Any, name: str, replacement: Callable) -> None:
+        """ Replaces a method on one instance, remembering how to undo it. """
+        self._patched.append((target, name))
+        setattr(target, name, replacement)
+
+    def _canvas_items(self) -> tuple[int, ...]:
+        """ Returns the ids of every item on the runner's level canvas. """
+        level = self._runner._view.level
+        return level.find_all() if level is not None else ()
+
+    def attach(self, runner: 'GraphicalMazeRunner') -> None:
+        """ Starts profiling a runner. Must be called before runner.play(),
+            which binds the keypress handler.
+
+        Parameters:
+            runner: The graphical runner to instrument.
+        """
+        self.detach()
+        self._runner = runner
+        view = runner._view
+        for name in RUNNER_PHASES:
+            self._patch(runner, name, self._timed(name, getattr(runner, name)))
+        for name in VIEW_PHASES:
+            self._patch(view, name, self._timed(name, getattr(view, name)))
+
+        handler = runner._handle_keypress
+
+        def handle_keypress(event) -> None:
+            start = time.perf_counter()
+            before = self._canvas_items()
+            handler(event)
+            self.record(KEYPRESS, time.perf_counter() - start)
+            try:
+                after = self._canvas_items()
+            except Exception:  # the window was destroyed on a win or loss
+                return
+            newest = max(before, default=0)
+            created = sum(1 for item in after if item > newest)
+            self.record(CREATED, created)
+            self.record(DELETED, len(before) - (len(after) - created))
+            runner._master.after_idle(self._on_idle, start)
+
+        self._patch(runner, '_handle_keypress', handle_keypress)
+
+    def detach(self) -> None:
+        """ Stops profiling, restoring the runner's original methods. """
+        for target, name in reversed(self._patched):
+            delattr(target, name)
+        self._patched = []
+        self._runner = None
+
+    def _on_idle(self, start: float) -> None:
+        """ Records the latency from a keypress to the event loop going idle.
+        """
+        self.record(LATENCY, time.perf_counter() - start)
+        if self._overlay is not None:
+            self._overlay.config(text=self.format_summary())
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """ Returns count, mean and p50/p95/p99 for every recorded phase. """
+        summary = {}
+        for phase, samples in self._samples.items():
+            ordered = sorted(samples)
+            stats = {'count': len(ordered), 'mean': sum(ordered) / len(ordered)}
+            for percent in PERCENTILES:
+                stats[f'p{percent}'] = percentile(ordered, percent)
+            summary[phase] = stats
+        return summary
+
+    def format_summary(self) -> str:
+        """ Returns the summary as text, with timings in milliseconds. """
+        lines = []
+        for phase, stats in self.summary().items():
+            scale, unit = (1, '') if phase in (CREATED, DELETED) else (1000, 'ms')
+            values = ' '.join(f"p{p}={stats[f'p{p}'] * scale:.2f}"
+                              for p in PERCENTILES)
+            lines.append(f'{phase}: {values}{unit}')
+        return '\n'.join(lines)
+
+    def show_overlay(self, master: 'tk.Tk') -> None:
+        """ Shows a live summary in the corner of the game window.
+
+        Parameters:
+            master: The root window of the game.
+        """
+        import tkinter as tk
+        self._overlay = tk.Label(master, justify=tk.LEFT, anchor='ne',
+                                 font=('Courier', 9), bg='white')
+        self._overlay.place(relx=1.0, rely=0.0, anchor='ne')
+
+    def dump(self, filename: str) -> None:
+        """ Writes the summary and every raw sample to a JSON file.
+
+        Parameters:
+            filename: The path of the file to write.
+        """
+        data = {
+            'summary': self.summary(),
+            'samples': {phase: list(samples)
+                        for phase, samples in self._samples.items()},
+        }
+        with open(filename, 'w') as file:
+            json.dump(data, file, indent=2)
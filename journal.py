@@ -0,0 +1,63 @@
+""" A bounded journal of reverse deltas, used to undo moves in a Model.
+
+Each entry records only what one move or item use changed, so undoing K
+actions costs O(K) regardless of the size of the maze.
+"""
+from __future__ import annotations
+
+from collections import deque
+from typing import TYPE_CHECKING, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    from a2_solution import Item
+
+
+class Delta(NamedTuple):
+    """ The state needed to reverse one move or item use. """
+    position: tuple[int, int]  # Player position before the action
+    health: int
+    hunger: int
+    thirst: int
+    num_moves: int  # Moves made before the action
+    item: Optional['Item'] = None  # The item collected or used, if any
+    used: bool = False  # True iff item was used rather than collected
+    unlocked: bool = False  # True iff the action unlocked the level's doors
+    levelled_up: bool = False  # True iff the action finished the level
+    enemies: Optional[bytes] = None  # Codes from EnemyGrid.tick, if any
+
+
+class MoveJournal:
+    """ A ring buffer of the most recent reverse deltas. Once full, recording
+        a new delta discards the oldest.
+    """
+    def __init__(self, capacity: int) -> None:
+        """ Sets up an empty journal.
+
+        Parameters:
+            capacity: The maximum number of deltas kept.
+        """
+        self._deltas = deque(maxlen=capacity)
+
+    def get_capacity(self) -> int:
+        """ Returns the maximum number of deltas kept. """
+        return self._deltas.maxlen
+
+    def record(self, delta: Delta) -> None:
+        """ Adds the delta for the most recent action. """
+        self._deltas.append(delta)
+
+    def peek(self) -> Optional[Delta]:
+        """ Returns the most recent delta without removing it, if any. """
+        return self._deltas[-1] if self._deltas else None
+
+    def pop(self) -> Optional[Delta]:
+        """ Removes and returns the most recent delta, if any. """
+        return self._deltas.pop() if self._deltas else None
+
+    def clear(self) -> None:
+        """ Discards every delta. """
+        self._deltas.clear()
+
+    def __len__(self) -> int:
+        """ Returns the number of deltas that can be undone. """
+        return len(self._deltas)
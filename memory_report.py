@@ -0,0 +1,190 @@
+""" Memory accounting for MazeRunner games.
+
+Python-side sizes come from walking object graphs with sys.getsizeof, counting
+each object once per walk. Tk keeps canvas items and image pixels outside the
+Python heap, so those are reported as item counts and estimated pixel bytes.
+
+Usage:
+    python memory_report.py games/game1.txt
+"""
+from __future__ import annotations
+
+import sys
+import tracemalloc
+from types import FunctionType, ModuleType
+from typing import TYPE_CHECKING, Any, Optional
+
+from a2_solution import Level, Model
+
+if TYPE_CHECKING:
+    import tkinter as tk
+
+    from a3 import GraphicalInterface
+
+BYTES_PER_PIXEL = 4
+_SKIPPED = (type, ModuleType, FunctionType)
+
+
+def _slot_values(obj: Any) -> list[Any]:
+    """ Returns the values of every populated __slots__ attribute of obj. """
+    values = []
+    for cls in type(obj).__mro__:
+        slots = cls.__dict__.get('__slots__', ())
+        for name in (slots,) if isinstance(slots, str) else slots:
+            if hasattr(obj, name):
+                values.append(getattr(obj, name))
+    return values
+
+
+def deep_sizeof(obj: Any, seen: Optional[set[int]] = None) -> int:
+    """ Returns the total size in bytes of obj and everything it references.
+
+    Parameters:
+        obj: The root of the object graph to measure.
+        seen: Ids of objects already counted; shared between calls to avoid
+              counting objects twice.
+    """
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _SKIPPED):
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif not isinstance(current, (str, bytes, int, float, bool)):
+            if hasattr(current, '__dict__'):
+                stack.append(current.__dict__)
+            stack.extend(_slot_values(current))
+    return total
+
+
+def level_memory(level: Level, seen: Optional[set[int]] = None) -> dict[str, int]:
+    """ Returns the bytes used by a level's maze tiles, items and enemies.
+
+    Parameters:
+        level: The level to measure.
+        seen: Ids of objects already counted.
+    """
+    seen = set() if seen is None else seen
+    return {
+        'maze_tiles': deep_sizeof(level.get_maze().get_tiles(), seen),
+        'items': deep_sizeof(level.get_items(), seen),
+        'enemies': deep_sizeof(level.get_enemies(), seen),
+    }
+
+
+def model_memory(model: Model) -> dict[str, Any]:
+    """ Returns a per-level and per-subsystem breakdown of a game's memory.
+
+    Parameters:
+        model: The game to measure.
+    """
+    seen = set()
+    levels = {
+        f'level {num + 1}': level_memory(level, seen)
+        for num, level in enumerate(model.get_levels())
+    }
+    return {
+        'levels': levels,
+        'inventory': deep_sizeof(model.get_player_inventory(), seen),
+        'player': deep_sizeof(model.get_player(), seen),
+    }
+
+
+def canvas_memory(canvas: 'tk.Canvas') -> dict[str, int]:
+    """ Returns the number of items on a Tk canvas.
+
+    Parameters:
+        canvas: The canvas to inspect.
+    """
+    return {'item_count': len(canvas.find_all())}
+
+
+def image_cache_memory(images: dict[str, 'tk.PhotoImage']) -> dict[str, int]:
+    """ Returns the number of cached images and an estimate of their pixel
+        storage within Tk.
+
+    Parameters:
+        images: Maps an id to its cached PhotoImage.
+    """
+    pixels = sum(image.width() * image.height() for image in images.values())
+    return {'image_count': len(images), 'pixel_bytes': pixels * BYTES_PER_PIXEL}
+
+
+def interface_memory(interface: 'GraphicalInterface') -> dict[str, Any]:
+    """ Returns a breakdown of the Tk resources held by a graphical interface.
+
+    Parameters:
+        interface: The interface to inspect.
+    """
+    report = {}
+    if interface.level is not None:
+        report['level canvas'] = canvas_memory(interface.level)
+        images = getattr(interface.level, 'images', None)
+        if images:
+            report['image cache'] = image_cache_memory(images)
+    if interface.stat is not None:
+        report['stats canvas'] = canvas_memory(interface.stat)
+    return report
+
+
+def traced_load(game_file: str) -> tuple[Model, int]:
+    """ Loads a game while tracing allocations.
+
+    Parameters:
+        game_file: The game file to load.
+
+    Returns:
+        The loaded game and the bytes allocated while loading it.
+    """
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    model = Model(game_file)
+    after, _ = tracemalloc.get_traced_memory()
+    if not tracing:
+        tracemalloc.stop()
+    return model, after - before
+
+
+def format_report(report: dict[str, Any], indent: int = 0) -> str:
+    """ Returns a nested report as indented text, with sizes in KiB.
+
+    Parameters:
+        report: Maps names to byte sizes, item counts (names ending in
+                'count') or nested reports.
+        indent: The indentation of the outermost level.
+    """
+    lines = []
+    for name, value in report.items():
+        if isinstance(value, dict):
+            lines.append(' ' * indent + f'{name}:')
+            lines.append(format_report(value, indent + 2))
+        elif name.endswith('count'):
+            lines.append(' ' * indent + f'{name}: {value}')
+        else:
+            lines.append(' ' * indent + f'{name}: {value / 1024:.1f} KiB')
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """ Command line entry point: reports the memory used by a game file. """
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        sys.exit('Usage: python memory_report.py GAME_FILE')
+    model, traced = traced_load(argv[0])
+    print(format_report(model_memory(model)))
+    print(f'traced allocations while loading: {traced / 1024:.1f} KiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+""" Compact recording and playback of MazeRunner sessions.
+
+Moves are bit-packed at 2 bits each. Item uses cannot fit in that alphabet,
+so they are escaped into a side table of (move index, item name) entries:
+an entry with move index j is played just before move j. Periodic keyframes
+(encoded snapshots) allow seeking without replaying from the start, and the
+keyframe at action 0 lets a recording start part way through a game.
+
+Encoding (version 1), after the 4 byte magic and 1 byte version:
+    32 byte SHA-256 of the game file
+    varint #moves, then the packed moves (4 per byte, first in the low bits)
+    varint #item uses, then (varint move index, varint name length, name)
+    varint #keyframes, then (varint action, varint move index,
+        varint item use index, varint snapshot length, snapshot)
+
+Usage:
+    python replay.py GAME_FILE REPLAY_FILE
+"""
+from __future__ import annotations
+
+import sys
+from typing import Iterator, NamedTuple, Optional
+
+from a2_solution import MazeRunner, Model
+from a2_support import UserInterface
+from constants import *
+from snapshot import Snapshot, read_varint, write_atomic, write_varint
+
+MAGIC = b'MZRP'
+VERSION = 1
+HASH_SIZE = 32
+MOVE_CODES = {UP: 0, LEFT: 1, DOWN: 2, RIGHT: 3}
+CODE_MOVES = {code: move for move, code in MOVE_CODES.items()}
+ITEM_PREFIX = 'i '
+
+
+class Keyframe(NamedTuple):
+    """ An encoded snapshot of the game just before some action. """
+    action: int
+    move_index: int
+    item_index: int
+    snapshot: bytes
+
+
+class Replay:
+    """ A recorded sequence of moves and item uses on one game file. """
+    def __init__(self, game_hash: bytes,
+                 keyframe_interval: int = KEYFRAME_INTERVAL) -> None:
+        """ Sets up an empty recording.
+
+        Parameters:
+            game_hash: The SHA-256 digest of the game file being played.
+            keyframe_interval: The number of actions between keyframes.
+        """
+        self._game_hash = game_hash
+        self._keyframe_interval = keyframe_interval
+        self._moves = bytearray()
+        self._num_moves = 0
+        self._item_uses = []  # (move index, item name) pairs, in order
+        self._keyframes = []
+
+    def get_game_hash(self) -> bytes:
+        """ Returns the SHA-256 digest of the recorded game file. """
+        return self._game_hash
+
+    def get_move(self, index: int) -> str:
+        """ Returns the move recorded at the given move index. """
+        code = (self._moves[index >> 2] >> ((index & 3) * 2)) & 3
+        return CODE_MOVES[code]
+
+    def start(self, model: Model) -> None:
+        """ Starts recording from the current state of a game. """
+        self._keyframe(model)
+
+    def _keyframe(self, model: Model) -> None:
+        """ Stores a keyframe of the game before the next action. """
+        self._keyframes.append(Keyframe(len(self), self._num_moves,
+                                        len(self._item_uses),
+                                        model.snapshot().encode()))
+
+    def record(self, command: str, model: Model) -> None:
+        """ Appends an action, taking a keyframe at regular intervals.
+
+        Parameters:
+            command: A move, or 'i ' followed by the name of an item used.
+            model: The game, after the action has been applied to it.
+        """
+        if command.startswith(ITEM_PREFIX):
+            self._item_uses.append((self._num_moves, command[2:]))
+        else:
+            index = self._num_moves
+            if index & 3 == 0:
+                self._moves.append(0)
+            self._moves[index >> 2] |= MOVE_CODES[command] << ((index & 3) * 2)
+            self._num_moves += 1
+        if len(self) % self._keyframe_interval == 0 and not model.has_won():
+            self._keyframe(model)
+
+    def pop(self) -> None:
+        """ Removes the most recent action (e.g. because it was undone). """
+        if self._item_uses and self._item_uses[-1][0] == self._num_moves:
+            self._item_uses.pop()
+        elif self._num_moves > 0:
+            self._num_moves -= 1
+            index = self._num_moves
+            self._moves[index >> 2] &= ~(3 << ((index & 3) * 2)) & 0xFF
+            if index & 3 == 0:
+                self._moves.pop()
+        while len(self._keyframes) > 1 and self._keyframes[-1].action > len(self):
+            self._keyframes.pop()
+
+    def actions(self, keyframe: Optional[Keyframe] = None) -> Iterator[str]:
+        """ Yields every action as a command string, in order.
+
+        Parameters:
+            keyframe: If given, start from the action this keyframe precedes.
+        """
+        move_index = keyframe.move_index if keyframe else 0
+        item_index = keyframe.item_index if keyframe else 0
+        item_uses = self._item_uses
+        while move_index < self._num_moves or item_index < len(item_uses):
+            if item_index < len(item_uses) \
+                    and item_uses[item_index][0] == move_index:
+                yield ITEM_PREFIX + item_uses[item_index][1]
+                item_index += 1
+            else:
+                yield self.get_move(move_index)
+                move_index += 1
+
+    def get_keyframe(self, action: int) -> Keyframe:
+        """ Returns the latest keyframe at or before an action. """
+        best = self._keyframes[0]
+        for keyframe in self._keyframes:
+            if keyframe.action > action:
+                break
+            best = keyframe
+        return best
+
+    def __len__(self) -> int:
+        """ Returns the number of recorded actions. """
+        return self._num_moves + len(self._item_uses)
+
+    def encode(self) -> bytes:
+        """ Returns the compact binary encoding of this replay. """
+        buffer = bytearray(MAGIC)
+        buffer.append(VERSION)
+        buffer += self._game_hash
+        write_varint(buffer, self._num_moves)
+        buffer += self._moves
+        write_varint(buffer, len(self._item_uses))
+        for move_index, name in self._item_uses:
+            write_varint(buffer, move_index)
+            encoded = name.encode()
+            write_varint(buffer, len(encoded))
+            buffer += encoded
+        write_varint(buffer, len(self._keyframes))
+        for keyframe in self._keyframes:
+            for value in keyframe[:3]:
+                write_varint(buffer, value)
+            write_varint(buffer, len(keyframe.snapshot))
+            buffer += keyframe.snapshot
+        return bytes(buffer)
+
+    @classmethod
+    def decode(cls, data: bytes) -> Replay:
+        """ Returns the replay encoded in data.
+
+        Raises:
+            ValueError: If data is not a valid, supported replay.
+        """
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError('Not a MazeRunner replay file')
+        offset = len(MAGIC)
+        if len(data) <= offset or data[offset] != VERSION:
+            raise ValueError('Unsupported replay file version')
+        offset += 1
+        replay = cls(data[offset:offset + HASH_SIZE])
+        offset += HASH_SIZE
+
+        replay._num_moves, offset = read_varint(data, offset)
+        num_bytes = (replay._num_moves + 3) // 4
+        replay._moves = bytearray(data[offset:offset + num_bytes])
+        offset += num_bytes
+
+        entries, offset = read_varint(data, offset)
+        for _ in range(entries):
+            move_index, offset = read_varint(data, offset)
+            length, offset = read_varint(data, offset)
+            replay._item_uses.append(
+                (move_index, data[offset:offset + length].decode()))
+            offset += length
+
+        entries, offset = read_varint(data, offset)
+        for _ in range(entries):
+            values = []
+            for _ in range(4):
+                value, offset = read_varint(data, offset)
+                values.append(value)
+            *positions, length = values
+            replay._keyframes.append(
+                Keyframe(*positions, data[offset:offset + length]))
+            offset += length
+        if not replay._keyframes:
+            raise ValueError('Replay has no starting keyframe')
+        return replay
+
+
+def save_replay(filename: str, replay: Replay) -> None:
+    """ Atomically writes a replay to a file. """
+    write_atomic(filename, replay.encode())
+
+
+def load_replay(filename: str) -> Replay:
+    """ Reads and decodes the replay saved in a file. """
+    with open(filename, 'rb') as file:
+        return Replay.decode(file.read())
+
+
+class HeadlessInterface(UserInterface):
+    """ A view that draws nothing, for running games at engine speed. """
+    def _draw_level(self, maze, items, player_position) -> None:
+        pass
+
+    def _draw_player_stats(self, player_stats) -> None:
+        pass
+
+    def _draw_inventory(self, inventory) -> None:
+        pass
+
+
+class ReplayPlayer:
+    """ Plays a replay back through a MazeRunner, so playback follows exactly
+        the same code path as live play.
+    """
+    def __init__(self, replay: Replay, runner: MazeRunner) -> None:
+        """ Sets up playback from the start of the replay.
+
+        Parameters:
+            replay: The replay to play.
+            runner: The runner whose game the replay is applied to.
+
+        Raises:
+            ValueError: If the replay was recorded on a different game file.
+        """
+        if replay.get_game_hash() != runner.get_model().get_game_hash():
+            raise ValueError('Replay is for a different game file')
+        self._replay = replay
+        self._runner = runner
+        self._position = None
+        self._actions = iter(())
+        self.seek(0)
+
+    def get_position(self) -> int:
+        """ Returns the number of actions played so far. """
+        return self._position
+
+    def seek(self, action: int) -> None:
+        """ Moves playback to just before the given action, restoring the
+            nearest keyframe and playing forward from it.
+        """
+        action = max(0, min(action, len(self._replay)))
+        if self._position is None or action < self._position \
+                or self._replay.get_keyframe(action).action > self._position:
+            keyframe = self._replay.get_keyframe(action)
+            self._runner.get_model().restore(
+                Snapshot.decode(keyframe.snapshot))
+            self._position = keyframe.action
+            self._actions = self._replay.actions(keyframe)
+        while self._position < action:
+            self.step()
+
+    def step(self) -> bool:
+        """ Plays the next action, if there is one.
+
+        Returns:
+            True iff an action was played.
+        """
+        command = next(self._actions, None)
+        if command is None:
+            return False
+        self._runner._handle_move(command)
+        self._position += 1
+        return True
+
+    def play_to_end(self) -> None:
+        """ Plays every remaining action at full engine speed. """
+        while self.step():
+            pass
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """ Command line entry point: plays a replay headlessly and prints the
+        final state.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        sys.exit('Usage: python replay.py GAME_FILE REPLAY_FILE')
+    runner = MazeRunner(argv[0], HeadlessInterface())
+    ReplayPlayer(load_replay(argv[1]), runner).play_to_end()
+    model = runner.get_model()
+    print(f'Level {model.get_level_num() + 1}, {model.get_num_moves()} moves, '
+          f'stats {model.get_player_stats()}, won: {model.has_won()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,518 @@
+""" An asyncio server hosting many headless games at once, for bots and
+remote clients, over TCP or a Unix socket.
+
+Clients send lines of text and receive one JSON object per line:
+
+    PLAY [GAME]      start a session on a game file in the games directory
+    WATCH SESSION    spectate a session
+    RESTART          restart the session's game
+    anything else    moves and item commands, in the same grammar as the text
+                     game (e.g. 'wwd', 'i Apple', 'u', 'r 10'), except
+                     the local-only 'mem'
+
+Joining a session sends the full 'state' of the game. After that the player
+gets one reply per command: a 'delta' holding only what changed (player,
+stats, inventory, items, door, enemies, moves), or a new 'state' after a
+level change or rewind. Spectators get every delta that changed something, and are disconnected
+after a 'closed' event when the player leaves.
+
+Each client's events are queued and written by a task of its own. A player
+whose client reads slowly stops having its commands read once its queue is
+full. A spectator that falls behind has its queued events dropped and gets a
+fresh 'state' when it catches up, so it never holds up the game. Commands are
+rate limited per session with a token bucket.
+
+Usage:
+    python server.py [--host HOST] [--port PORT | --unix PATH]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+from typing import Any, Optional
+
+from a2_solution import MazeRunner, Model, parse_commands
+from constants import *
+from replay import HeadlessInterface
+
+PLAY = 'PLAY'
+WATCH = 'WATCH'
+RESTART = 'RESTART'
+SYNC = object()  # Queued in place of dropped events; sends the state
+CLOSE = object()  # Queued after the last event before disconnecting
+CLOSE_TIMEOUT = 1.0  # seconds to finish writing to a closing client
+LOCAL_COMMANDS = frozenset({MEMORY_COMMAND})  # Not accepted from clients
+
+
+def parse_session_commands(line: str) -> Optional[list[str]]:
+    """ Splits a line from a player into commands as parse_commands does,
+        but returns None if it holds a command only the local game accepts
+        (e.g. the memory report, which walks the whole model).
+    """
+    commands = parse_commands(line)
+    if commands is None or LOCAL_COMMANDS.intersection(commands):
+        return None
+    return commands
+
+
+def encode(event: dict[str, Any]) -> bytes:
+    """ Returns an event as a line of compact JSON. """
+    return json.dumps(event, separators=(',', ':')).encode() + b'\n'
+
+
+class Client:
+    """ The outgoing events of one connection, written in order by a task of
+        their own.
+    """
+    def __init__(self, writer: asyncio.StreamWriter,
+                 queue_size: int = SERVER_QUEUE_SIZE) -> None:
+        """ Starts the task that writes queued events.
+
+        Parameters:
+            writer: The connection's stream.
+            queue_size: The most events queued before the client falls behind.
+        """
+        self._writer = writer
+        self._queue = asyncio.Queue(queue_size)
+        self._session = None  # The session a resync is taken from
+        self._resyncing = False
+        self._task = asyncio.create_task(self._write_events())
+
+    def set_session(self, session: Optional[Session]) -> None:
+        """ Sets the session the client is playing or watching. """
+        self._session = session
+
+    async def send(self, event: bytes) -> None:
+        """ Queues an event, waiting while the queue is full. """
+        await self._queue.put(event)
+
+    def offer(self, event: bytes) -> None:
+        """ Queues an event without waiting. If the queue is full, everything
+            queued is dropped, and the client is sent the session's full state
+            once it catches up instead.
+        """
+        if self._resyncing:
+            return
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(SYNC)
+            self._resyncing = True
+
+    async def _write_events(self) -> None:
+        """ Writes queued events until the connection closes. """
+        writer = self._writer
+        try:
+            while True:
+                event = await self._queue.get()
+                if event is CLOSE:
+                    return
+                if event is SYNC:
+                    self._resyncing = False
+                    if self._session is None:
+                        continue
+                    event = encode(self._session.get_state())
+                writer.write(event)
+                await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def close(self) -> None:
+        """ Writes any events still queued, giving up after CLOSE_TIMEOUT
+            seconds, then closes the connection.
+        """
+        try:
+            self._queue.put_nowait(CLOSE)
+            await asyncio.wait_for(self._task, CLOSE_TIMEOUT)
+        except (asyncio.QueueFull, asyncio.TimeoutError):
+            self._task.cancel()
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+class SessionRunner(MazeRunner):
+    """ A headless MazeRunner whose messages are collected for the client
+        instead of printed.
+    """
+    def __init__(self, model: Model) -> None:
+        """ Sets up a runner for an already loaded game. """
+        super().__init__(model.get_game_file(), HeadlessInterface(), model)
+        self._messages = []
+
+    def start_endless(self, seed: int, max_size: int = ENDLESS_MAX_SIZE
+                      ) -> None:
+        """ Does nothing: sessions play only the levels of their game file,
+            since a worker process per session would not scale.
+        """
+
+    def _show_message(self, message: str) -> None:
+        """ Keeps a message to send with the reply to the current command. """
+        self._messages.append(message.strip())
+
+    def take_messages(self) -> list[str]:
+        """ Returns and forgets the messages shown since the last call. """
+        messages, self._messages = self._messages, []
+        return messages
+
+    def handle_command(self, command: str) -> bool:
+        """ Applies one command from parse_commands.
+
+        Returns:
+            True iff the command was recognised.
+        """
+        return self._handle_move(command)
+
+
+class Session:
+    """ A game played by one client and watched by any number of others. """
+    def __init__(self, session_id: int, model: Model, player: Client,
+                 rate: float = SERVER_RATE_LIMIT,
+                 burst: int = SERVER_BURST) -> None:
+        """ Sets up a session at the start of its game.
+
+        Parameters:
+            session_id: The id spectators use to find the session.
+            model: The game to play, which the session takes ownership of.
+            player: The client playing.
+            rate: The most commands per second, or 0 for no limit.
+            burst: The most commands that can be sent at once.
+        """
+        self._id = session_id
+        self._model = model
+        self._runner = SessionRunner(model)
+        self._player = player
+        self._spectators = set()
+        self._rate = rate
+        self._burst = burst
+        self._tokens = burst
+        self._last_refill = asyncio.get_running_loop().time()
+
+    def get_id(self) -> int:
+        """ Returns the session's id. """
+        return self._id
+
+    def get_player(self) -> Client:
+        """ Returns the client playing. """
+        return self._player
+
+    def get_spectators(self) -> set[Client]:
+        """ Returns the clients watching. """
+        return self._spectators
+
+    def _result(self) -> Optional[str]:
+        """ Returns 'won' or 'lost' once the game is over, otherwise None. """
+        if self._model.has_won():
+            return 'won'
+        if self._model.has_lost():
+            return 'lost'
+        return None
+
+    def get_state(self) -> dict[str, Any]:
+        """ Returns the full state of the game as an event. """
+        model = self._model
+        player = model.get_player()
+        state = {
+            'type': 'state',
+            'session': self._id,
+            'game': os.path.basename(model.get_game_file()),
+            'moves': model.get_num_moves(),
+            'player': player.get_position(),
+            'stats': model.get_player_stats(),
+            'inventory': model.get_player_inventory().get_counts(),
+            'result': self._result(),
+        }
+        if not model.has_won():
+            maze = model.get_current_maze()
+            codes = model.get_current_enemies().DIRECTION_CODES
+            state.update({
+                'level': model.get_level_num(),
+                'rows': [''.join(tile.get_id() for tile in row)
+                         for row in maze.get_tiles()],
+                'door': maze.is_door_unlocked(),
+                'items': [(*position, item.get_id()) for position, item
+                          in model.get_current_items().items()],
+                'enemies': [(*enemy.get_position(), enemy.get_id(),
+                             codes[enemy.get_direction()])
+                            for enemy in model.get_current_enemies()
+                            .get_enemies()],
+            })
+        return state
+
+    def apply(self, command: str) -> dict[str, Any]:
+        """ Applies one command and returns the event describing what changed.
+            The squares watched for item changes are the player's square and
+            its neighbours, the only ones a move or undo can change. A level
+            change or rewind is described by the full state instead.
+        """
+        model = self._model
+        level_num = model.get_level_num()
+        row, col = position = model.get_player().get_position()
+        stats = model.get_player_stats()
+        inventory = dict(model.get_player_inventory().get_counts())
+        unlocked = model.get_current_maze().is_door_unlocked()
+        num_moves = model.get_num_moves()
+        items = model.get_current_items()
+        watched = [position] + [(row + dr, col + dc)
+                                for dr, dc in MOVE_DELTAS.values()]
+        before = [items.get(square) for square in watched]
+        enemies = model.get_current_enemies().get_states()
+
+        self._runner.handle_command(command)
+        messages = self._runner.take_messages()
+        result = self._result()
+        if not model.has_won() and (
+                model.get_level_num() != level_num
+                or command.startswith(REWIND_COMMAND)):
+            event = self.get_state()
+            event['command'] = command
+            if messages:
+                event['messages'] = messages
+            return event
+
+        event = {'type': 'delta', 'command': command}
+        if model.get_num_moves() != num_moves:
+            event['moves'] = model.get_num_moves()
+        if model.get_player().get_position() != position:
+            event['player'] = model.get_player().get_position()
+        if model.get_player_stats() != stats:
+            event['stats'] = model.get_player_stats()
+        if model.get_player_inventory().get_counts() != inventory:
+            event['inventory'] = model.get_player_inventory().get_counts()
+        if result is not None:
+            event['result'] = result
+        if messages:
+            event['messages'] = messages
+        if model.has_won():
+            return event
+
+        if model.get_current_maze().is_door_unlocked() != unlocked:
+            event['door'] = not unlocked
+        items = model.get_current_items()
+        changed = []
+        for square, old_item in zip(watched, before):
+            item = items.get(square)
+            if item is not old_item:
+                changed.append((*square,
+                                item.get_id() if item is not None else None))
+        if changed:
+            event['items'] = changed
+        if enemies:
+            moved = [(index, *state) for index, (state, old_state) in
+                     enumerate(zip(model.get_current_enemies().get_states(),
+                                   enemies)) if state != old_state]
+            if moved:
+                event['enemies'] = moved
+        return event
+
+    async def _throttle(self) -> None:
+        """ Waits until the session may send another command. """
+        if self._rate <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        self._tokens = min(self._burst, self._tokens
+                           + (now - self._last_refill) * self._rate)
+        self._last_refill = now
+        if self._tokens < 1:
+            await asyncio.sleep((1 - self._tokens) / self._rate)
+            self._tokens, self._last_refill = 1, loop.time()
+        self._tokens -= 1
+
+    async def handle_line(self, line: str) -> None:
+        """ Applies a line of commands from the player, replying to each and
+            passing on any changes to the spectators.
+        """
+        commands = parse_session_commands(line)
+        if commands is None:
+            await self._player.send(encode(
+                {'type': 'error', 'message': f'Unrecognised command: {line}'}))
+            return
+        for command in commands:
+            if self._result() is not None:
+                await self._player.send(encode(
+                    {'type': 'error', 'message': f'Game over; send {RESTART}'}))
+                return
+            await self._throttle()
+            event = self.apply(command)
+            data = encode(event)
+            if len(event) > 2 or event['type'] != 'delta':
+                self.broadcast(data)
+            await self._player.send(data)
+
+    async def restart(self) -> None:
+        """ Restarts the game from its first level. """
+        self._model.reset()
+        data = encode(self.get_state())
+        self.broadcast(data)
+        await self._player.send(data)
+
+    def broadcast(self, data: bytes) -> None:
+        """ Offers an encoded event to every spectator. """
+        for spectator in self._spectators:
+            spectator.offer(data)
+
+
+class GameServer:
+    """ Hosts independent sessions of games from one directory. Each game
+        file is loaded once; sessions play copy-on-write clones of it.
+    """
+    def __init__(self, games_dir: str = SERVER_GAMES_DIR,
+                 max_sessions: int = SERVER_MAX_SESSIONS,
+                 rate: float = SERVER_RATE_LIMIT, burst: int = SERVER_BURST,
+                 queue_size: int = SERVER_QUEUE_SIZE) -> None:
+        """ Sets up a server with no sessions.
+
+        Parameters:
+            games_dir: The directory sessions' game files are taken from.
+            max_sessions: The most sessions open at once.
+            rate: The most commands per second per session, 0 for no limit.
+            burst: The most commands a session can send at once.
+            queue_size: The most events queued for a client.
+        """
+        self._games_dir = games_dir
+        self._max_sessions = max_sessions
+        self._rate = rate
+        self._burst = burst
+        self._queue_size = queue_size
+        self._games = {}  # Maps game file paths to tasks loading them
+        self._sessions = {}
+        self._next_id = 1
+        self._closing = set()  # Tasks disconnecting spectators
+
+    def get_sessions(self) -> dict[int, Session]:
+        """ Returns the open sessions by id. """
+        return self._sessions
+
+    async def _load(self, name: str) -> Model:
+        """ Returns a fresh copy of a game in the games directory, loading
+            the file on a thread the first time.
+
+        Raises:
+            OSError: If the game file cannot be read.
+        """
+        path = os.path.join(self._games_dir, os.path.basename(name))
+        if path not in self._games:
+            self._games[path] = asyncio.ensure_future(
+                asyncio.to_thread(Model, path))
+        try:
+            model = await asyncio.shield(self._games[path])
+        except Exception:
+            self._games.pop(path, None)
+            raise
+        return model.clone()
+
+    async def handle_client(self, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter) -> None:
+        """ Serves one connection until it closes. """
+        client = Client(writer, self._queue_size)
+        session = None
+        playing = False
+
+        async def error(message: str) -> None:
+            await client.send(encode({'type': 'error', 'message': message}))
+
+        try:
+            while line := await reader.readline():
+                word, _, argument = line.decode(errors='replace').strip() \
+                    .partition(' ')
+                if word == PLAY and session is None:
+                    if len(self._sessions) >= self._max_sessions:
+                        await error('Server full')
+                        continue
+                    try:
+                        model = await self._load(
+                            argument.strip() or SERVER_DEFAULT_GAME)
+                    except (OSError, ValueError) as exc:
+                        await error(f'Could not load game: {exc}')
+                        continue
+                    session = Session(self._next_id, model, client,
+                                      self._rate, self._burst)
+                    self._sessions[self._next_id] = session
+                    self._next_id += 1
+                    playing = True
+                    client.set_session(session)
+                    await client.send(encode(session.get_state()))
+                elif word == WATCH and session is None:
+                    session = self._sessions.get(
+                        int(argument) if argument.strip().isdigit() else None)
+                    if session is None:
+                        await error(f'No session {argument}')
+                        continue
+                    session.get_spectators().add(client)
+                    client.set_session(session)
+                    await client.send(encode(session.get_state()))
+                elif not playing:
+                    await error(f'Send {PLAY} [GAME] or {WATCH} SESSION first'
+                                if session is None else 'Spectators cannot play')
+                elif word == RESTART:
+                    await session.restart()
+                else:
+                    await session.handle_line(line.decode(errors='replace'))
+        except (ConnectionError, ValueError):
+            pass  # Disconnected, or sent a line longer than SERVER_MAX_LINE
+        finally:
+            if playing:
+                del self._sessions[session.get_id()]
+                closed = encode({'type': 'closed', 'session': session.get_id()})
+                for spectator in session.get_spectators():
+                    spectator.offer(closed)
+                    spectator.set_session(None)
+                    task = asyncio.create_task(spectator.close())
+                    self._closing.add(task)
+                    task.add_done_callback(self._closing.discard)
+            elif session is not None:
+                session.get_spectators().discard(client)
+            await client.close()
+
+    async def start(self, host: str = SERVER_HOST, port: int = SERVER_PORT,
+                    path: Optional[str] = None) -> asyncio.Server:
+        """ Starts listening on a TCP port, or on a Unix socket if a path is
+            given.
+        """
+        if path is not None:
+            return await asyncio.start_unix_server(
+                self.handle_client, path, limit=SERVER_MAX_LINE)
+        return await asyncio.start_server(self.handle_client, host, port,
+                                          limit=SERVER_MAX_LINE)
+
+
+async def serve(server: GameServer, host: str, port: int,
+                path: Optional[str]) -> None:
+    """ Runs a server until cancelled. """
+    listener = await server.start(host, port, path)
+    addresses = ', '.join(str(sock.getsockname())
+                          for sock in listener.sockets)
+    print(f'Serving on {addresses}')
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """ Command line entry point: runs a game server. """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default=SERVER_HOST)
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--unix', help='listen on this Unix socket instead')
+    parser.add_argument('--games', default=SERVER_GAMES_DIR,
+                        help='directory of game files')
+    parser.add_argument('--max-sessions', type=int,
+                        default=SERVER_MAX_SESSIONS)
+    parser.add_argument('--rate', type=float, default=SERVER_RATE_LIMIT,
+                        help='commands per second per session, 0 = no limit')
+    args = parser.parse_args(argv)
+    server = GameServer(args.games, args.max_sessions, args.rate)
+    try:
+        asyncio.run(serve(server, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+""" Compact, versioned save files for MazeRunner games.
+
+A snapshot only records how a game differs from its pristine game file: the
+items collected and doors unlocked on each level, plus the player's state.
+Restoring one therefore needs the original game file, which is checked by
+hash.
+
+Encoding (version 2), after the 4 byte magic and 1 byte version:
+    32 byte SHA-256 of the game file
+    varints: level, row, col, HP, hunger, thirst, #moves
+    varint #inventory entries, then (varint name length, name, varint count)
+    varint #levels with collected items, then for each level:
+        varint level, varint #positions, then (row delta, col) varints for
+        the positions in sorted order
+    varint #levels with unlocked doors, then varint level for each
+    varint #levels whose enemies have moved, then for each level:
+        varint level, varint #enemies, then (row, col, direction code)
+        varints for every enemy in the order they move
+
+Version 1 saves, which predate enemies, are still read.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import queue
+import tempfile
+import threading
+from dataclasses import dataclass, field
+
+MAGIC = b'MZRS'
+VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+HASH_SIZE = 32
+
+
+def hash_file(filename: str) -> bytes:
+    """ Returns the SHA-256 digest of a file's contents. """
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def write_varint(buffer: bytearray, value: int) -> None:
+    """ Appends a non-negative int to buffer as a LEB128 varint. """
+    if value < 0:
+        raise ValueError(f'Cannot encode negative value {value}')
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(data: bytes, offset: int) -> tuple[int, int]:
+    """ Reads a LEB128 varint from data.
+
+    Returns:
+        The value read and the offset just past it.
+    """
+    value = shift = 0
+    while True:
+        if offset >= len(data):
+            raise ValueError('Truncated save data')
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+@dataclass
+class Snapshot:
+    """ The state of a game, relative to its pristine game file. """
+    game_hash: bytes
+    level_num: int
+    position: tuple[int, int]
+    stats: tuple[int, int, int]
+    num_moves: int
+    inventory: dict[str, int] = field(default_factory=dict)
+    # Maps level numbers to the positions of items collected on that level
+    collected: dict[int, list[tuple[int, int]]] = field(default_factory=dict)
+    unlocked: list[int] = field(default_factory=list)
+    # Maps level numbers to the (row, col, direction code) of each enemy on
+    # levels where they have moved
+    enemies: dict[int, list[tuple[int, int, int]]] = field(
+        default_factory=dict)
+
+    def encode(self) -> bytes:
+        """ Returns the compact binary encoding of this snapshot. """
+        buffer = bytearray(MAGIC)
+        buffer.append(VERSION)
+        buffer += self.game_hash
+        for value in (self.level_num, *self.position, *self.stats,
+                      self.num_moves):
+            write_varint(buffer, value)
+
+        write_varint(buffer, len(self.inventory))
+        for name, count in self.inventory.items():
+            encoded = name.encode()
+            write_varint(buffer, len(encoded))
+            buffer += encoded
+            write_varint(buffer, count)
+
+        write_varint(buffer, len(self.collected))
+        for level_num, positions in sorted(self.collected.items()):
+            write_varint(buffer, level_num)
+            write_varint(buffer, len(positions))
+            previous_row = 0
+            for row, col in sorted(positions):
+                write_varint(buffer, row - previous_row)
+                write_varint(buffer, col)
+                previous_row = row
+
+        write_varint(buffer, len(self.unlocked))
+        for level_num in self.unlocked:
+            write_varint(buffer, level_num)
+
+        write_varint(buffer, len(self.enemies))
+        for level_num, states in sorted(self.enemies.items()):
+            write_varint(buffer, level_num)
+            write_varint(buffer, len(states))
+            for state in states:
+                for value in state:
+                    write_varint(buffer, value)
+        return bytes(buffer)
+
+    @classmethod
+    def decode(cls, data: bytes) -> Snapshot:
+        """ Returns the snapshot encoded in data.
+
+        Raises:
+            ValueError: If data is not a valid, supported save.
+        """
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError('Not a MazeRunner save file')
+        offset = len(MAGIC)
+        if len(data) <= offset or data[offset] not in SUPPORTED_VERSIONS:
+            raise ValueError('Unsupported save file version')
+        version = data[offset]
+        offset += 1
+        game_hash = data[offset:offset + HASH_SIZE]
+        offset += HASH_SIZE
+
+        values = []
+        for _ in range(7):
+            value, offset = read_varint(data, offset)
+            values.append(value)
+        level_num, row, col, hp, hunger, thirst, num_moves = values
+
+        inventory = {}
+        entries, offset = read_varint(data, offset)
+        for _ in range(entries):
+            length, offset = read_varint(data, offset)
+            name = data[offset:offset + length].decode()
+            offset += length
+            inventory[name], offset = read_varint(data, offset)
+
+        collected = {}
+        entries, offset = read_varint(data, offset)
+        for _ in range(entries):
+            collected_level, offset = read_varint(data, offset)
+            num_positions, offset = read_varint(data, offset)
+            positions = []
+            item_row = 0
+            for _ in range(num_positions):
+                row_delta, offset = read_varint(data, offset)
+                item_col, offset = read_varint(data, offset)
+                item_row += row_delta
+                positions.append((item_row, item_col))
+            collected[collected_level] = positions
+
+        unlocked = []
+        entries, offset = read_varint(data, offset)
+        for _ in range(entries):
+            unlocked_level, offset = read_varint(data, offset)
+            unlocked.append(unlocked_level)
+
+        enemies = {}
+        entries, offset = (read_varint(data, offset) if version >= 2
+                           else (0, offset))
+        for _ in range(entries):
+            enemy_level, offset = read_varint(data, offset)
+            num_enemies, offset = read_varint(data, offset)
+            states = []
+            for _ in range(num_enemies):
+                state = []
+                for _ in range(3):
+                    value, offset = read_varint(data, offset)
+                    state.append(value)
+                states.append(tuple(state))
+            enemies[enemy_level] = states
+
+        return cls(game_hash, level_num, (row, col), (hp, hunger, thirst),
+                   num_moves, inventory, collected, unlocked, enemies)
+
+
+def write_atomic(filename: str, data: bytes) -> None:
+    """ Writes data to a file so that readers only ever see the old or the
+        complete new contents, never a partial write.
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    descriptor, temp_name = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_name, filename)
+    except BaseException:
+        os.unlink(temp_name)
+        raise
+
+
+def read_snapshot(filename: str) -> Snapshot:
+    """ Reads and decodes the snapshot saved in a file. """
+    with open(filename, 'rb') as file:
+        return Snapshot.decode(file.read())
+
+
+class Autosaver:
+    """ Encodes and writes snapshots on a background thread. Submitting never
+        blocks; if a save is still pending it is replaced by the newer one.
+    """
+    def __init__(self, filename: str) -> None:
+        """ Starts the autosave thread.
+
+        Parameters:
+            filename: The file that autosaves are written to.
+        """
+        self._filename = filename
+        self._pending = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, snapshot: Snapshot) -> None:
+        """ Queues a snapshot to be saved, replacing any unsaved one. """
+        while True:
+            try:
+                self._pending.put_nowait(snapshot)
+                return
+            except queue.Full:
+                try:
+                    self._pending.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def close(self) -> None:
+        """ Writes any pending snapshot and stops the thread. """
+        self._pending.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        """ Saves snapshots as they arrive until closed. """
+        while True:
+            snapshot = self._pending.get()
+            if snapshot is None:
+                return
+            try:
+                write_atomic(self._filename, snapshot.encode())
+            except OSError:
+                pass  # the next autosave will try again
@@ -0,0 +1,165 @@
+""" A fixed-memory history of the player's stats.
+
+The stats after each move are kept in ring buffers of preallocated arrays,
+one per stat plus one of move numbers, so memory is the same however long
+a session runs. Once full, each new sample overwrites the oldest. Undoing
+moves removes the samples after the move returned to, so the history always
+describes the game as it now stands.
+"""
+from __future__ import annotations
+
+from array import array
+from typing import Iterator, Optional
+
+from constants import *
+
+HEALTH, HUNGER, THIRST = range(3)  # Indexes of the stats in a sample
+STAT_MAXIMUMS = (MAX_HEALTH, MAX_HUNGER, MAX_THIRST)
+
+
+class StatsHistory:
+    """ The (HP, hunger, thirst) of the player after each of the most recent
+        moves, oldest first.
+    """
+    __slots__ = ('_capacity', '_moves', '_stats', '_start', '_size',
+                 '_total', '_version')
+
+    def __init__(self, capacity: int = STATS_HISTORY_SIZE) -> None:
+        """ Allocates an empty history.
+
+        Parameters:
+            capacity: The most samples kept.
+        """
+        self._capacity = capacity
+        self._moves = array('q', [0]) * capacity
+        self._stats = tuple(array('h', [0]) * capacity for _ in STAT_MAXIMUMS)
+        self._start = 0  # The buffer index of the oldest sample
+        self._size = 0
+        self._total = 0  # Samples recorded, including those overwritten
+        self._version = 0  # Changed whenever a sample is removed or rewritten
+
+    def __len__(self) -> int:
+        """ Returns the number of samples kept. """
+        return self._size
+
+    def get_capacity(self) -> int:
+        """ Returns the most samples the history keeps. """
+        return self._capacity
+
+    def get_total(self) -> int:
+        """ Returns the number of samples recorded, including those that have
+            since been overwritten.
+        """
+        return self._total
+
+    def get_version(self) -> int:
+        """ Returns a number that changes whenever a sample is removed or
+            rewritten, i.e. on any change other than appending.
+        """
+        return self._version
+
+    def _index(self, index: int) -> int:
+        """ Returns the buffer index of a sample, counting from the oldest, or
+            from the newest if negative.
+
+        Raises:
+            IndexError: If there is no such sample.
+        """
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('Stats history index out of range')
+        return (self._start + index) % self._capacity
+
+    def get(self, index: int) -> tuple[int, tuple[int, int, int]]:
+        """ Returns the move number and (HP, hunger, thirst) of a sample,
+            counting from the oldest, or from the newest if negative.
+
+        Raises:
+            IndexError: If there is no such sample.
+        """
+        position = self._index(index)
+        return self._moves[position], tuple(values[position]
+                                            for values in self._stats)
+
+    def __iter__(self) -> Iterator[tuple[int, tuple[int, int, int]]]:
+        """ Yields every sample kept as in get, oldest first. """
+        for index in range(self._size):
+            yield self.get(index)
+
+    def _window(self, values: array, count: Optional[int]) -> array:
+        """ Returns the last count entries of a buffer in order, as a copy. """
+        count = self._size if count is None else min(count, self._size)
+        first = (self._start + self._size - count) % self._capacity
+        if first + count <= self._capacity:
+            return values[first:first + count]
+        return values[first:] + values[:first + count - self._capacity]
+
+    def get_series(self, stat: int, count: Optional[int] = None) -> array:
+        """ Returns the most recent values of one stat, oldest first.
+
+        Parameters:
+            stat: HEALTH, HUNGER or THIRST.
+            count: The most values to return. Defaults to all kept.
+        """
+        return self._window(self._stats[stat], count)
+
+    def get_moves(self, count: Optional[int] = None) -> array:
+        """ Returns the move numbers of the most recent samples, oldest first.
+
+        Parameters:
+            count: The most move numbers to return. Defaults to all kept.
+        """
+        return self._window(self._moves, count)
+
+    def summary(self, stat: int, count: Optional[int] = None
+                ) -> Optional[tuple[int, int, float]]:
+        """ Returns the (minimum, maximum, mean) of one stat over the most
+            recent samples, or None if there are none.
+
+        Parameters:
+            stat: HEALTH, HUNGER or THIRST.
+            count: The number of samples to cover. Defaults to all kept.
+        """
+        values = self.get_series(stat, count)
+        if not values:
+            return None
+        return min(values), max(values), sum(values) / len(values)
+
+    def update(self, num_moves: int, stats: tuple[int, int, int]) -> None:
+        """ Records the stats after a move. Samples after num_moves, left by
+            an undo, are removed first, and a second sample for the same
+            move (e.g. after using an item) replaces the first.
+
+        Parameters:
+            num_moves: The number of moves made so far.
+            stats: The player's (HP, hunger, thirst).
+        """
+        moves = self._moves
+        while self._size and moves[self._index(-1)] > num_moves:
+            self._size -= 1
+            self._total -= 1
+            self._version += 1
+        if self._size and moves[self._index(-1)] == num_moves:
+            position = self._index(-1)
+            if any(values[position] != stat
+                   for values, stat in zip(self._stats, stats)):
+                for values, stat in zip(self._stats, stats):
+                    values[position] = stat
+                self._version += 1
+            return
+
+        position = (self._start + self._size) % self._capacity
+        if self._size == self._capacity:
+            self._start = (self._start + 1) % self._capacity
+        else:
+            self._size += 1
+        moves[position] = num_moves
+        for values, stat in zip(self._stats, stats):
+            values[position] = stat
+        self._total += 1
+
+    def clear(self) -> None:
+        """ Removes every sample. """
+        self._start = self._size = self._total = 0
+        self._version += 1
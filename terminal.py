@@ -0,0 +1,180 @@
+""" A full-screen ANSI terminal view for the text game.
+
+The top of the screen shows a viewport of the maze followed by the stats and
+inventory lines; below that is a scrolling console region for the move
+prompt and messages. The previous frame is kept, and each draw only moves
+the cursor to the runs of characters that changed and rewrites those. The
+whole update goes out in a single write.
+"""
+from __future__ import annotations
+
+import atexit
+import shutil
+import sys
+from typing import Optional, TextIO
+
+from a2_support import UserInterface
+from constants import *
+
+CSI = '\x1b['
+SAVE_CURSOR = '\x1b7'
+RESTORE_CURSOR = '\x1b8'
+CLEAR_SCREEN = CSI + '2J'
+STATUS_LINES = 3  # stats, inventory, separator
+MERGE_GAP = 6  # unchanged characters worth rewriting to avoid a cursor move
+
+
+def move_to(row: int, col: int) -> str:
+    """ Returns the sequence that moves the cursor to a 0-indexed cell. """
+    return f'{CSI}{row + 1};{col + 1}H'
+
+
+def diff_line(old: str, new: str) -> list[tuple[int, str]]:
+    """ Returns the runs of new that differ from old, as (column, text) pairs.
+        Runs separated by fewer than MERGE_GAP unchanged characters are
+        merged, since rewriting those is cheaper than another cursor move.
+
+    Parameters:
+        old: The line currently on screen.
+        new: The line to show, of the same length as old.
+    """
+    runs = []
+    start = end = None
+    for col, (old_char, new_char) in enumerate(zip(old, new)):
+        if old_char == new_char:
+            continue
+        if start is not None and col - end <= MERGE_GAP:
+            end = col + 1
+        else:
+            if start is not None:
+                runs.append((start, new[start:end]))
+            start, end = col, col + 1
+    if start is not None:
+        runs.append((start, new[start:end]))
+    return runs
+
+
+class AnsiInterface(UserInterface):
+    """ A MazeRunner interface that redraws only what changed on a terminal.
+    """
+    def __init__(self, stream: Optional[TextIO] = None) -> None:
+        """ Sets up the interface. Nothing is written until the first draw.
+
+        Parameters:
+            stream: The terminal to draw on. Defaults to standard output.
+        """
+        self._stream = stream or sys.stdout
+        self._size = None  # (columns, lines) of the terminal
+        self._lines = []  # The frame on screen, one padded string per line
+        self._origin = (0, 0)  # Maze position at the top left of the viewport
+        self._frame = []
+        self._active = False  # True once the screen has been taken over
+
+    def _setup(self, size: tuple[int, int]) -> list[str]:
+        """ Clears the screen and confines scrolling to the console region
+            below the frame.
+
+        Returns:
+            The escape sequences to do so.
+        """
+        columns, lines = size
+        self._size = size
+        self._lines = [' ' * columns] * self._frame_height()
+        if not self._active:
+            atexit.register(self.close)
+            self._active = True
+        return [CSI + 'r', CLEAR_SCREEN,
+                f'{CSI}{self._frame_height() + 1};{lines}r',
+                move_to(self._frame_height(), 0)]
+
+    def _frame_height(self) -> int:
+        """ Returns the number of screen lines used by the frame. """
+        return max(1, self._size[1] - CONSOLE_LINES)
+
+    def close(self) -> None:
+        """ Restores normal scrolling and leaves the cursor below the frame.
+        """
+        if not self._active:
+            return
+        self._active = False
+        self._stream.write(CSI + 'r' + move_to(self._size[1] - 1, 0) + '\n')
+        self._stream.flush()
+
+    def _follow(self, player_position: tuple[int, int],
+                dimensions: tuple[int, int], view: tuple[int, int]) -> None:
+        """ Moves the viewport so the player is at least VIEWPORT_MARGIN cells
+            from its edge, recentring on the player when it has to move.
+        """
+        origin = list(self._origin)
+        for axis in (0, 1):
+            size, limit = view[axis], dimensions[axis]
+            margin = min(VIEWPORT_MARGIN, (size - 1) // 2)
+            position = player_position[axis]
+            if not (origin[axis] + margin <= position
+                    < origin[axis] + size - margin):
+                origin[axis] = position - size // 2
+            origin[axis] = max(0, min(origin[axis], limit - size))
+        self._origin = tuple(origin)
+
+    def draw(
+        self,
+        maze: 'Maze',
+        items: dict[tuple[int, int], 'Item'],
+        player_position: tuple[int, int],
+        inventory: 'Inventory',
+        player_stats: tuple[int, int, int]
+    ) -> None:
+        """ Builds the new frame, then writes only its differences from the
+            frame on screen.
+        """
+        size = tuple(shutil.get_terminal_size())
+        output = [SAVE_CURSOR]
+        if size != self._size:
+            output = self._setup(size) + output
+        self._frame = []
+        super().draw(maze, items, player_position, inventory, player_stats)
+
+        columns = self._size[0]
+        height = self._frame_height()
+        frame = [line[:columns].ljust(columns) for line in self._frame]
+        frame = (frame + [' ' * columns] * height)[:height]
+        for row, (old, new) in enumerate(zip(self._lines, frame)):
+            for col, text in diff_line(old, new):
+                output.append(move_to(row, col) + text)
+        self._lines = frame
+        output.append(RESTORE_CURSOR)
+        self._stream.write(''.join(output))
+        self._stream.flush()
+
+    def _draw_level(
+        self,
+        maze: 'Maze',
+        items: dict[tuple[int, int], 'Item'],
+        player_position: tuple[int, int]
+    ) -> None:
+        dimensions = maze.get_dimensions()
+        height = max(1, self._frame_height() - STATUS_LINES)
+        view = (min(dimensions[0], height), min(dimensions[1], self._size[0]))
+        self._follow(player_position, dimensions, view)
+        top, left = self._origin
+        tiles = maze.get_tiles()
+        for row in range(top, top + view[0]):
+            cells = [tile.get_id() for tile in tiles[row][left:left + view[1]]]
+            for col in range(left, left + view[1]):
+                item = items.get((row, col))
+                if item is not None:
+                    cells[col - left] = item.get_id()
+            if row == player_position[0] and \
+                    left <= player_position[1] < left + view[1]:
+                cells[player_position[1] - left] = PLAYER
+            self._frame.append(''.join(cells))
+
+    def _draw_player_stats(self, player_stats: tuple[int, int, int]) -> None:
+        hp, hunger, thirst = player_stats
+        self._frame.append(f'HP: {hp}  hunger: {hunger}  thirst: {thirst}')
+
+    def _draw_inventory(self, inventory: 'Inventory') -> None:
+        counts = inventory.get_counts()
+        text = ', '.join(f'{name}: {count}' for name, count in counts.items())
+        self._frame.append(f'Inventory: {text or "Empty"}')
+        self._frame.append('-' * self._size[0])
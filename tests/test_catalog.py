@@ -0,0 +1,48 @@
+""" Tests for the game library catalog.
+
+Usage:
+    python -m pytest tests
+"""
+from __future__ import annotations
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from catalog import Catalog, scan_game
+
+# A level whose edge cells and one whole row are EMPTY
+OPEN_GAME = """Maze 1 - 4 5
+ P  C
+     
+#   D
+C C  
+
+Maze 2 - 2 2
+PD
+C 
+"""
+
+
+def test_scan_keeps_empty_cells(tmp_path):
+    path = tmp_path / 'open.txt'
+    path.write_text(OPEN_GAME)
+    info = scan_game(str(path))
+    assert info.dimensions == [(4, 5), (2, 2)]
+    assert info.coins == [3, 1]
+    assert info.thumbnail == [' P  C', '     ', '#   D', 'C C  ']
+
+
+def test_refresh_rescans_only_changed_files(tmp_path):
+    for name in ('a.txt', 'b.txt'):
+        (tmp_path / name).write_text(OPEN_GAME)
+    assert Catalog(str(tmp_path)).refresh() == (2, 0)
+    assert Catalog(str(tmp_path)).refresh() == (0, 0)
+
+    (tmp_path / 'a.txt').write_text(OPEN_GAME + '\n')
+    (tmp_path / 'b.txt').unlink()
+    catalog = Catalog(str(tmp_path))
+    assert catalog.refresh() == (1, 1)
+    assert [info.name for info in catalog.get_games()] == ['a.txt']
@@ -0,0 +1,85 @@
+""" Tests for the game model's undo journal on original and cloned games,
+its inventory and its enemies.
+
+Usage:
+    python -m pytest tests
+"""
+from __future__ import annotations
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from a2_solution import Apple, Inventory, Model
+from constants import ENEMY_DAMAGE, MOVE_DELTAS, RIGHT, UP
+
+GAME1 = os.path.join(ROOT, 'games', 'game1.txt')
+LAST_COIN_MOVES = (RIGHT, RIGHT, UP, UP)  # Collects game1's last coin
+
+
+def play(model: Model, moves: tuple[str, ...]) -> None:
+    """ Makes each move in turn. """
+    for move in moves:
+        model.move_player(MOVE_DELTAS[move])
+
+
+def test_undo_relocks_door():
+    model = Model(GAME1)
+    play(model, LAST_COIN_MOVES)
+    assert model.get_current_maze().is_door_unlocked()
+    model.undo()
+    assert not model.get_current_maze().is_door_unlocked()
+
+
+def test_undo_relocks_door_on_clone():
+    clone = Model(GAME1).clone()
+    play(clone, LAST_COIN_MOVES)
+    assert clone.get_current_maze().is_door_unlocked()
+    clone.undo()
+    assert not clone.get_current_maze().is_door_unlocked()
+    assert len(clone.get_current_items()) == 1
+
+
+def test_undo_on_clone_leaves_original_locked():
+    model = Model(GAME1)
+    clone = model.clone()
+    play(clone, LAST_COIN_MOVES)
+    assert not model.get_current_maze().is_door_unlocked()
+    clone.undo()
+    assert not model.get_current_maze().is_door_unlocked()
+
+
+def test_inventory_keeps_positions_in_order():
+    inventory = Inventory([Apple((1, 1)), Apple((2, 2))])
+    copy = inventory.copy()
+    assert [item.get_position()
+            for item in inventory.get_items()['Apple']] == [(1, 1), (2, 2)]
+    assert inventory.remove_item('Apple').get_position() == (1, 1)
+    assert inventory.remove_item('Apple').get_position() == (2, 2)
+    assert inventory.remove_item('Apple') is None
+    assert copy.count('Apple') == 2
+
+
+def test_player_hit_stepping_onto_enemy(tmp_path):
+    # The patroller faces right, so it steps away as the player arrives
+    game = tmp_path / 'game.txt'
+    game.write_text('Maze 1 - 3 5\n#####\n#PX #\n#####\n')
+    model = Model(str(game))
+    health = model.get_player_stats()[0]
+    model.move_player(MOVE_DELTAS[RIGHT])
+    assert model.get_level().get_enemies().get((1, 3)) is not None
+    assert model.get_player_stats()[0] == health - 1 - ENEMY_DAMAGE
+
+
+def test_player_hit_swapping_with_enemy(tmp_path):
+    # The patroller is blocked on the right, so it turns onto the player's
+    # old square as the player steps onto its own
+    game = tmp_path / 'game.txt'
+    game.write_text('Maze 1 - 3 4\n####\n#PX#\n####\n')
+    model = Model(str(game))
+    health = model.get_player_stats()[0]
+    model.move_player(MOVE_DELTAS[RIGHT])
+    assert model.get_level().get_enemies().get((1, 1)) is not None
+    assert model.get_player_stats()[0] == health - 1 - ENEMY_DAMAGE
@@ -0,0 +1,55 @@
+""" Tests that recordings started part way through a game play back to the
+live game.
+
+Usage:
+    python -m pytest tests
+"""
+from __future__ import annotations
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from a2_solution import MazeRunner
+from constants import DOWN, RIGHT, UNDO_COMMAND
+from replay import HeadlessInterface, Replay, ReplayPlayer
+
+GAME2 = os.path.join(ROOT, 'games', 'game2.txt')
+
+
+def play_back(replay: Replay) -> MazeRunner:
+    """ Returns a new runner that has played a replay to the end. """
+    runner = MazeRunner(GAME2, HeadlessInterface())
+    ReplayPlayer(Replay.decode(replay.encode()), runner).play_to_end()
+    return runner
+
+
+def test_recording_restarted_after_restore():
+    runner = MazeRunner(GAME2, HeadlessInterface())
+    runner.start_recording()
+    model = runner.get_model()
+    runner._handle_move(RIGHT)
+    saved = model.snapshot()
+    for move in (DOWN, DOWN, RIGHT, DOWN, RIGHT):
+        runner._handle_move(move)
+    model.restore(saved)
+    replay = runner.start_recording()
+    for move in (DOWN, RIGHT):
+        runner._handle_move(move)
+
+    played = play_back(replay).get_model()
+    assert played.state_hash() == model.state_hash()
+
+
+def test_undo_after_recording_restarts():
+    runner = MazeRunner(GAME2, HeadlessInterface())
+    for move in (RIGHT, DOWN, DOWN):
+        runner._handle_move(move)
+    replay = runner.start_recording()
+    runner._handle_move(UNDO_COMMAND)  # Nothing recorded to undo
+    runner._handle_move(RIGHT)
+
+    played = play_back(replay).get_model()
+    assert played.state_hash() == runner.get_model().state_hash()
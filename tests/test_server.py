@@ -0,0 +1,41 @@
+""" Tests for the game server's command handling.
+
+Usage:
+    python -m pytest tests
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from a2_solution import Model
+from constants import MEMORY_COMMAND, RIGHT, UNDO_COMMAND, UP
+from server import Session, parse_session_commands
+
+GAME1 = os.path.join(ROOT, 'games', 'game1.txt')
+LAST_COIN_MOVES = (RIGHT, RIGHT, UP, UP)  # Collects game1's last coin
+
+
+def test_memory_command_rejected():
+    assert parse_session_commands(MEMORY_COMMAND) is None
+    assert parse_session_commands(RIGHT + MEMORY_COMMAND) is None
+    assert parse_session_commands(RIGHT + UP) == [RIGHT, UP]
+
+
+def test_undo_delta_relocks_door():
+    async def play() -> tuple[dict, dict, Model]:
+        model = Model(GAME1).clone()  # Sessions play clones of a template
+        session = Session(1, model, None)
+        for move in LAST_COIN_MOVES:
+            unlock = session.apply(move)
+        return unlock, session.apply(UNDO_COMMAND), model
+
+    unlock, undo, model = asyncio.run(play())
+    assert unlock['door'] is True
+    assert undo['door'] is False
+    assert (1, 2, 'C') in undo['items']
+    assert not model.get_current_maze().is_door_unlocked()
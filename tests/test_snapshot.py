@@ -0,0 +1,71 @@
+""" Tests for saving and restoring games with snapshots.
+
+Usage:
+    python -m pytest tests
+"""
+from __future__ import annotations
+
+import dataclasses
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from a2_solution import Model
+from constants import MOVE_DELTAS, RIGHT, UP
+
+GAME1 = os.path.join(ROOT, 'games', 'game1.txt')
+LAST_COIN_MOVES = (RIGHT, RIGHT, UP, UP)  # Collects game1's last coin
+
+
+def played_game() -> Model:
+    """ Returns game1 with its door unlocked. """
+    model = Model(GAME1)
+    for move in LAST_COIN_MOVES:
+        model.move_player(MOVE_DELTAS[move])
+    return model
+
+
+def test_restore_round_trip():
+    model = played_game()
+    snapshot = model.snapshot()
+    restored = Model(GAME1)
+    restored.restore(snapshot)
+    assert restored.state_hash() == model.state_hash()
+    assert restored.state_hash() == restored.compute_state_hash()
+    assert restored.get_player_inventory().get_counts() == {'Coin': 3}
+
+
+@pytest.mark.parametrize('changes', [
+    {'inventory': {'Coin': 1, 'Sword': 2}},
+    {'position': (40, 1)},
+    {'position': (1, -1)},
+    {'collected': {0: [(0, 0)]}},
+    {'collected': {7: []}},
+    {'unlocked': [0, 9]},
+    {'enemies': {0: [(1, 1, 0)]}},
+    {'level_num': 5},
+])
+def test_invalid_snapshot_leaves_game_unchanged(changes):
+    snapshot = dataclasses.replace(Model(GAME1).snapshot(), **changes)
+    model = played_game()
+    before = model.snapshot(), model.state_hash()
+    with pytest.raises(ValueError):
+        model.restore(snapshot)
+    assert (model.snapshot(), model.state_hash()) == before
+    assert model.state_hash() == model.compute_state_hash()
+
+
+def test_endless_game_hash_depends_on_max_size():
+    from endless import EndlessLevels
+    hashes = []
+    for max_size in (20, 40):
+        model = Model(GAME1)
+        model.set_level_source(EndlessLevels(
+            0, len(model.get_levels()), ahead=1, max_size=max_size))
+        hashes.append(model.get_game_hash())
+        model.set_level_source(None)
+    assert hashes[0] != hashes[1]
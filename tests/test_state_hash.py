@@ -0,0 +1,103 @@
+""" Tests that the incremental state hash and copy-on-write clones stay
+consistent through random moves, item uses and undos.
+
+Usage:
+    python -m pytest tests
+"""
+from __future__ import annotations
+
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from a2_solution import Model
+from constants import MOVE_DELTAS
+from generator import generate_game
+
+NUM_ACTIONS = 1500
+SEEDS = (0, 1, 2)
+ITEM_NAMES = ('Apple', 'Water', 'Potion', 'Honey', 'Coin')
+SHIPPED_GAMES = ('game1.txt', 'game2.txt', 'game3.txt', 'masters1.txt')
+
+
+@pytest.fixture(params=SHIPPED_GAMES + ('generated',))
+def game_file(request, tmp_path) -> str:
+    """ Each shipped game, and a generated game with enemies. """
+    if request.param == 'generated':
+        path = str(tmp_path / 'generated.txt')
+        generate_game(path, (25, 25), num_levels=2, seed=7,
+                      coin_density=0.05, enemy_density=0.03)
+        return path
+    return os.path.join(ROOT, 'games', request.param)
+
+
+def random_actions(seed: int) -> list[tuple[str, object]]:
+    """ Returns a random sequence of moves, item uses and undos. """
+    rng = random.Random(seed)
+    actions = []
+    for _ in range(NUM_ACTIONS):
+        roll = rng.random()
+        if roll < 0.05:
+            actions.append(('use', rng.choice(ITEM_NAMES)))
+        elif roll < 0.25:
+            actions.append(('undo', None))
+        else:
+            actions.append(('move', rng.choice(list(MOVE_DELTAS.values()))))
+    return actions
+
+
+def apply(model: Model, action: tuple[str, object]) -> None:
+    """ Applies one action to a game. """
+    kind, argument = action
+    if kind == 'use':
+        model.use_item(argument)
+    elif kind == 'undo':
+        model.undo()
+    else:
+        model.move_player(argument)
+
+
+def observable_state(model: Model) -> tuple:
+    """ Returns what a player could see of a game. """
+    return (model.get_level_num(), model.get_player().get_position(),
+            model.get_player_stats(), model.get_num_moves(),
+            dict(model.get_player_inventory().get_counts()),
+            model.get_current_maze().is_door_unlocked(),
+            {position: item.get_id()
+             for position, item in model.get_current_items().items()})
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_model_and_clone_match_uncloned_twin(game_file, seed):
+    model = Model(game_file)
+    clone = model.clone()
+    twin = Model(game_file)
+    for step, action in enumerate(random_actions(seed)):
+        if twin.has_won() or twin.has_lost():
+            break
+        for game in (model, clone, twin):
+            apply(game, action)
+            assert game.state_hash() == game.compute_state_hash(), step
+        expected = observable_state(twin)
+        assert observable_state(model) == expected, step
+        assert observable_state(clone) == expected, step
+        assert clone.state_hash() == twin.state_hash(), step
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_clone_leaves_original_unchanged(game_file, seed):
+    model = Model(game_file)
+    before = observable_state(model), model.state_hash()
+    clone = model.clone()
+    for action in random_actions(seed):
+        if clone.has_won() or clone.has_lost():
+            break
+        apply(clone, action)
+        assert clone.state_hash() == clone.compute_state_hash()
+    assert (observable_state(model), model.state_hash()) == before
+    assert model.state_hash() == model.compute_state_hash()
@@ -0,0 +1,87 @@
+""" Zobrist keys for hashing MazeRunner game states.
+
+A state's hash is the XOR of one 64-bit key per feature of the state (the
+player's position, each remaining item, each unlocked door, ...), so a change
+to one feature updates the hash by XORing out the old key and XORing in the
+new one. Keys are derived deterministically from the feature itself rather
+than drawn from a table, so mazes of any size need no setup and hashes are
+stable between runs.
+"""
+from __future__ import annotations
+
+import zlib
+from functools import lru_cache
+
+MASK = (1 << 64) - 1
+SEED = 0x9E3779B97F4A7C15
+CACHE_SIZE = 1 << 16
+
+(LEVEL, POSITION, HEALTH, HUNGER, THIRST, MOVES, ITEM, DOOR, INVENTORY, ENEMY,
+ ENEMIES) = range(11)
+
+
+def _mix(value: int) -> int:
+    """ Returns the splitmix64 finalizer of a 64-bit value. """
+    value = (value ^ (value >> 30)) * 0xBF58476D1CE4E5B9 & MASK
+    value = (value ^ (value >> 27)) * 0x94D049BB133111EB & MASK
+    return value ^ (value >> 31)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def key(*parts: int) -> int:
+    """ Returns the 64-bit key for the feature described by some ints. """
+    value = SEED
+    for part in parts:
+        value = _mix((value ^ part) & MASK)
+    return value
+
+
+@lru_cache(maxsize=None)
+def name_code(name: str) -> int:
+    """ Returns a stable int code for a name. """
+    return zlib.crc32(name.encode())
+
+
+def player_key(
+    level_num: int,
+    position: tuple[int, int],
+    stats: tuple[int, int, int],
+    num_moves: int,
+) -> int:
+    """ Returns the combined key for the current level and the player's
+        position, stats and move count (modulo 5, since only that affects
+        future play).
+    """
+    health, hunger, thirst = stats
+    return (key(LEVEL, level_num) ^ key(POSITION, *position)
+            ^ key(HEALTH, health) ^ key(HUNGER, hunger)
+            ^ key(THIRST, thirst) ^ key(MOVES, num_moves % 5))
+
+
+def item_key(level_num: int, position: tuple[int, int], item_id: str) -> int:
+    """ Returns the key for an item remaining at a position on a level. """
+    return key(ITEM, level_num, *position, ord(item_id))
+
+
+def door_key(level_num: int) -> int:
+    """ Returns the key for the doors of a level being unlocked. """
+    return key(DOOR, level_num)
+
+
+def inventory_key(item_name: str, count: int) -> int:
+    """ Returns the key for holding count of the named item. Holding none
+        contributes nothing, so empty entries need no special handling.
+    """
+    return key(INVENTORY, name_code(item_name), count) if count else 0
+
+
+def enemy_key(position: tuple[int, int], enemy_id: str, direction: int) -> int:
+    """ Returns the key for an enemy at a position facing in a direction. """
+    return key(ENEMY, *position, ord(enemy_id), direction)
+
+
+def enemies_key(level_num: int, enemies_hash: int) -> int:
+    """ Returns the key for the enemies of a level, given the XOR of their
+        enemy_keys. A level without enemies contributes nothing.
+    """
+    return key(ENEMIES, level_num, enemies_hash) if enemies_hash else 0